@@ -3,8 +3,9 @@ from django.utils import timezone
 from datetime import timedelta, datetime
 from collections import defaultdict
 import json
+import math
 from users.models import User
-from documents.models import ReadingSession, ReadingAnalytics, Document
+from documents.models import ReadingSession, ReadingAnalytics, Document, DocumentTerm
 from .models import ReadingPattern
 
 class BehavioralAnalyticsService:
@@ -127,27 +128,20 @@ class BehavioralAnalyticsService:
     @staticmethod
     def _analyze_content_preferences(sessions):
         """Analyze content type and theme preferences"""
-        themes = []
-        categories = []
-        reading_modes = []
-        
-        for session in sessions:
-            doc_meta = session.document.metadata
-            themes.extend(doc_meta.get('themes', []))
-            categories.extend(doc_meta.get('categories', []))
-            reading_modes.append(session.document.reading_mode)
+        terms = DocumentTerm.objects.filter(document__readingsession__in=sessions)
+        reading_modes = [session.document.reading_mode for session in sessions]
         
         # Count preferences
         from collections import Counter
-        theme_counts = Counter(themes)
-        category_counts = Counter(categories)
+        theme_counts = terms.themes().counts()
+        category_counts = terms.categories().counts()
         mode_counts = Counter(reading_modes)
         
         return {
             'top_themes': theme_counts.most_common(5),
             'top_categories': category_counts.most_common(3),
             'preferred_mode': mode_counts.most_common(1)[0] if mode_counts else None,
-            'content_diversity': len(set(themes)) / max(len(themes), 1)
+            'content_diversity': len(theme_counts) / max(sum(theme_counts.values()), 1)
         }
     
     @staticmethod
@@ -193,39 +187,20 @@ class BehavioralAnalyticsService:
         if not analytics.exists():
             return {}
         
-        # Group by content characteristics
-        theme_engagement = defaultdict(list)
-        category_engagement = defaultdict(list)
-        
-        for analytic in analytics:
-            doc_meta = analytic.document.metadata
-            themes = doc_meta.get('themes', [])
-            categories = doc_meta.get('categories', [])
-            
-            for theme in themes:
-                theme_engagement[theme].append(analytic.engagement_score)
-            
-            for category in categories:
-                category_engagement[category].append(analytic.engagement_score)
-        
-        # Calculate average engagement by theme/category
-        avg_theme_engagement = {
-            theme: sum(scores) / len(scores)
-            for theme, scores in theme_engagement.items()
-            if len(scores) >= 2  # Minimum 2 data points
-        }
-        
-        avg_category_engagement = {
-            category: sum(scores) / len(scores)
-            for category, scores in category_engagement.items()
-            if len(scores) >= 2
-        }
+        # Average engagement by theme/category, joined through the term table
+        def engagement_by(kind, limit):
+            return list(analytics.filter(
+                document__terms__kind=kind
+            ).values('document__terms__term').annotate(
+                avg=Avg('engagement_score'),
+                data_points=Count('id')
+            ).filter(
+                data_points__gte=2  # Minimum 2 data points
+            ).order_by('-avg').values_list('document__terms__term', 'avg')[:limit])
         
         return {
-            'high_engagement_themes': sorted(avg_theme_engagement.items(), 
-                                           key=lambda x: x[1], reverse=True)[:5],
-            'high_engagement_categories': sorted(avg_category_engagement.items(), 
-                                               key=lambda x: x[1], reverse=True)[:3],
+            'high_engagement_themes': engagement_by(DocumentTerm.THEME, 5),
+            'high_engagement_categories': engagement_by(DocumentTerm.CATEGORY, 3),
             'overall_engagement': analytics.aggregate(avg=Avg('engagement_score'))['avg'] or 0
         }
     
@@ -1,3 +1,107 @@
+from datetime import timedelta
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from documents.models import AICallRecord, Document, ReadingAnalytics, ReadingSession
+from users.models import User
+from .behavioral_analytics import BehavioralAnalyticsService
 
-# Create your tests here.
+class AIUsageTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='pw12345678')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw12345678')
+        self.document = Document.objects.create(
+            user=self.user, title='Book', original_filename='book.pdf', file='documents/book.pdf',
+            file_size=1024, content_hash='0' * 64
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def record(self, user, cache=AICallRecord.MISS, **fields):
+        defaults = {'caller': 'story_ingest', 'model_name': 'offline', 'document': self.document}
+        return AICallRecord.objects.create(user=user, cache=cache, **{**defaults, **fields})
+
+    def test_totals_for_own_calls(self):
+        self.record(self.user, prompt_tokens=100, response_tokens=50, latency_ms=200, retries=1)
+        self.record(self.user, outcome=AICallRecord.FALLBACK, prompt_tokens=20, latency_ms=400, caller='enhance')
+        self.record(self.user, cache=AICallRecord.HIT, call_count=3, prompt_tokens=300)
+        self.record(self.user, cache=AICallRecord.COALESCED, prompt_tokens=100)
+        self.record(self.other, prompt_tokens=1000)
+
+        response = self.client.get('/api/analytics/ai-usage/')
+
+        self.assertEqual(response.status_code, 200)
+        totals = response.data['totals']
+        self.assertEqual(totals['calls'], 6)
+        self.assertEqual(totals['api_calls'], 2)
+        self.assertEqual(totals['cache_hits'], 3)
+        self.assertEqual(totals['coalesced'], 1)
+        self.assertEqual(totals['fallbacks'], 1)
+        self.assertEqual(totals['retries'], 1)
+        # Only calls that reached the backend spend tokens
+        self.assertEqual(totals['prompt_tokens'], 120)
+        self.assertEqual(totals['response_tokens'], 50)
+        self.assertEqual(totals['avg_latency_ms'], 300)
+        self.assertEqual([row['caller'] for row in response.data['by_caller']], ['story_ingest', 'enhance'])
+        self.assertEqual(response.data['by_document'][0]['document__title'], 'Book')
+        self.assertNotIn('by_user', response.data)
+
+    def test_old_calls_are_left_out(self):
+        old = self.record(self.user, prompt_tokens=100)
+        AICallRecord.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=10))
+
+        self.assertEqual(self.client.get('/api/analytics/ai-usage/', {'days': 7}).data['totals']['calls'], 0)
+        self.assertEqual(self.client.get('/api/analytics/ai-usage/', {'days': 30}).data['totals']['calls'], 1)
+        self.assertEqual(self.client.get('/api/analytics/ai-usage/', {'days': 'x'}).status_code, 400)
+
+    def test_all_users_scope_is_staff_only(self):
+        self.record(self.user, prompt_tokens=100)
+        self.record(self.other, prompt_tokens=1000)
+
+        response = self.client.get('/api/analytics/ai-usage/', {'scope': 'all'})
+        self.assertEqual(response.data['totals']['calls'], 1)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/analytics/ai-usage/', {'scope': 'all'})
+        self.assertEqual(response.data['totals']['calls'], 2)
+        self.assertEqual([row['user__username'] for row in response.data['by_user']], ['other', 'reader'])
+
+class BehavioralAnalyticsTermTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='pw12345678')
+
+    def read(self, themes, categories=(), engagement=0.5):
+        document = Document.objects.create(
+            user=self.user, title='Book', original_filename='book.pdf', file='documents/book.pdf', file_size=1024,
+            content_hash=f'{Document.objects.count() + 1:064x}',
+            metadata={'themes': list(themes), 'categories': list(categories)}
+        )
+        ReadingSession.objects.create(user=self.user, document=document)
+        ReadingAnalytics.objects.create(user=self.user, document=document, engagement_score=engagement)
+        return document
+
+    def test_content_preferences_count_document_terms(self):
+        self.read(['comet', 'orbit'], ['science'])
+        self.read(['comet'], ['science'])
+        self.read(['glacier'], ['geography'])
+
+        preferences = BehavioralAnalyticsService._analyze_content_preferences(ReadingSession.objects.filter(user=self.user))
+
+        self.assertEqual(preferences['top_themes'][0], ('comet', 2))
+        self.assertEqual(preferences['top_categories'][0], ('science', 2))
+        self.assertEqual(preferences['content_diversity'], 3 / 4)
+
+    def test_engagement_is_averaged_per_term_with_two_data_points(self):
+        self.read(['comet', 'orbit'], ['science'], engagement=0.9)
+        self.read(['comet'], ['science'], engagement=0.7)
+        self.read(['glacier', 'orbit'], engagement=0.1)
+
+        patterns = BehavioralAnalyticsService._analyze_engagement_patterns(self.user)
+
+        self.assertEqual([term for term, _ in patterns['high_engagement_themes']], ['comet', 'orbit'])
+        self.assertAlmostEqual(patterns['high_engagement_themes'][0][1], 0.8)
+        self.assertAlmostEqual(patterns['high_engagement_categories'][0][1], 0.8)
+        self.assertAlmostEqual(patterns['overall_engagement'], 1.7 / 3)
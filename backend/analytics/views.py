@@ -1,11 +1,29 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.db.models import Avg, Count, Q, Sum
 from django.utils import timezone
 from datetime import timedelta
 from .models import ReadingPattern, ContentRecommendation, DocumentSimilarity
-from documents.models import Document, ReadingSession, ReadingAnalytics
-from documents.ai_processor import AIStoryTransformer
+from documents.models import AICallRecord, Document, ReadingSession, ReadingAnalytics
+from documents.ai_accounting import ai_call_context
+from documents.ai_processor import get_story_transformer
+
+def ai_usage_totals():
+    """Aggregates summarising a set of AICallRecords"""
+    return {
+        # Cache hit rows each stand for call_count hits
+        'calls': Sum('call_count', default=0),
+        'api_calls': Count('id', filter=Q(cache=AICallRecord.MISS)),
+        'cache_hits': Sum('call_count', filter=Q(cache=AICallRecord.HIT), default=0),
+        'coalesced': Count('id', filter=Q(cache=AICallRecord.COALESCED)),
+        'fallbacks': Count('id', filter=Q(outcome=AICallRecord.FALLBACK)),
+        'retries': Sum('retries', default=0),
+        # Tokens actually sent to and generated by the backend
+        'prompt_tokens': Sum('prompt_tokens', filter=Q(cache=AICallRecord.MISS), default=0),
+        'response_tokens': Sum('response_tokens', filter=Q(cache=AICallRecord.MISS), default=0),
+        'avg_latency_ms': Avg('latency_ms', filter=Q(cache=AICallRecord.MISS)),
+    }
 
 class AnalyticsViewSet(viewsets.ViewSet):
     
@@ -65,11 +83,12 @@ class AnalyticsViewSet(viewsets.ViewSet):
         # Generate AI recommendations
         try:
             user_interests = user.profile.interests
-            ai_transformer = AIStoryTransformer()
-            ai_recommendations = ai_transformer.generate_recommendations(
-                user_interests, 
-                list(completed_docs.values_list('title', flat=True)[:3])
-            )
+            ai_transformer = get_story_transformer()
+            with ai_call_context('discover', user.id):
+                ai_recommendations = ai_transformer.generate_recommendations(
+                    user_interests, 
+                    list(completed_docs.values_list('title', flat=True)[:3])
+                )
         except:
             ai_recommendations = "Explore more documents to get personalized recommendations."
         
@@ -82,6 +101,41 @@ class AnalyticsViewSet(viewsets.ViewSet):
             'trending_topics': self._get_trending_topics()
         })
     
+    @action(detail=False, methods=['get'], url_path='ai-usage')
+    def ai_usage(self, request):
+        """AI calls, tokens, latency and cache effectiveness over the last ?days= (default 30)
+
+        Staff can pass ?scope=all to see every user, with a per-user breakdown
+        to find the heaviest spenders.
+        """
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        all_users = request.query_params.get('scope') == 'all' and request.user.is_staff
+        records = AICallRecord.objects.filter(created_at__gte=timezone.now() - timedelta(days=days))
+        if not all_users:
+            records = records.filter(user=request.user)
+        
+        totals = ai_usage_totals()
+        usage = {
+            'days': days,
+            'totals': records.aggregate(**totals),
+            'by_caller': list(
+                records.values('caller').annotate(**totals).order_by('-prompt_tokens')
+            ),
+            'by_document': list(
+                records.exclude(document=None).values('document_id', 'document__title')
+                .annotate(**totals).order_by('-prompt_tokens')[:20]
+            ),
+        }
+        if all_users:
+            usage['by_user'] = list(
+                records.values('user_id', 'user__username').annotate(**totals).order_by('-prompt_tokens')[:20]
+            )
+        return Response(usage)
+    
     def _get_trending_topics(self):
         """Get trending topics based on recent uploads"""
         recent_docs = Document.objects.filter(
@@ -10,7 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
-import os, dj_database_url
+import os, tempfile, dj_database_url
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -115,6 +115,17 @@ else:
         }
     }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # AI worker threads and ingest processes write (cache entries, AI call records, chunks)
+    # alongside request threads. A DEFERRED transaction that reads first and then writes
+    # can't wait for the write lock and fails at once with "database is locked"; IMMEDIATE
+    # takes the lock up front so the transaction waits up to SQLITE_TIMEOUT seconds instead.
+    # Set SQLITE_TRANSACTION_MODE=DEFERRED for SQLite's default behaviour.
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'transaction_mode': os.getenv('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        'timeout': float(os.getenv('SQLITE_TIMEOUT', 20)),
+    })
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -172,5 +183,94 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 AUTH_USER_MODEL = 'users.User'
 
+# LLM backend: 'gemini', 'offline' (deterministic local stand-in) or a dotted class path
+AI_BACKEND = os.getenv('AI_BACKEND', 'gemini')
+AI_OFFLINE_LATENCY_MS = float(os.getenv('AI_OFFLINE_LATENCY_MS', 800))
+AI_OFFLINE_JITTER_MS = float(os.getenv('AI_OFFLINE_JITTER_MS', 200))
+AI_OFFLINE_ERROR_RATE = float(os.getenv('AI_OFFLINE_ERROR_RATE', 0))
+AI_OFFLINE_RATE_LIMIT_RATE = float(os.getenv('AI_OFFLINE_RATE_LIMIT_RATE', 0))
+AI_OFFLINE_SEED = int(os.getenv('AI_OFFLINE_SEED', 0))
+
 # Google Generative AI Configuration
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
\ No newline at end of file
+GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+# One shared client per worker process, with a bounded connection pool
+GEMINI_MAX_CONNECTIONS = int(os.getenv('GEMINI_MAX_CONNECTIONS', 20))
+GEMINI_TIMEOUT_MS = int(os.getenv('GEMINI_TIMEOUT_MS', 60000))
+
+# Background ingestion queue (see `manage.py run_ingest_workers`)
+INGEST_LEASE_SECONDS = int(os.getenv('INGEST_LEASE_SECONDS', 900))
+INGEST_MAX_ATTEMPTS = int(os.getenv('INGEST_MAX_ATTEMPTS', 3))
+INGEST_POLL_INTERVAL = float(os.getenv('INGEST_POLL_INTERVAL', 2))
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 2))
+
+# PDF text extraction and chunk persistence
+PDF_EXTRACTION_WORKERS = int(os.getenv('PDF_EXTRACTION_WORKERS', os.cpu_count() or 1))
+PDF_EXTRACTION_PAGES_PER_TASK = int(os.getenv('PDF_EXTRACTION_PAGES_PER_TASK', 16))
+CHUNK_BATCH_SIZE = int(os.getenv('CHUNK_BATCH_SIZE', 200))
+CHUNK_FLUSH_INTERVAL = float(os.getenv('CHUNK_FLUSH_INTERVAL', 2))
+PAGE_MAX_RETRIES = int(os.getenv('PAGE_MAX_RETRIES', 3))
+
+# Uploaded PDFs are hashed as they stream in (see documents.uploads)
+FILE_UPLOAD_HANDLERS = [
+    'documents.uploads.HashingMemoryFileUploadHandler',
+    'documents.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# Story mode AI calls
+STORY_MAX_IN_FLIGHT = int(os.getenv('STORY_MAX_IN_FLIGHT', 4))
+# Sections packed into one prompt; estimated input + output tokens per call
+STORY_BATCH_MAX_SECTIONS = int(os.getenv('STORY_BATCH_MAX_SECTIONS', 6))
+STORY_BATCH_TOKEN_BUDGET = int(os.getenv('STORY_BATCH_TOKEN_BUDGET', 4000))
+# Lazy story documents transform sections when they're first fetched
+LAZY_STORY_PAGE_SIZE = int(os.getenv('LAZY_STORY_PAGE_SIZE', 20))
+LAZY_STORY_MAX_RANGE = int(os.getenv('LAZY_STORY_MAX_RANGE', 50))
+
+# Read-ahead after progress updates: READ_AHEAD_CHUNKS at 200 wpm, scaled by reading speed
+READ_AHEAD_CHUNKS = int(os.getenv('READ_AHEAD_CHUNKS', 3))
+READ_AHEAD_MAX_CHUNKS = int(os.getenv('READ_AHEAD_MAX_CHUNKS', 12))
+READ_AHEAD_ENHANCE = os.getenv('READ_AHEAD_ENHANCE', 'false').lower() == 'true'
+READ_AHEAD_PRIORITY = int(os.getenv('READ_AHEAD_PRIORITY', 10))
+
+# Background precomputation of chunk enhancements (queued after ingestion and manage.py precompute_enhancements)
+ENHANCE_AFTER_INGEST = os.getenv('ENHANCE_AFTER_INGEST', 'true').lower() == 'true'
+ENHANCE_PREFETCH_BEHIND = int(os.getenv('ENHANCE_PREFETCH_BEHIND', 1))
+ENHANCE_PREFETCH_AHEAD = int(os.getenv('ENHANCE_PREFETCH_AHEAD', 5))
+ENHANCE_ACTIVE_DAYS = int(os.getenv('ENHANCE_ACTIVE_DAYS', 7))
+
+# Shared cache of AI responses (in-process LRU in front of a DB table)
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', 30 * 24 * 3600))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 2048))
+# Cache hits are recorded for AI usage accounting in batches at most this many seconds apart
+AI_HIT_FLUSH_INTERVAL = float(os.getenv('AI_HIT_FLUSH_INTERVAL', 30))
+
+# Identical AI prompts in flight share one call (file locks coordinate processes on a host)
+AI_SINGLE_FLIGHT_LOCK_DIR = os.getenv('AI_SINGLE_FLIGHT_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'ai-single-flight'))
+AI_SINGLE_FLIGHT_TIMEOUT = float(os.getenv('AI_SINGLE_FLIGHT_TIMEOUT', 120))
+
+# AI call rate limiting, adaptive concurrency and retries (shared by all threads in a process)
+AI_REQUESTS_PER_MINUTE = float(os.getenv('AI_REQUESTS_PER_MINUTE', 600))
+AI_BURST = int(os.getenv('AI_BURST', 10))
+AI_MIN_CONCURRENCY = int(os.getenv('AI_MIN_CONCURRENCY', 1))
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', 16))
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', 4))
+AI_RETRY_BASE_DELAY = float(os.getenv('AI_RETRY_BASE_DELAY', 1))
+AI_RATE_LIMIT_BASE_DELAY = float(os.getenv('AI_RATE_LIMIT_BASE_DELAY', 4))
+AI_RETRY_MAX_DELAY = float(os.getenv('AI_RETRY_MAX_DELAY', 60))
+
+# Circuit breaker: stop calling the AI after consecutive failures, probing again after the timeout.
+# Story chunks saved meanwhile keep the original text and are upgraded by a later job.
+AI_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('AI_CIRCUIT_FAILURE_THRESHOLD', 5))
+AI_CIRCUIT_RESET_TIMEOUT = float(os.getenv('AI_CIRCUIT_RESET_TIMEOUT', 30))
+AI_UPGRADE_RETRY_DELAY = int(os.getenv('AI_UPGRADE_RETRY_DELAY', 300))
+AI_UPGRADE_MAX_ROUNDS = int(os.getenv('AI_UPGRADE_MAX_ROUNDS', 12))
+
+# Document themes: top THEME_COUNT terms by TF-IDF against the corpus (manage.py recompute_themes)
+THEME_COUNT = int(os.getenv('THEME_COUNT', 10))
+THEME_MIN_TERM_COUNT = int(os.getenv('THEME_MIN_TERM_COUNT', 3))
+THEME_BATCH_SIZE = int(os.getenv('THEME_BATCH_SIZE', 500))
+
+# Full-text chunk search (SQLite FTS5 or a Postgres tsvector index, see documents.search)
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 20))
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', 100))
+# Snippet length, clamped to 2-64 words
+SEARCH_SNIPPET_WORDS = int(os.getenv('SEARCH_SNIPPET_WORDS', 24))
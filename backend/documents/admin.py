@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import AICallRecord
 
-# Register your models here.
+@admin.register(AICallRecord)
+class AICallRecordAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'caller', 'user', 'document', 'cache', 'outcome',
+                    'call_count', 'prompt_tokens', 'response_tokens', 'latency_ms', 'retries')
+    list_filter = ('caller', 'cache', 'outcome', 'model_name')
+    search_fields = ('user__username', 'document__title')
+    raw_id_fields = ('user', 'document')
@@ -0,0 +1,143 @@
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from .models import AICallRecord
+
+# Who the AI calls made in this context are for
+_call_context = ContextVar('ai_call_context', default=None)
+# The call being measured right now, so the scheduler and backend can add to it
+_current_call = ContextVar('ai_current_call', default=None)
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1 if text else 0
+
+@contextmanager
+def ai_call_context(caller, user_id=None, document_id=None):
+    """Attribute AI calls made inside the block to caller, user and document
+
+    Context variables follow the code into ordered_map threads and asyncio
+    tasks, so calls made there are attributed too.
+    """
+    token = _call_context.set({'caller': caller, 'user_id': user_id, 'document_id': document_id})
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+def new_record(model_name, prompt, cache):
+    """Start an unsaved record for a call in the current context"""
+    context = _call_context.get() or {'caller': 'other', 'user_id': None, 'document_id': None}
+    return AICallRecord(
+        user_id=context['user_id'],
+        document_id=context['document_id'],
+        caller=context['caller'],
+        model_name=model_name,
+        cache=cache,
+        prompt_chars=len(prompt),
+        prompt_tokens=estimate_tokens(prompt)
+    )
+
+def finish_record(record, response, started=None, fallback=False):
+    """Fill in the response side of a record and save it"""
+    record.response_chars = len(response)
+    record.response_tokens = record.response_tokens or estimate_tokens(response)
+    record.outcome = AICallRecord.FALLBACK if fallback else AICallRecord.OK
+    if started is not None:
+        record.latency_ms = int((time.monotonic() - started) * 1000)
+    try:
+        record.save()
+    except Exception as e:
+        # Accounting must never break the call it measures
+        print(f"🤖 Could not save AI call record: {e}")
+
+class CacheHitTally:
+    """Counts cache hits in memory, saving one aggregated record per context every flush_interval
+
+    A hit answered from the in-process cache shouldn't cost a database write.
+    """
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._tallies = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, model_name, prompt, response):
+        context = _call_context.get() or {'caller': 'other', 'user_id': None, 'document_id': None}
+        key = (context['user_id'], context['document_id'], context['caller'], model_name)
+        with self._lock:
+            tally = self._tallies.setdefault(key, [0, 0, 0, 0, 0])
+            tally[0] += 1
+            tally[1] += len(prompt)
+            tally[2] += estimate_tokens(prompt)
+            tally[3] += len(response)
+            tally[4] += estimate_tokens(response)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Save the hits counted so far"""
+        with self._lock:
+            tallies, self._tallies = self._tallies, {}
+            self._last_flush = time.monotonic()
+        if not tallies:
+            return
+        try:
+            AICallRecord.objects.bulk_create([
+                AICallRecord(
+                    user_id=user_id, document_id=document_id, caller=caller, model_name=model_name,
+                    cache=AICallRecord.HIT, call_count=calls, prompt_chars=prompt_chars, prompt_tokens=prompt_tokens,
+                    response_chars=response_chars, response_tokens=response_tokens
+                )
+                for (user_id, document_id, caller, model_name),
+                    (calls, prompt_chars, prompt_tokens, response_chars, response_tokens) in tallies.items()
+            ])
+        except Exception as e:
+            # Accounting must never break the call it measures
+            print(f"🤖 Could not save AI cache hit records: {e}")
+
+_hit_tally = None
+_hit_tally_lock = threading.Lock()
+
+def get_hit_tally():
+    """The process-wide cache hit tally, flushed at exit"""
+    global _hit_tally
+    if _hit_tally is None:
+        with _hit_tally_lock:
+            if _hit_tally is None:
+                _hit_tally = CacheHitTally(settings.AI_HIT_FLUSH_INTERVAL)
+                atexit.register(_hit_tally.flush)
+    return _hit_tally
+
+def record_cache_hit(model_name, prompt, response):
+    """Count a call in the current context answered from the cache"""
+    get_hit_tally().add(model_name, prompt, response)
+
+@contextmanager
+def measure_call(record):
+    """Make record the current call, so retries and reported usage are added to it"""
+    token = _current_call.set(record)
+    try:
+        yield record
+    finally:
+        _current_call.reset(token)
+
+def note_retry():
+    """Count a retry against the call being measured"""
+    record = _current_call.get()
+    if record is not None:
+        record.retries += 1
+
+def report_usage(prompt_tokens=None, response_tokens=None):
+    """Record token counts the backend reported for the call being measured"""
+    record = _current_call.get()
+    if record is None:
+        return
+    if prompt_tokens:
+        record.prompt_tokens = prompt_tokens
+    if response_tokens:
+        record.response_tokens = response_tokens
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .ai_accounting import report_usage
+from .ai_client import get_gemini_client, shutdown_gemini_client
+
+class GeminiBackend:
+    """Google Gemini through the shared google-genai client"""
+    model_name = 'gemini-2.5-flash'
+
+    def generate(self, prompt):
+        """Return the full response text for prompt"""
+        response = get_gemini_client().models.generate_content(model=self.model_name, contents=prompt)
+        usage = response.usage_metadata
+        if usage:
+            report_usage(usage.prompt_token_count, usage.candidates_token_count)
+        return response.text or ''
+
+    async def stream(self, prompt):
+        """Async generator yielding response text as it is produced"""
+        stream = await get_gemini_client().aio.models.generate_content_stream(
+            model=self.model_name, contents=prompt
+        )
+        async for response in stream:
+            if response.text:
+                yield response.text
+
+    def close(self):
+        shutdown_gemini_client()
+
+class OfflineBackendError(Exception):
+    """Simulated backend failure, shaped like google-genai's APIError for classify_error"""
+
+    def __init__(self, code, status):
+        super().__init__(f"{code} {status} (simulated)")
+        self.code = code
+        self.status = status
+
+class OfflineBackend:
+    """Deterministic local stand-in for benchmarks and tests without network access
+
+    Responses depend only on the prompt. Latency, failures (503) and rate
+    limiting (429) are simulated from AI_OFFLINE_* settings with a seeded
+    generator, so runs with the same seed and prompts are reproducible.
+    """
+    model_name = 'offline'
+    section_marker = re.compile(r'^=== SECTION (\d+) ===$', re.MULTILINE)
+    story_words = 60
+
+    def __init__(self, latency_ms=None, jitter_ms=None, error_rate=None, rate_limit_rate=None, seed=None):
+        self.latency_ms = settings.AI_OFFLINE_LATENCY_MS if latency_ms is None else latency_ms
+        self.jitter_ms = settings.AI_OFFLINE_JITTER_MS if jitter_ms is None else jitter_ms
+        self.error_rate = settings.AI_OFFLINE_ERROR_RATE if error_rate is None else error_rate
+        self.rate_limit_rate = settings.AI_OFFLINE_RATE_LIMIT_RATE if rate_limit_rate is None else rate_limit_rate
+        self.seed = settings.AI_OFFLINE_SEED if seed is None else seed
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        delay, error = self._simulate(prompt)
+        time.sleep(delay)
+        if error:
+            raise error
+        return self.respond(prompt)
+
+    async def stream(self, prompt):
+        delay, error = self._simulate(prompt)
+        if error:
+            await asyncio.sleep(delay)
+            raise error
+        words = self.respond(prompt).split(' ')
+        pieces = [' '.join(words[i:i + 10]) + ' ' for i in range(0, len(words), 10)]
+        for piece in pieces:
+            await asyncio.sleep(delay / len(pieces))
+            yield piece
+
+    def close(self):
+        pass
+
+    def respond(self, prompt):
+        """The deterministic response text for prompt"""
+        sections = self.section_marker.split(prompt)
+        if len(sections) > 1:
+            # Batched story prompt: answer every section with its marker
+            numbers = sections[1::2]
+            bodies = sections[2::2]
+            return '\n\n'.join(
+                f"=== SECTION {number} ===\n{self._story(body)}" for number, body in zip(numbers, bodies)
+            )
+        return self._story(prompt)
+
+    def _story(self, text):
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:8]
+        words = text.split()
+        return f"[offline {digest}] " + ' '.join(words[-self.story_words:])
+
+    def _simulate(self, prompt):
+        """Latency and error for this attempt at prompt, reproducible from the seed"""
+        with self._lock:
+            attempt = self._attempts.get(prompt, 0)
+            self._attempts[prompt] = attempt + 1
+            if len(self._attempts) > 10000:
+                self._attempts.clear()
+
+        digest = hashlib.sha256(f"{self.seed}:{attempt}:{prompt}".encode('utf-8')).digest()
+        rng = random.Random(digest)
+        delay = max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            return delay, OfflineBackendError(429, 'RESOURCE_EXHAUSTED')
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, OfflineBackendError(503, 'UNAVAILABLE')
+        return delay, None
+
+BACKENDS = {
+    'gemini': GeminiBackend,
+    'offline': OfflineBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_ai_backend():
+    """The process-wide LLM backend named by AI_BACKEND (a short name or a dotted class path)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = settings.AI_BACKEND
+                backend_class = BACKENDS.get(name) or import_string(name)
+                _backend = backend_class()
+    return _backend
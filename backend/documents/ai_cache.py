@@ -0,0 +1,100 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .models import TransformationCacheEntry
+
+class TransformationCache:
+    """Two-tier cache of AI responses: an in-process LRU in front of a shared DB table"""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or settings.AI_CACHE_MAX_ENTRIES
+        self.ttl = ttl or settings.AI_CACHE_TTL
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'db_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def make_key(*parts):
+        """Stable hash of the inputs that determine a response"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+
+        row = TransformationCacheEntry.objects.filter(
+            key=key, expires_at__gt=timezone.now()
+        ).values_list('response', 'expires_at').first()
+        if row is None:
+            with self._lock:
+                self.counters['misses'] += 1
+            return None
+
+        response, expires_at = row
+        TransformationCacheEntry.objects.filter(key=key).update(hits=F('hits') + 1)
+        with self._lock:
+            self.counters['db_hits'] += 1
+        self._remember(key, response, expires_at.timestamp())
+        return response
+
+    def set(self, key, response):
+        """Store a response in both tiers"""
+        expires_at = timezone.now() + timedelta(seconds=self.ttl)
+        TransformationCacheEntry.objects.bulk_create(
+            [TransformationCacheEntry(key=key, response=response, expires_at=expires_at)],
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['response', 'expires_at']
+        )
+        self._remember(key, response, expires_at.timestamp())
+
+    def _remember(self, key, response, expires_at):
+        with self._lock:
+            self._entries[key] = (response, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def prune(self):
+        """Delete expired entries from the shared table; returns how many were removed"""
+        with self._lock:
+            now = time.time()
+            for key in [key for key, entry in self._entries.items() if entry[1] <= now]:
+                del self._entries[key]
+        deleted, _ = TransformationCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+    def stats(self):
+        """Hit and miss counters for this process"""
+        with self._lock:
+            counters = dict(self.counters)
+            counters['memory_entries'] = len(self._entries)
+        lookups = counters['memory_hits'] + counters['db_hits'] + counters['misses']
+        counters['hit_rate'] = (counters['memory_hits'] + counters['db_hits']) / lookups if lookups else 0.0
+        return counters
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_transformation_cache():
+    """The process-wide transformation cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TransformationCache()
+    return _cache
@@ -0,0 +1,56 @@
+import atexit
+import os
+import threading
+import httpx
+from django.conf import settings
+from google import genai
+from google.genai import types
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+def _create_client():
+    """Build a Gemini client with an explicit, bounded connection pool"""
+    print("🚀 Initializing Google Gemini AI...")
+    limits = httpx.Limits(
+        max_connections=settings.GEMINI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.GEMINI_MAX_CONNECTIONS
+    )
+    client = genai.Client(
+        api_key=settings.GEMINI_API_KEY,
+        http_options=types.HttpOptions(
+            timeout=settings.GEMINI_TIMEOUT_MS,
+            client_args={'limits': limits},
+            # Used by client.aio (streaming responses under ASGI)
+            async_client_args={'limits': limits}
+        )
+    )
+    print("✅ Gemini AI ready!")
+    return client
+
+def get_gemini_client():
+    """The process-wide Gemini client, created on first use"""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            # A forked worker must not share its parent's connections
+            if _client is None or _client_pid != pid:
+                _client = _create_client()
+                _client_pid = pid
+    return _client
+
+def shutdown_gemini_client():
+    """Close the shared client and its connection pool"""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            try:
+                _client.close()
+            except Exception as e:
+                print(f"🤖 Error closing Gemini client: {e}")
+        _client = None
+        _client_pid = None
+
+atexit.register(shutdown_gemini_client)
@@ -1,36 +1,140 @@
-from google import genai
-from django.conf import settings
 import re
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from datetime import datetime, timedelta
+from .ai_cache import get_transformation_cache
+from .models import AICallRecord
+from .ai_accounting import finish_record, measure_call, new_record, record_cache_hit
+from .ai_backends import get_ai_backend
+from .ai_resilience import RATE_LIMITED, CircuitOpenError, classify_error, get_ai_scheduler
+from .single_flight import get_single_flight
+
+# Bump whenever a prompt template changes so cached responses aren't reused
+PROMPT_TEMPLATE_VERSION = 1
+# Rough output size of one 200-300 word story, for batch token budgets
+STORY_OUTPUT_TOKENS = 400
+SECTION_MARKER = re.compile(r'^[ \t]*=+[ \t]*SECTION[ \t]+(\d+)[ \t]*=+[ \t]*$', re.MULTILINE | re.IGNORECASE)
+
+class FallbackText(str):
+    """Placeholder text returned when the AI call failed, so callers can flag it"""
+    is_fallback = True
+
+def is_fallback(text):
+    return getattr(text, 'is_fallback', False)
 
 class AIStoryTransformer:
-    def __init__(self):
-        print("🚀 Initializing Google Gemini AI...")
-        # The configuration method remains the same
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        # The model initialization remains the same
-        self.model = genai.GenerativeModel('gemini-2.5-flash') # Recommended update to a current model
-        print("✅ Gemini AI ready!")
+    @property
+    def backend(self):
+        # Selected by AI_BACKEND; shared per process
+        return get_ai_backend()
     
     def transform_to_story(self, text, user_interests, reading_level='casual'):
         """Transform plain text into engaging story using Gemini"""
         cleaned_text = self.clean_text(text)
         prompt = self.create_story_prompt(cleaned_text, user_interests, reading_level)
-        story_content = self.generate_with_gemini(prompt)
+        cache_key = self.cache_key('story', cleaned_text, user_interests, reading_level)
+        story_content = self.generate_with_gemini(prompt, cache_key)
         return story_content
     
+    def transform_batch(self, texts, user_interests, reading_level='casual'):
+        """Transform several sections with one prompt, returning one story per section in order
+
+        Sections already in the cache are answered from it. If the batched
+        response can't be split back into sections, the sections it is missing
+        are transformed one at a time instead.
+        """
+        cache = get_transformation_cache()
+        cleaned = [self.clean_text(text) for text in texts]
+        keys = [self.cache_key('story', text, user_interests, reading_level) for text in cleaned]
+        stories = [cache.get(key) for key in keys]
+        pending = [i for i, story in enumerate(stories) if story is None]
+        for text, story in zip(cleaned, stories):
+            if story is not None:
+                prompt = self.create_story_prompt(text, user_interests, reading_level)
+                record_cache_hit(self.backend.model_name, prompt, story)
+        
+        if len(pending) > 1:
+            prompt = self.create_batch_story_prompt([cleaned[i] for i in pending], user_interests, reading_level)
+            response = self.generate_with_gemini(prompt)
+            if is_fallback(response):
+                # The backend is failing; don't multiply the load with per-section calls
+                return [story if story is not None else response for story in stories]
+            
+            parsed = self.parse_batch_response(response, len(pending))
+            for i, story in zip(pending, parsed):
+                if story:
+                    cache.set(keys[i], story)
+                    stories[i] = story
+        
+        for i, story in enumerate(stories):
+            if story is None:
+                stories[i] = self.transform_to_story(texts[i], user_interests, reading_level)
+        return stories
+    
+    def batch_sections(self, items, section_of=lambda item: item):
+        """Group items into batches whose sections fit in one prompt
+
+        Items whose section is None cost nothing and stay in order with the rest.
+        """
+        batch = []
+        batch_sections = 0
+        batch_tokens = 0
+        for item in items:
+            section = section_of(item)
+            if section is not None:
+                tokens = self.story_tokens(section)
+                if batch_sections and (batch_tokens + tokens > settings.STORY_BATCH_TOKEN_BUDGET or
+                                       batch_sections >= settings.STORY_BATCH_MAX_SECTIONS):
+                    yield batch
+                    batch = []
+                    batch_sections = 0
+                    batch_tokens = 0
+                batch_sections += 1
+                batch_tokens += tokens
+            batch.append(item)
+        if batch:
+            yield batch
+    
+    def story_tokens(self, text):
+        """Estimated prompt plus response tokens for transforming one section"""
+        return len(self.clean_text(text)) // 4 + STORY_OUTPUT_TOKENS
+    
     def add_contextual_enhancements(self, text, user_interests, reading_level='casual'):
         """Add contextual explanations and real-world examples"""
         prompt = self.create_enhancement_prompt(text, user_interests, reading_level)
-        enhanced_content = self.generate_with_gemini(prompt)
+        cache_key = self.cache_key('enhance', text, user_interests, reading_level)
+        enhanced_content = self.generate_with_gemini(prompt, cache_key)
         return enhanced_content
     
     def highlight_connections(self, text, user_interests):
         """Highlight connections to user's interests"""
         prompt = self.create_connection_prompt(text, user_interests)
-        connections = self.generate_with_gemini(prompt)
+        cache_key = self.cache_key('connections', text, user_interests)
+        connections = self.generate_with_gemini(prompt, cache_key)
         return connections
     
+    def stream_contextual_enhancements(self, text, user_interests, reading_level='casual'):
+        """Async iterator over pieces of the contextual enhancement as they are generated"""
+        prompt = self.create_enhancement_prompt(text, user_interests, reading_level)
+        cache_key = self.cache_key('enhance', text, user_interests, reading_level)
+        return self.stream_with_gemini(prompt, cache_key)
+    
+    def stream_connections(self, text, user_interests):
+        """Async iterator over pieces of the interest connections as they are generated"""
+        prompt = self.create_connection_prompt(text, user_interests)
+        cache_key = self.cache_key('connections', text, user_interests)
+        return self.stream_with_gemini(prompt, cache_key)
+    
+    def cache_key(self, kind, text, user_interests, reading_level=None):
+        """Cache key for a prompt, shared by every user and document with the same inputs"""
+        normalized_text = re.sub(r'\s+', ' ', text.strip())
+        return get_transformation_cache().make_key(
+            kind, PROMPT_TEMPLATE_VERSION, self.backend.model_name,
+            normalized_text, list(user_interests or []), reading_level
+        )
+    
     def clean_text(self, text):
         """Clean and prepare text for AI processing"""
         text = re.sub(r'\s+', ' ', text.strip())
@@ -57,6 +161,43 @@ Transformed story:"""
         
         return prompt
     
+    def create_batch_story_prompt(self, texts, interests, reading_level):
+        """Create one prompt that transforms several sections, keeping them apart with markers"""
+        primary_interest = interests[0] if interests else 'general'
+        sections = '\n\n'.join(
+            f"=== SECTION {number} ===\n{text}" for number, text in enumerate(texts, 1)
+        )
+        
+        prompt = f"""Transform each of the following {len(texts)} text sections into an engaging, narrative story format suitable for {reading_level} reading level with focus on {primary_interest}. 
+        
+Make each one:
+- Conversational and engaging
+- Easy to understand
+- Maintain the core information
+- Add context and storytelling elements
+- Keep it concise (200-300 words)
+- Self-contained; don't refer to the other sections
+        
+Answer with exactly {len(texts)} stories, in order, each starting on its own line with its marker (=== SECTION 1 ===, === SECTION 2 ===, ...). Don't add anything else.
+        
+{sections}
+        
+Transformed stories:"""
+        
+        return prompt
+    
+    def parse_batch_response(self, response, count):
+        """Split a batched response into count stories; sections that are missing come back as None"""
+        stories = [None] * count
+        markers = list(SECTION_MARKER.finditer(response))
+        for marker, following in zip(markers, markers[1:] + [None]):
+            number = int(marker.group(1))
+            end = following.start() if following else len(response)
+            story = response[marker.end():end].strip()
+            if 1 <= number <= count and stories[number - 1] is None and story:
+                stories[number - 1] = story
+        return stories
+    
     def create_enhancement_prompt(self, text, interests, reading_level):
         """Create prompt for contextual enhancements"""
         interests_str = ', '.join(interests[:3]) if interests else 'general'
@@ -92,20 +233,111 @@ Connections:"""
         
         return prompt
     
-    def generate_with_gemini(self, prompt):
-        """Generate content using Gemini API"""
+    def generate_with_gemini(self, prompt, cache_key=None):
+        """Generate content using Gemini API, answering repeated prompts from the cache"""
+        cache = get_transformation_cache() if cache_key else None
+        if cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                record_cache_hit(self.backend.model_name, prompt, cached)
+                return cached
+        
+        called = []
+        
+        def call():
+            called.append(True)
+            return self._generate_uncached(prompt, cache, cache_key)
+        
+        # Identical prompts already in flight (here or in another worker) share one call
+        flight_key = cache_key or get_transformation_cache().make_key('prompt', self.backend.model_name, prompt)
+        content = get_single_flight().do(
+            flight_key, call, recheck=(lambda: cache.get(cache_key)) if cache else None
+        )
+        if not called:
+            record = new_record(self.backend.model_name, prompt, AICallRecord.COALESCED)
+            finish_record(record, content, fallback=is_fallback(content))
+        return content
+    
+    def _generate_uncached(self, prompt, cache, cache_key):
+        record = new_record(self.backend.model_name, prompt, AICallRecord.MISS)
+        started = time.monotonic()
+        with measure_call(record):
+            try:
+                # Rate limited, concurrency limited and retried with backoff
+                story_content = get_ai_scheduler().call(lambda: self.backend.generate(prompt)).strip()
+            except CircuitOpenError:
+                # Backend is down; answer at once instead of waiting out another failure
+                story_content = ''
+            except Exception as e:
+                print(f"🤖 AI generation failed: {e}")
+                story_content = ''
+        
+        if not story_content:
+            story_content = self.create_fallback()
+        elif cache:
+            # Fallbacks are never cached, so a later call can still get a real answer
+            cache.set(cache_key, story_content)
+        
+        finish_record(record, story_content, started, fallback=is_fallback(story_content))
+        return story_content
+    
+    async def stream_with_gemini(self, prompt, cache_key=None):
+        """Async generator yielding response text as Gemini streams it
+
+        Shares the response cache with generate_with_gemini. Only the initial
+        request is rate limited; a stream that breaks off part way just ends.
+        """
+        cache = get_transformation_cache() if cache_key else None
+        if cache:
+            cached = await sync_to_async(cache.get)(cache_key)
+            if cached is not None:
+                await sync_to_async(record_cache_hit)(self.backend.model_name, prompt, cached)
+                yield cached
+                return
+        
+        scheduler = get_ai_scheduler()
+        record = new_record(self.backend.model_name, prompt, AICallRecord.MISS)
+        started = time.monotonic()
+        if not scheduler.breaker.allow():
+            fallback = self.create_fallback()
+            await sync_to_async(finish_record)(record, fallback, started, fallback=True)
+            yield fallback
+            return
+        await sync_to_async(scheduler.bucket.acquire, thread_sensitive=False)()
+        
+        parts = []
         try:
-            # The generate_content call remains the same
-            response = self.model.generate_content(prompt)
-            story_content = response.text.strip()
-            return story_content if story_content else self.create_fallback()
+            async for text in self.backend.stream(prompt):
+                parts.append(text)
+                yield text
         except Exception as e:
-            print(f"🤖 Gemini generation failed: {e}")
-            return self.create_fallback()
+            print(f"🤖 AI streaming failed: {e}")
+            rate_limited = classify_error(e) == RATE_LIMITED
+            if rate_limited:
+                scheduler.limiter.on_throttle()
+            scheduler.breaker.on_failure(rate_limited=rate_limited)
+            if not parts:
+                fallback = self.create_fallback()
+                await sync_to_async(finish_record)(record, fallback, started, fallback=True)
+                yield fallback
+                return
+        
+        content = ''.join(parts).strip()
+        if not content:
+            fallback = self.create_fallback()
+            await sync_to_async(finish_record)(record, fallback, started, fallback=True)
+            yield fallback
+            return
+        
+        scheduler.limiter.on_success()
+        scheduler.breaker.on_success()
+        await sync_to_async(finish_record)(record, content, started)
+        if cache:
+            await sync_to_async(cache.set)(cache_key, content)
     
     def create_fallback(self):
         """Simple fallback when AI fails"""
-        return "This content is being processed for an enhanced reading experience. The original information has been preserved and will be presented in an engaging format."
+        return FallbackText("This content is being processed for an enhanced reading experience. The original information has been preserved and will be presented in an engaging format.")
     
     def generate_recommendations(self, user_interests, reading_history):
         """Generate content recommendations based on interests and history"""
@@ -127,7 +359,7 @@ Recommendations:"""
         
 Summary:"""
         
-        return self.generate_with_gemini(prompt)
+        return self.generate_with_gemini(prompt, self.cache_key('summary', text, [], max_length))
     
     def extract_key_points(self, text, num_points=5):
         """Extract key points from the text"""
@@ -165,4 +397,16 @@ Rewritten text:"""
         
 Questions:"""
         
-        return self.generate_with_gemini(prompt)
\ No newline at end of file
+        return self.generate_with_gemini(prompt)
+
+_transformer = None
+_transformer_lock = threading.Lock()
+
+def get_story_transformer():
+    """The process-wide AIStoryTransformer"""
+    global _transformer
+    if _transformer is None:
+        with _transformer_lock:
+            if _transformer is None:
+                _transformer = AIStoryTransformer()
+    return _transformer
\ No newline at end of file
@@ -0,0 +1,227 @@
+import random
+import threading
+import time
+import httpx
+from django.conf import settings
+from .ai_accounting import note_retry
+
+RATE_LIMITED = 'rate_limited'
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+def classify_error(error):
+    """Sort an AI backend error into rate_limited, transient or permanent"""
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    status = str(getattr(error, 'status', '') or '')
+
+    if code == 429 or 'RESOURCE_EXHAUSTED' in status:
+        return RATE_LIMITED
+    if code in (408, 500, 502, 503, 504) or 'UNAVAILABLE' in status:
+        return TRANSIENT
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, TimeoutError, ConnectionError)):
+        return TRANSIENT
+    return PERMANENT
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the request rate"""
+
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class AdaptiveConcurrencyLimiter:
+    """Caps in-flight calls, halving the cap when throttled and growing it back on success"""
+
+    def __init__(self, min_limit, max_limit):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        """Additive increase: one more slot after a full window of successes"""
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def on_throttle(self):
+        """Multiplicative decrease when the backend pushes back"""
+        with self._condition:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._successes = 0
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend that keeps failing"""
+
+class CircuitBreaker:
+    """Stops calling a failing backend, letting one probe call through after a cool-down
+
+    Rate limiting doesn't count as a failure (the scheduler backs off for
+    that) unless it hits the probe.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        """Whether calls are currently being short-circuited"""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self):
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def on_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print("🤖 AI circuit closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def on_failure(self, rate_limited=False):
+        with self._lock:
+            if self.state == self.CLOSED:
+                if rate_limited:
+                    return
+                self.failures += 1
+                if self.failures < self.failure_threshold:
+                    return
+            if self.state != self.OPEN:
+                print(f"🤖 AI circuit opened after {self.failures} failure(s)")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+class RetryPolicy:
+    """How often and how patiently to retry one class of error"""
+
+    def __init__(self, max_retries, base_delay, max_delay):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+class AICallScheduler:
+    """Runs AI calls through a circuit breaker, shared rate limit, adaptive concurrency and retries"""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(
+            settings.AI_CIRCUIT_FAILURE_THRESHOLD,
+            settings.AI_CIRCUIT_RESET_TIMEOUT
+        )
+        self.bucket = TokenBucket(
+            settings.AI_REQUESTS_PER_MINUTE / 60.0,
+            max(1, settings.AI_BURST)
+        )
+        self.limiter = AdaptiveConcurrencyLimiter(
+            settings.AI_MIN_CONCURRENCY,
+            settings.AI_MAX_CONCURRENCY
+        )
+        self.policies = {
+            RATE_LIMITED: RetryPolicy(settings.AI_MAX_RETRIES, settings.AI_RATE_LIMIT_BASE_DELAY, settings.AI_RETRY_MAX_DELAY),
+            TRANSIENT: RetryPolicy(settings.AI_MAX_RETRIES, settings.AI_RETRY_BASE_DELAY, settings.AI_RETRY_MAX_DELAY),
+            PERMANENT: RetryPolicy(0, 0, 0),
+        }
+
+    def call(self, func):
+        """Call func(), retrying rate-limited and transient failures with backoff
+
+        Raises CircuitOpenError without calling func while the backend is
+        considered down.
+        """
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError("AI backend circuit is open")
+            self.bucket.acquire()
+            with self.limiter:
+                try:
+                    result = func()
+                except Exception as e:
+                    error_class = classify_error(e)
+                    if error_class == RATE_LIMITED:
+                        self.limiter.on_throttle()
+                    self.breaker.on_failure(rate_limited=error_class == RATE_LIMITED)
+                    policy = self.policies[error_class]
+                    if attempt >= policy.max_retries:
+                        raise
+                    delay = policy.backoff(attempt)
+                else:
+                    self.limiter.on_success()
+                    self.breaker.on_success()
+                    return result
+
+            # Back off outside the concurrency slot so other calls can use it
+            print(f"🤖 AI call failed ({error_class}), retrying in {delay:.1f}s")
+            note_retry()
+            time.sleep(delay)
+            attempt += 1
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_ai_scheduler():
+    """The process-wide AI call scheduler"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = AICallScheduler()
+    return _scheduler
@@ -0,0 +1,60 @@
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.db import connection
+
+def _call(func, item):
+    try:
+        return func(item)
+    finally:
+        # Worker threads get their own database connection; don't leak it
+        connection.close()
+
+def ordered_map(func, items, max_in_flight):
+    """Apply func to items on a thread pool, yielding results in input order
+
+    At most max_in_flight calls run at once and items are pulled lazily, so
+    memory stays bounded however long the input is. A call that raises
+    stops the map: its exception is raised in its place in the order and
+    calls that haven't started are cancelled.
+    """
+    if max_in_flight <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    # Queue a little past the limit so the pool stays busy while we wait on the oldest call
+    window = max_in_flight * 2
+    items = iter(items)
+    pending = deque()
+    exhausted = False
+    error = None
+
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                except Exception as e:
+                    # Hand back everything submitted before the input failed, then raise
+                    exhausted = True
+                    error = e
+                    break
+                # Carry context variables (e.g. AI call attribution) into the worker thread
+                context = contextvars.copy_context()
+                pending.append(executor.submit(context.run, _call, func, item))
+
+            if not pending:
+                break
+            # A failed call raises here, in order, before any later result is handed out
+            yield pending.popleft().result()
+
+        if error is not None:
+            raise error
+    finally:
+        # Calls that haven't started yet are dropped after a failure or an early stop
+        executor.shutdown(cancel_futures=True)
@@ -1,33 +1,54 @@
 from .models import Document, ContentChunk
-from .ai_processor import AIStoryTransformer
-import re
+from .ai_processor import get_story_transformer
+from .themes import ThemeExtractor, extract_terms
 from collections import Counter
 
+class TextStatistics:
+    """Running word, sentence and term counts over text fed in one piece at a time"""
+    
+    def __init__(self):
+        self.words = 0
+        self.sentence_breaks = 0
+        self.sentence_words = 0
+        self.terms = Counter()
+    
+    def add(self, text):
+        self.words += len(text.split())
+        # Same figures as splitting the whole text on '.', without ever joining it
+        self.sentence_breaks += text.count('.')
+        self.sentence_words += len(text.replace('.', ' ').split())
+        self.terms.update(extract_terms(text))
+    
+    @property
+    def avg_sentence_length(self):
+        return self.sentence_words / (self.sentence_breaks + 1)
+
 class ContentIntelligenceEngine:
     """Smart content analysis and processing engine"""
     
     def __init__(self):
-        self.ai_processor = AIStoryTransformer()
+        self.ai_processor = get_story_transformer()
+        self.theme_extractor = ThemeExtractor()
     
     def analyze_document_structure(self, document):
-        """Analyze document structure and extract metadata"""
-        chunks = document.chunks.all()
+        """Analyze document structure and extract metadata in one streaming pass over the text"""
+        stats = TextStatistics()
         
-        # Calculate document metrics
-        total_words = sum(len(chunk.content.split()) for chunk in chunks)
-        estimated_reading_time = max(1, total_words // 200)  # 200 WPM average
+        # Measure the text the reader actually sees, one chunk at a time so
+        # memory doesn't grow with the document
+        for chunk in document.chunks.iterator():
+            stats.add(chunk.content)
         
-        # Extract themes and topics
-        all_text = ' '.join(chunk.content for chunk in chunks)
-        themes = self._extract_themes(all_text)
+        # Calculate document metrics
+        estimated_reading_time = max(1, stats.words // 200)  # 200 WPM average
         
         # Update document metadata
+        self.theme_extractor.apply_themes(document, self._extract_themes(document, stats))
         document.metadata.update({
-            'total_words': total_words,
+            'total_words': stats.words,
             'estimated_reading_time': estimated_reading_time,
-            'themes': themes,
-            'content_complexity': self._assess_complexity(all_text),
-            'structure_type': self._detect_structure_type(chunks)
+            'content_complexity': self._assess_complexity(stats),
+            'structure_type': self._detect_structure_type(document.chunks.all())
         })
         document.save()
         
@@ -53,17 +74,14 @@ class ContentIntelligenceEngine:
         
         return chunks
     
-    def _extract_themes(self, text):
-        """Extract key themes from text"""
-        # Simple keyword extraction - could be enhanced with NLP
-        words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
-        common_words = Counter(words).most_common(10)
-        return [word for word, count in common_words if count > 2]
+    def _extract_themes(self, document, stats):
+        """Extract key themes from the term counts, weighted against the rest of the corpus"""
+        self.theme_extractor.index_document(document, stats.terms)
+        return self.theme_extractor.themes_for(stats.terms)
     
-    def _assess_complexity(self, text):
+    def _assess_complexity(self, stats):
         """Assess content complexity level"""
-        sentences = text.split('.')
-        avg_sentence_length = sum(len(s.split()) for s in sentences) / len(sentences)
+        avg_sentence_length = stats.avg_sentence_length
         
         if avg_sentence_length < 15:
             return 'simple'
@@ -74,7 +92,8 @@ class ContentIntelligenceEngine:
     
     def _detect_structure_type(self, chunks):
         """Detect document structure type"""
-        if len(chunks) < 5:
+        # count() and slices query the database instead of loading every chunk
+        if chunks.count() < 5:
             return 'short_form'
         elif any('chapter' in chunk.content.lower() for chunk in chunks[:3]):
             return 'book_like'
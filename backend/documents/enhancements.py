@@ -0,0 +1,154 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .ai_cache import TransformationCache
+from .ai_accounting import ai_call_context
+from .ai_backends import get_ai_backend
+from .ai_processor import PROMPT_TEMPLATE_VERSION, get_story_transformer, is_fallback
+from .concurrency import ordered_map
+from .models import ChunkEnhancement, ContentChunk, Document, ProcessingJob, ReadingSession
+
+def profile_key(user_interests, reading_level):
+    """Key for the reader profile an enhancement is written for"""
+    return TransformationCache.make_key(
+        'enhancement', PROMPT_TEMPLATE_VERSION, get_ai_backend().model_name, list(user_interests or []), reading_level
+    )
+
+def get_stored_enhancement(chunk, user_interests, reading_level):
+    """The precomputed enhancement of chunk for this profile, or None"""
+    return ChunkEnhancement.objects.filter(
+        chunk=chunk, profile_key=profile_key(user_interests, reading_level)
+    ).first()
+
+def generate_enhancement(chunk, user_interests, reading_level):
+    """(enhanced_content, connections) for chunk and this profile, or None if the AI call fell back
+
+    Only calls the AI, so it's safe to run on worker threads.
+    """
+    ai_transformer = get_story_transformer()
+    enhanced_content = ai_transformer.add_contextual_enhancements(chunk.content, user_interests, reading_level)
+    connections = ai_transformer.highlight_connections(chunk.content, user_interests)
+    if is_fallback(enhanced_content) or is_fallback(connections):
+        return None
+    return enhanced_content, connections
+
+def store_enhancement(chunk, user_interests, reading_level, enhanced_content, connections):
+    """Save a generated enhancement of chunk for this profile"""
+    enhancement, _ = ChunkEnhancement.objects.update_or_create(
+        chunk=chunk,
+        profile_key=profile_key(user_interests, reading_level),
+        defaults={'enhanced_content': enhanced_content, 'connections': connections}
+    )
+    return enhancement
+
+def enhance_chunk(chunk, user_interests, reading_level):
+    """Generate and store the enhancement of chunk for this profile
+
+    Returns the stored ChunkEnhancement, or None if the AI call fell back
+    (fallback text isn't worth keeping).
+    """
+    generated = generate_enhancement(chunk, user_interests, reading_level)
+    if generated is None:
+        return None
+    return store_enhancement(chunk, user_interests, reading_level, *generated)
+
+def schedule_precompute(document):
+    """Queue enhancement of a newly processed document's opening chunks, unless a job is already waiting"""
+    if not settings.ENHANCE_AFTER_INGEST:
+        return None
+    if document.reading_mode == 'story' and document.story_strategy == Document.LAZY:
+        # Lazy sections aren't written yet; read-ahead prepares them as they're reached
+        return None
+
+    waiting = ProcessingJob.objects.filter(
+        document=document, job_type=ProcessingJob.ENHANCE, status=ProcessingJob.QUEUED
+    )
+    if waiting.exists():
+        return None
+    return ProcessingJob.objects.create(document=document, job_type=ProcessingJob.ENHANCE, user=document.user)
+
+class EnhancementPrecomputer:
+    """Precomputes enhancements for the chunks around each active reader's position"""
+
+    def __init__(self, behind=None, ahead=None, active_days=None):
+        self.behind = settings.ENHANCE_PREFETCH_BEHIND if behind is None else behind
+        self.ahead = settings.ENHANCE_PREFETCH_AHEAD if ahead is None else ahead
+        self.active_days = active_days or settings.ENHANCE_ACTIVE_DAYS
+
+    def active_sessions(self):
+        """Reading sessions touched recently enough to be worth preparing for"""
+        since = timezone.now() - timedelta(days=self.active_days)
+        return ReadingSession.objects.filter(last_read_at__gte=since).select_related('user__profile')
+
+    def reader_positions(self, document=None):
+        """Yield (user, document_id, current_chunk) for active readers, of one document if given
+
+        A document's owner who hasn't opened it yet is placed at its start.
+        """
+        sessions = self.active_sessions()
+        if document is not None:
+            sessions = sessions.filter(document=document)
+
+        readers = set()
+        for session in sessions.iterator():
+            readers.add(session.user_id)
+            yield session.user, session.document_id, session.current_chunk
+        if document is not None and document.user_id not in readers:
+            yield document.user, document.id, 0
+
+    def pending_work(self, document=None):
+        """Yield (chunk, interests, reading_level) for nearby chunks without a stored enhancement"""
+        seen = set()
+        for user, document_id, position in self.reader_positions(document):
+            try:
+                user_interests = user.profile.interests
+                reading_level = user.profile.reading_level
+            except Exception:
+                continue
+
+            key = profile_key(user_interests, reading_level)
+            chunks = ContentChunk.objects.filter(
+                document_id=document_id,
+                chunk_index__gte=position - self.behind,
+                chunk_index__lte=position + self.ahead
+            ).exclude(
+                enhancements__profile_key=key
+            ).exclude(
+                # Story sections still awaiting the AI change once transformed
+                document__reading_mode='story', is_transformed=False
+            )
+            for chunk in chunks:
+                # Readers with the same profile share one enhancement
+                if (chunk.id, key) not in seen:
+                    seen.add((chunk.id, key))
+                    yield chunk, user_interests, reading_level
+
+    def run(self, document=None):
+        """Precompute everything pending (for one document if given); returns (stored, failed) counts"""
+        stored = 0
+        failed = 0
+
+        def enhance(work):
+            chunk, user_interests, reading_level = work
+            try:
+                with ai_call_context('precompute_enhancements', document_id=chunk.document_id):
+                    return work, generate_enhancement(chunk, user_interests, reading_level)
+            except Exception as e:
+                return work, e
+
+        # Workers only call the AI; saving stays on this thread so writes don't contend (SQLite locks)
+        results = ordered_map(enhance, self.pending_work(document), settings.STORY_MAX_IN_FLIGHT)
+        for (chunk, user_interests, reading_level), generated in results:
+            if isinstance(generated, Exception):
+                print(f"🤖 Couldn't enhance chunk {chunk.id}: {generated}")
+                failed += 1
+            elif generated is None:
+                failed += 1
+            else:
+                try:
+                    store_enhancement(chunk, user_interests, reading_level, *generated)
+                    stored += 1
+                except Exception as e:
+                    print(f"🤖 Couldn't store enhancement of chunk {chunk.id}: {e}")
+                    failed += 1
+        return stored, failed
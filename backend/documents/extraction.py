@@ -0,0 +1,93 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pdfplumber
+from django.conf import settings
+
+class PageProcessingError(Exception):
+    """Raised when a single page can't be extracted or processed"""
+
+    def __init__(self, page_number, message):
+        super().__init__(page_number, message)
+        self.page_number = page_number
+        self.message = message
+
+    def __str__(self):
+        return f"Page {self.page_number}: {self.message}"
+
+# forkserver is only available on Unix
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def _extract_page_range(path, start, end):
+    """Extract text from pages [start, end) of a PDF (runs in a worker process)"""
+    pages = []
+    with pdfplumber.open(path) as pdf:
+        for index in range(start, end):
+            try:
+                page = pdf.pages[index]
+                pages.append((index + 1, page.extract_text() or ""))
+                # Layout objects are cached per page; drop them as we go
+                page.close()
+            except Exception as e:
+                # Report the bad page and carry on; the caller decides whether it matters
+                pages.append((index + 1, PageProcessingError(index + 1, str(e))))
+    return pages
+
+class PageExtractionEngine:
+    """Extracts page text from PDFs, spreading page ranges across processes"""
+
+    def __init__(self, workers=None, pages_per_task=None):
+        self.workers = max(1, workers or settings.PDF_EXTRACTION_WORKERS)
+        self.pages_per_task = max(1, pages_per_task or settings.PDF_EXTRACTION_PAGES_PER_TASK)
+
+    def count_pages(self, path):
+        """Return the number of pages in the PDF"""
+        with pdfplumber.open(path) as pdf:
+            return len(pdf.pages)
+
+    def page_ranges(self, page_count, start_page=1):
+        """Split pages start_page..page_count into contiguous [start, end) index ranges"""
+        return [
+            (start, min(start + self.pages_per_task, page_count))
+            for start in range(start_page - 1, page_count, self.pages_per_task)
+        ]
+
+    def extract_pages(self, path, page_count=None, start_page=1, skip_pages=()):
+        """Yield (page_number, text) from start_page on, in page order
+
+        Pages in skip_pages are left out. Raises PageProcessingError for the
+        first other page that can't be extracted.
+        """
+        if page_count is None:
+            page_count = self.count_pages(path)
+
+        for page_num, text in self._extract_ranges(path, self.page_ranges(page_count, start_page)):
+            if page_num in skip_pages:
+                continue
+            if isinstance(text, PageProcessingError):
+                raise text
+            yield page_num, text
+
+    def _extract_ranges(self, path, ranges):
+        """Extract the given page ranges, in parallel when there is more than one"""
+        # Small documents aren't worth the cost of starting a pool
+        if self.workers == 1 or len(ranges) <= 1:
+            for start, end in ranges:
+                yield from _extract_page_range(path, start, end)
+            return
+
+        # Workers are started from a clean server process rather than forked from this one,
+        # which has AI, heartbeat and connection pool threads whose locks a fork would copy
+        executor = ProcessPoolExecutor(
+            max_workers=min(self.workers, len(ranges)),
+            mp_context=multiprocessing.get_context(_START_METHOD)
+        )
+        try:
+            # map() hands results back in submission order, so pages stay ordered
+            paths = [path] * len(ranges)
+            starts = [start for start, end in ranges]
+            ends = [end for start, end in ranges]
+            for pages in executor.map(_extract_page_range, paths, starts, ends):
+                yield from pages
+        finally:
+            # Don't keep extracting pages nobody will read after a failure
+            executor.shutdown(cancel_futures=True)
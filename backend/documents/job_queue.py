@@ -0,0 +1,200 @@
+import os
+import socket
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .ai_accounting import ai_call_context
+from .enhancements import EnhancementPrecomputer
+from .models import Document, ProcessingJob
+from .pdf_processor import PDFProcessor
+from .read_ahead import ReadAheadScheduler
+from .repair import FallbackRepairService
+
+class JobQueue:
+    """Database-backed queue of document processing jobs"""
+
+    def __init__(self, worker_id=None, lease_seconds=None):
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = lease_seconds or settings.INGEST_LEASE_SECONDS
+
+    @staticmethod
+    def enqueue(document):
+        """Queue a document for processing, reusing a job that is still waiting"""
+        job = ProcessingJob.objects.filter(
+            document=document, job_type=ProcessingJob.INGEST, status=ProcessingJob.QUEUED
+        ).first()
+        if job:
+            return job
+        return ProcessingJob.objects.create(document=document)
+
+    def _claimable(self, now):
+        """Jobs waiting in the queue (and due) or whose lease has expired with attempts left"""
+        return ProcessingJob.objects.filter(
+            Q(status=ProcessingJob.QUEUED, run_after__isnull=True) |
+            Q(status=ProcessingJob.QUEUED, run_after__lte=now) |
+            Q(status=ProcessingJob.RUNNING, leased_until__lt=now, attempts__lt=settings.INGEST_MAX_ATTEMPTS)
+        )
+
+    def fail_abandoned(self, now=None):
+        """Give up on jobs whose worker died on their last attempt (OOM, crash, SIGKILL)
+
+        fail() never runs for those, so without this they would be reclaimed
+        every time the lease expires. Returns the number of jobs failed.
+        """
+        now = now or timezone.now()
+        abandoned = ProcessingJob.objects.filter(
+            status=ProcessingJob.RUNNING, leased_until__lt=now, attempts__gte=settings.INGEST_MAX_ATTEMPTS
+        )
+        job_ids = list(abandoned.values_list('id', flat=True))
+        if not job_ids:
+            return 0
+
+        with transaction.atomic():
+            failed = abandoned.filter(id__in=job_ids).update(
+                status=ProcessingJob.FAILED,
+                leased_until=None,
+                last_error='Worker stopped responding on the last attempt',
+                updated_at=now
+            )
+            # The document would otherwise stay "processing" forever
+            Document.objects.filter(
+                jobs__id__in=job_ids, jobs__job_type=ProcessingJob.INGEST, status=Document.PROCESSING
+            ).update(status=Document.FAILED)
+        for job_id in job_ids:
+            print(f"📄 Processing job {job_id} abandoned after {settings.INGEST_MAX_ATTEMPTS} attempt(s)")
+        return failed
+
+    def lease(self):
+        """Atomically claim the most urgent, then oldest, available job, or return None"""
+        self.fail_abandoned()
+        if connection.features.has_select_for_update_skip_locked:
+            return self._lease_skip_locked()
+        return self._lease_with_timestamp()
+
+    def _lease_skip_locked(self):
+        """Claim a job with SELECT ... FOR UPDATE SKIP LOCKED (Postgres)"""
+        now = timezone.now()
+        with transaction.atomic():
+            job = self._claimable(now).select_for_update(
+                skip_locked=True
+            ).order_by('-priority', 'created_at').first()
+            if not job:
+                return None
+
+            job.status = ProcessingJob.RUNNING
+            job.leased_by = self.worker_id
+            job.leased_until = now + timedelta(seconds=self.lease_seconds)
+            job.attempts += 1
+            job.save()
+        return job
+
+    def _lease_with_timestamp(self, max_tries=5):
+        """Claim a job with a conditional UPDATE on the lease (SQLite)"""
+        for _ in range(max_tries):
+            now = timezone.now()
+            candidate = self._claimable(now).order_by('-priority', 'created_at').values_list('id', flat=True).first()
+            if candidate is None:
+                return None
+
+            # Only one worker's UPDATE can match while the job is still claimable
+            claimed = self._claimable(now).filter(id=candidate).update(
+                status=ProcessingJob.RUNNING,
+                leased_by=self.worker_id,
+                leased_until=now + timedelta(seconds=self.lease_seconds),
+                attempts=F('attempts') + 1,
+                updated_at=now
+            )
+            if claimed:
+                return ProcessingJob.objects.get(id=candidate)
+        return None
+
+    def renew(self, job):
+        """Extend the lease on a job this worker still owns"""
+        return ProcessingJob.objects.filter(
+            id=job.id, status=ProcessingJob.RUNNING, leased_by=self.worker_id
+        ).update(leased_until=timezone.now() + timedelta(seconds=self.lease_seconds))
+
+    def complete(self, job):
+        """Mark a leased job as done"""
+        ProcessingJob.objects.filter(id=job.id, status=ProcessingJob.RUNNING, leased_by=self.worker_id).update(
+            status=ProcessingJob.DONE,
+            leased_until=None,
+            updated_at=timezone.now()
+        )
+
+    def fail(self, job, error):
+        """Requeue a failed job, or give up once it has used all its attempts"""
+        give_up = job.attempts >= settings.INGEST_MAX_ATTEMPTS
+        ProcessingJob.objects.filter(id=job.id, status=ProcessingJob.RUNNING, leased_by=self.worker_id).update(
+            status=ProcessingJob.FAILED if give_up else ProcessingJob.QUEUED,
+            leased_until=None,
+            last_error=str(error)[:2000],
+            updated_at=timezone.now()
+        )
+
+class IngestWorker:
+    """Polls the job queue and runs PDF processing, read-ahead, upgrades and enhancement for leased jobs"""
+
+    def __init__(self, worker_id=None, poll_interval=None):
+        self.queue = JobQueue(worker_id)
+        self.poll_interval = poll_interval or settings.INGEST_POLL_INTERVAL
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run(self, once=False):
+        """Process jobs until stopped (or until the queue is empty with once=True)"""
+        while not self._stopping.is_set():
+            job = self.queue.lease()
+            if job is None:
+                if once:
+                    return
+                self._stopping.wait(self.poll_interval)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        """Process a single leased job, keeping its lease alive while it runs"""
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, done), daemon=True)
+        heartbeat.start()
+
+        user_id = job.user_id or Document.objects.filter(
+            id=job.document_id
+        ).values_list('user_id', flat=True).first()
+        
+        try:
+            if job.job_type == ProcessingJob.READ_AHEAD:
+                with ai_call_context('read_ahead', user_id, job.document_id):
+                    ReadAheadScheduler().run(job)
+            elif job.job_type == ProcessingJob.UPGRADE:
+                with ai_call_context('upgrade', user_id, job.document_id):
+                    FallbackRepairService().run_upgrade(job)
+            elif job.job_type == ProcessingJob.ENHANCE:
+                with ai_call_context('precompute_enhancements', user_id, job.document_id):
+                    EnhancementPrecomputer().run(job.document)
+            else:
+                with ai_call_context('story_ingest', user_id, job.document_id):
+                    PDFProcessor(job.document_id).process_document()
+            self.queue.complete(job)
+        except Document.DoesNotExist:
+            self.queue.complete(job)
+        except Exception as e:
+            print(f"📄 Processing job {job.id} failed: {e}")
+            self.queue.fail(job, e)
+        finally:
+            done.set()
+            heartbeat.join()
+
+    def _heartbeat(self, job, done):
+        """Renew the lease periodically until the job finishes"""
+        interval = max(1, self.queue.lease_seconds / 3)
+        try:
+            while not done.wait(interval):
+                self.queue.renew(job)
+        finally:
+            connection.close()
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.db import transaction
+from .ai_processor import get_story_transformer, is_fallback
+from .concurrency import ordered_map
+from .models import ChunkEnhancement, ContentChunk
+from .text_store import estimate_reading_time
+
+def story_metadata(page_num, section_index, section, story_content, user_interests, reading_level):
+    """Metadata for a chunk holding the AI story version of a section"""
+    return {
+        'page_number': page_num,
+        'section_index': section_index,
+        'word_count': len(story_content.split()),
+        'char_count': len(story_content),
+        'chunk_type': 'ai_enhanced_story',
+        'reading_mode': 'story',
+        'is_enhanced': True,
+        'user_interests': user_interests,
+        'reading_level': reading_level,
+        'original_text_preview': section[:100] + '...' if len(section) > 100 else section
+    }
+
+def pending_section_metadata(page_num, section_index, section):
+    """Metadata for a story chunk that still holds the original section"""
+    return {
+        'page_number': page_num,
+        'section_index': section_index,
+        'word_count': len(section.split()),
+        'char_count': len(section),
+        'chunk_type': 'story_section',
+        'reading_mode': 'story',
+        'is_enhanced': False
+    }
+
+class LazyStoryTransformer:
+    """Transforms the sections of a lazy story document the first time they are read"""
+
+    def __init__(self, document):
+        self.document = document
+        self.ai_transformer = get_story_transformer()
+
+    def get_reader_profile(self):
+        """Interests and reading level of the document owner"""
+        try:
+            profile = self.document.user.profile
+            return profile.interests, profile.reading_level
+        except Exception:
+            return ['technology'], 'casual'
+
+    def ensure_transformed(self, chunks):
+        """Transform any untransformed chunks in place, persisting them; returns the chunks
+
+        Chunks whose AI call falls back are left untransformed (still showing
+        the raw section) so a later read tries again.
+        """
+        chunks = list(chunks)
+        pending = [chunk for chunk in chunks if not chunk.is_transformed]
+        if not pending:
+            return chunks
+
+        user_interests, reading_level = self.get_reader_profile()
+
+        def transform(batch):
+            sections = [chunk.content for chunk in batch]
+            return batch, self.ai_transformer.transform_batch(sections, user_interests, reading_level)
+
+        batches = self.ai_transformer.batch_sections(pending, lambda chunk: chunk.content)
+        for batch, stories in ordered_map(transform, batches, settings.STORY_MAX_IN_FLIGHT):
+            for chunk, story_content in zip(batch, stories):
+                if not is_fallback(story_content):
+                    self._save_story(chunk, story_content, user_interests, reading_level)
+        return chunks
+
+    def _save_story(self, chunk, story_content, user_interests, reading_level):
+        section = chunk.content
+        metadata = story_metadata(
+            chunk.metadata.get('page_number'), chunk.metadata.get('section_index'),
+            section, story_content, user_interests, reading_level
+        )
+        reading_time = estimate_reading_time(story_content)
+
+        # Only the first reader's transformation is kept if two race on the same chunk
+        with transaction.atomic():
+            updated = ContentChunk.objects.filter(id=chunk.id, is_transformed=False).update(
+                content=story_content,
+                reading_time=reading_time,
+                metadata=metadata,
+                is_transformed=True
+            )
+            if updated:
+                # Enhancements were written for the raw section
+                ChunkEnhancement.objects.filter(chunk_id=chunk.id).delete()
+        if updated:
+            chunk.content = story_content
+            chunk.reading_time = reading_time
+            chunk.metadata = metadata
+            chunk.is_transformed = True
+        else:
+            chunk.refresh_from_db()
@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from documents.enhancements import EnhancementPrecomputer
+
+class Command(BaseCommand):
+    help = "Precompute chunk enhancements around each active reader's current position"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep running, starting a new pass every this many seconds')
+
+    def handle(self, *args, **options):
+        precomputer = EnhancementPrecomputer()
+        while True:
+            stored, failed = precomputer.run()
+            self.stdout.write(self.style.SUCCESS(f"Stored {stored} enhancement(s); {failed} failed."))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from documents.ai_cache import get_transformation_cache
+
+class Command(BaseCommand):
+    help = 'Delete expired entries from the shared AI response cache'
+
+    def handle(self, *args, **options):
+        deleted = get_transformation_cache().prune()
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} expired cache entries."))
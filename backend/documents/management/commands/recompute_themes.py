@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from documents.themes import ThemeExtractor
+
+class Command(BaseCommand):
+    help = 'Recount corpus term frequencies and recompute the themes of every processed document'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Documents read and updated per batch')
+        parser.add_argument('--reindex', action='store_true',
+                            help='Recount the terms of every document, not just those never counted')
+
+    def handle(self, *args, **options):
+        extractor = ThemeExtractor(batch_size=options['batch_size'])
+        counted = extractor.count_documents(reindex=options['reindex'])
+        self.stdout.write(f"Counted terms of {counted} document(s).")
+        updated = extractor.recompute()
+        self.stdout.write(self.style.SUCCESS(f"Recomputed themes of {updated} document(s)."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from documents.models import Document
+from documents.repair import FallbackRepairService
+
+class Command(BaseCommand):
+    help = 'Re-run AI transformation for story chunks that were saved with fallback text'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--document', type=int, help='Only repair chunks of this document')
+
+    def handle(self, *args, **options):
+        service = FallbackRepairService()
+        document = None
+        if options['document']:
+            document = Document.objects.get(id=options['document'])
+
+        repaired, failed = service.repair(service.pending_chunks(document))
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} chunk(s); {failed} still failing."))
@@ -0,0 +1,64 @@
+import multiprocessing
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from documents.ai_accounting import get_hit_tally
+from documents.ai_backends import get_ai_backend
+from documents.job_queue import IngestWorker
+
+def _run_worker(poll_interval, once):
+    """Entry point for a single worker process"""
+    worker = IngestWorker(poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+    signal.signal(signal.SIGINT, lambda *args: worker.stop())
+    try:
+        worker.run(once=once)
+    finally:
+        # Forked processes skip atexit hooks, so close the backend and save counted cache hits explicitly
+        get_ai_backend().close()
+        get_hit_tally().flush()
+
+class Command(BaseCommand):
+    help = 'Run background workers that process queued document uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.INGEST_WORKERS,
+                            help='Number of worker processes to start')
+        parser.add_argument('--poll-interval', type=float, default=settings.INGEST_POLL_INTERVAL,
+                            help='Seconds to wait between polls when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling forever')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        once = options['once']
+
+        self.stdout.write(f"Starting {workers} ingest worker(s)...")
+
+        if workers == 1:
+            _run_worker(poll_interval, once)
+            return
+
+        # Forked children must not share the parent's database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_run_worker, args=(poll_interval, once), daemon=False)
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        def _forward(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, _forward)
+        signal.signal(signal.SIGINT, _forward)
+
+        for process in processes:
+            process.join()
+
+        self.stdout.write(self.style.SUCCESS("Ingest workers stopped."))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_processingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.IntegerField()),
+                ('status', models.CharField(choices=[('completed', 'Completed'), ('failed', 'Failed'), ('skipped', 'Skipped')], max_length=20)),
+                ('chunk_count', models.IntegerField(default=0)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='documents.document')),
+            ],
+            options={
+                'ordering': ['document', 'page_number'],
+                'unique_together': {('document', 'page_number')},
+            },
+        ),
+    ]
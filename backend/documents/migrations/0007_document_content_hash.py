@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:14
+
+import documents.models
+import documents.uploads
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_pagecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(storage=documents.uploads.document_storage, upload_to=documents.models.document_upload_path),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_document_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='processed_chunks',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='processed_pages',
+            field=models.IntegerField(default=0),
+        ),
+    ]
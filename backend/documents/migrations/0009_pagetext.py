@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_document_processing_watermark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('page_number', models.IntegerField()),
+                ('page_count', models.IntegerField()),
+                ('text', models.BinaryField()),
+            ],
+            options={
+                'ordering': ['content_hash', 'page_number'],
+                'unique_together': {('content_hash', 'page_number')},
+            },
+        ),
+    ]
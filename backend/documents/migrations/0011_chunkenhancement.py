@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0010_transformationcacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkEnhancement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('profile_key', models.CharField(max_length=64)),
+                ('enhanced_content', models.TextField()),
+                ('connections', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chunk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enhancements', to='documents.contentchunk')),
+            ],
+            options={
+                'unique_together': {('chunk', 'profile_key')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0011_chunkenhancement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contentchunk',
+            name='is_transformed',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='story_strategy',
+            field=models.CharField(choices=[('eager', 'Transform at upload'), ('lazy', 'Transform when first read')], default='eager', max_length=10),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0012_lazy_story'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='processingjob',
+            name='documents_p_status_b7cc64_idx',
+        ),
+        migrations.AddField(
+            model_name='processingjob',
+            name='job_type',
+            field=models.CharField(choices=[('ingest', 'Ingest'), ('read_ahead', 'Read-ahead')], default='ingest', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='processingjob',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='processingjob',
+            name='priority',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='processingjob',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='processingjob',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='processingjob',
+            index=models.Index(fields=['status', 'priority', 'created_at'], name='documents_p_status_c62865_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0013_read_ahead_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AICallRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('caller', models.CharField(max_length=50)),
+                ('model_name', models.CharField(max_length=100)),
+                ('cache', models.CharField(choices=[('hit', 'Cache hit'), ('miss', 'Cache miss'), ('coalesced', 'Shared an in-flight call')], max_length=20)),
+                ('outcome', models.CharField(choices=[('ok', 'OK'), ('fallback', 'Fallback')], default='ok', max_length=20)),
+                ('prompt_chars', models.IntegerField(default=0)),
+                ('response_chars', models.IntegerField(default=0)),
+                ('prompt_tokens', models.IntegerField(default=0)),
+                ('response_tokens', models.IntegerField(default=0)),
+                ('latency_ms', models.IntegerField(default=0)),
+                ('retries', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('document', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ai_calls', to='documents.document')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0014_aicallrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='run_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='processingjob',
+            name='job_type',
+            field=models.CharField(choices=[('ingest', 'Ingest'), ('read_ahead', 'Read-ahead'), ('upgrade', 'Upgrade fallback chunks')], default='ingest', max_length=20),
+        ),
+    ]
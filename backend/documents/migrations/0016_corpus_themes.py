@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0015_processingjob_run_after'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorpusTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=40, unique=True)),
+                ('document_frequency', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DocumentTermCounts',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='term_counts', to='documents.document')),
+            ],
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def metadata_terms(metadata):
+    # Frozen copy of documents.signals.metadata_terms as of this migration
+    terms = {}
+    weights = metadata.get('theme_weights') or {}
+    for kind, key in (('theme', 'themes'), ('category', 'categories')):
+        for position, term in enumerate(metadata.get(key) or []):
+            if not isinstance(term, str) or not term or (kind, term[:100]) in terms:
+                continue
+            weight = weights.get(term, 1.0) if kind == 'theme' else 1.0
+            terms[(kind, term[:100])] = (weight, position)
+    return terms
+
+
+def index_existing_terms(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+    DocumentTerm = apps.get_model('documents', 'DocumentTerm')
+    rows = []
+    for document_id, metadata in Document.objects.values_list('id', 'metadata').iterator(chunk_size=500):
+        rows.extend(
+            DocumentTerm(document_id=document_id, kind=kind, term=term, weight=weight, position=position)
+            for (kind, term), (weight, position) in metadata_terms(metadata or {}).items()
+        )
+        if len(rows) >= 1000:
+            DocumentTerm.objects.bulk_create(rows)
+            rows = []
+    DocumentTerm.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0016_corpus_themes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('theme', 'Theme'), ('category', 'Category')], max_length=10)),
+                ('term', models.CharField(max_length=100)),
+                ('weight', models.FloatField(default=1.0)),
+                ('position', models.IntegerField(default=0)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='documents.document')),
+            ],
+            options={
+                'ordering': ['document', 'kind', 'position'],
+                'indexes': [models.Index(fields=['kind', 'term', 'position'], name='documents_d_kind_aef956_idx')],
+                'unique_together': {('document', 'kind', 'term')},
+            },
+        ),
+        migrations.RunPython(index_existing_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:46
+
+from django.db import migrations
+
+# External-content FTS5 table over ContentChunk.content, kept current by triggers
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE documents_contentchunk_fts USING fts5(
+        content, content='documents_contentchunk', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER documents_contentchunk_fts_insert AFTER INSERT ON documents_contentchunk BEGIN
+        INSERT INTO documents_contentchunk_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER documents_contentchunk_fts_delete AFTER DELETE ON documents_contentchunk BEGIN
+        INSERT INTO documents_contentchunk_fts(documents_contentchunk_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER documents_contentchunk_fts_update AFTER UPDATE OF content ON documents_contentchunk BEGIN
+        INSERT INTO documents_contentchunk_fts(documents_contentchunk_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO documents_contentchunk_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    "INSERT INTO documents_contentchunk_fts(documents_contentchunk_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS documents_contentchunk_fts_insert",
+    "DROP TRIGGER IF EXISTS documents_contentchunk_fts_delete",
+    "DROP TRIGGER IF EXISTS documents_contentchunk_fts_update",
+    "DROP TABLE IF EXISTS documents_contentchunk_fts",
+]
+
+# Stored tsvector column, recomputed by Postgres whenever content changes
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE documents_contentchunk ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
+    """,
+    "CREATE INDEX documents_contentchunk_search_idx ON documents_contentchunk USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS documents_contentchunk_search_idx",
+    "ALTER TABLE documents_contentchunk DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0017_document_terms'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run_for_vendor({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
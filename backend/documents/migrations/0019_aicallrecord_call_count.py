@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0018_chunk_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aicallrecord',
+            name='call_count',
+            field=models.IntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0019_aicallrecord_call_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='processingjob',
+            name='job_type',
+            field=models.CharField(choices=[('ingest', 'Ingest'), ('read_ahead', 'Read-ahead'), ('upgrade', 'Upgrade fallback chunks'), ('enhance', 'Precompute enhancements')], default='ingest', max_length=20),
+        ),
+    ]
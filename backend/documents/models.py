@@ -1,6 +1,15 @@
+from collections import Counter
 from django.db import models
+from django.db.models import Count
 from users.models import User
 from django.utils import timezone
+from .uploads import document_storage
+
+def document_upload_path(instance, filename):
+    """Store PDFs under their content hash so identical uploads share one file"""
+    if instance.content_hash:
+        return f"documents/{instance.content_hash[:2]}/{instance.content_hash}.pdf"
+    return f"documents/{filename}"
 
 class Document(models.Model):
     UPLOADED = 'uploaded'
@@ -20,14 +29,27 @@ class Document(models.Model):
         ('story', 'Story Read'),
     ]
     
+    EAGER = 'eager'
+    LAZY = 'lazy'
+    
+    # When story mode sections are run through the AI
+    STORY_STRATEGY_CHOICES = [
+        (EAGER, 'Transform at upload'),
+        (LAZY, 'Transform when first read'),
+    ]
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=500)
     original_filename = models.CharField(max_length=500)
-    file = models.FileField(upload_to='documents/')
+    file = models.FileField(upload_to=document_upload_path, storage=document_storage)
     file_size = models.BigIntegerField()
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
     pages = models.IntegerField(default=0)
+    processed_pages = models.IntegerField(default=0)
+    processed_chunks = models.IntegerField(default=0)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=UPLOADED)
     reading_mode = models.CharField(max_length=20, choices=READING_MODE_CHOICES, default='direct')
+    story_strategy = models.CharField(max_length=10, choices=STORY_STRATEGY_CHOICES, default=EAGER)
     metadata = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
@@ -56,6 +78,8 @@ class ContentChunk(models.Model):
     image = models.ImageField(upload_to='chunk_images/', null=True, blank=True)
     reading_time = models.IntegerField(default=0)
     metadata = models.JSONField(default=dict, blank=True)
+    # False for lazy story sections that still hold the raw text
+    is_transformed = models.BooleanField(default=True)
     
     class Meta:
         ordering = ['document', 'chunk_index']
@@ -64,6 +88,129 @@ class ContentChunk(models.Model):
     def __str__(self):
         return f"Chunk {self.chunk_index} - {self.document.title}"
 
+class ChunkEnhancement(models.Model):
+    chunk = models.ForeignKey(ContentChunk, on_delete=models.CASCADE, related_name='enhancements')
+    # Hash of the interests and reading level the enhancement was written for
+    profile_key = models.CharField(max_length=64)
+    enhanced_content = models.TextField()
+    connections = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['chunk', 'profile_key']
+    
+    def __str__(self):
+        return f"Enhancement of chunk {self.chunk_id} ({self.profile_key[:12]})"
+
+class PageCheckpoint(models.Model):
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+    
+    STATUS_CHOICES = [
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+        (SKIPPED, 'Skipped'),
+    ]
+    
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='checkpoints')
+    page_number = models.IntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    chunk_count = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['document', 'page_number']
+        unique_together = ['document', 'page_number']
+    
+    def __str__(self):
+        return f"Page {self.page_number} - {self.document.title} ({self.status})"
+
+class PageText(models.Model):
+    # Keyed by file hash so every upload of the same PDF shares one copy
+    content_hash = models.CharField(max_length=64)
+    page_number = models.IntegerField()
+    page_count = models.IntegerField()
+    text = models.BinaryField()  # zlib-compressed UTF-8
+    
+    class Meta:
+        ordering = ['content_hash', 'page_number']
+        unique_together = ['content_hash', 'page_number']
+    
+    def __str__(self):
+        return f"Page {self.page_number}/{self.page_count} of {self.content_hash[:12]}"
+
+class DocumentTermCounts(models.Model):
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, related_name='term_counts')
+    # {term: occurrences} over the document's source text, stopwords excluded
+    counts = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Term counts of {self.document.title} ({len(self.counts)} terms)"
+
+class CorpusTerm(models.Model):
+    term = models.CharField(max_length=40, unique=True)
+    # Number of documents whose term counts include the term
+    document_frequency = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.term} (in {self.document_frequency} documents)"
+
+class DocumentTermQuerySet(models.QuerySet):
+    def themes(self):
+        return self.filter(kind=DocumentTerm.THEME)
+    
+    def categories(self):
+        return self.filter(kind=DocumentTerm.CATEGORY)
+    
+    def top(self, n):
+        """Only each document's first n terms of a kind, as ordered in its metadata"""
+        return self.filter(position__lt=n)
+    
+    def counts(self):
+        """Counter of how many of the selected rows carry each term"""
+        return Counter(dict(self.values('term').annotate(n=Count('id')).values_list('term', 'n')))
+
+class DocumentTerm(models.Model):
+    THEME = 'theme'
+    CATEGORY = 'category'
+    
+    KIND_CHOICES = [
+        (THEME, 'Theme'),
+        (CATEGORY, 'Category'),
+    ]
+    
+    # Mirrors metadata['themes'] and metadata['categories'] (see documents.signals)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='terms')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    term = models.CharField(max_length=100)
+    weight = models.FloatField(default=1.0)
+    # Index of the term in its metadata list, strongest first
+    position = models.IntegerField(default=0)
+    
+    objects = DocumentTermQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['document', 'kind', 'position']
+        unique_together = ['document', 'kind', 'term']
+        indexes = [models.Index(fields=['kind', 'term', 'position'])]
+    
+    def __str__(self):
+        return f"{self.term} ({self.kind} of {self.document.title})"
+
+class TransformationCacheEntry(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    response = models.TextField()
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"Cached response {self.key[:12]} ({self.hits} hits)"
+
 class ReadingSession(models.Model):
     user = models.ForeignKey('users.User', on_delete=models.CASCADE)
     document = models.ForeignKey(Document, on_delete=models.CASCADE)
@@ -108,4 +255,98 @@ class ReadingAnalytics(models.Model):
         unique_together = ['user', 'document']
     
     def __str__(self):
-        return f"{self.user.username} - {self.document.title} Analytics"
\ No newline at end of file
+        return f"{self.user.username} - {self.document.title} Analytics"
+
+class ProcessingJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+        (CANCELLED, 'Cancelled'),
+    ]
+    
+    INGEST = 'ingest'
+    READ_AHEAD = 'read_ahead'
+    UPGRADE = 'upgrade'
+    ENHANCE = 'enhance'
+    
+    JOB_TYPE_CHOICES = [
+        (INGEST, 'Ingest'),
+        (READ_AHEAD, 'Read-ahead'),
+        (UPGRADE, 'Upgrade fallback chunks'),
+        (ENHANCE, 'Precompute enhancements'),
+    ]
+    
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='jobs')
+    job_type = models.CharField(max_length=20, choices=JOB_TYPE_CHOICES, default=INGEST)
+    # Reader a read-ahead job is preparing chunks for
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE, null=True, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    # Higher priority jobs are leased first
+    priority = models.IntegerField(default=0)
+    # Not leased before this time
+    run_after = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    leased_by = models.CharField(max_length=100, blank=True)
+    leased_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'priority', 'created_at'])]
+    
+    def __str__(self):
+        return f"Job {self.id} - {self.document.title} ({self.job_type}, {self.status})"
+
+class AICallRecord(models.Model):
+    HIT = 'hit'
+    MISS = 'miss'
+    COALESCED = 'coalesced'
+    
+    CACHE_CHOICES = [
+        (HIT, 'Cache hit'),
+        (MISS, 'Cache miss'),
+        (COALESCED, 'Shared an in-flight call'),
+    ]
+    
+    OK = 'ok'
+    FALLBACK = 'fallback'
+    
+    OUTCOME_CHOICES = [
+        (OK, 'OK'),
+        (FALLBACK, 'Fallback'),
+    ]
+    
+    user = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True)
+    document = models.ForeignKey(Document, on_delete=models.SET_NULL, null=True, blank=True, related_name='ai_calls')
+    caller = models.CharField(max_length=50)
+    model_name = models.CharField(max_length=100)
+    cache = models.CharField(max_length=20, choices=CACHE_CHOICES)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES, default=OK)
+    prompt_chars = models.IntegerField(default=0)
+    response_chars = models.IntegerField(default=0)
+    # Reported by the backend when it can, otherwise estimated from the text
+    prompt_tokens = models.IntegerField(default=0)
+    response_tokens = models.IntegerField(default=0)
+    latency_ms = models.IntegerField(default=0)
+    retries = models.IntegerField(default=0)
+    # Cache hits are tallied in memory and saved as one row per context covering call_count
+    # calls; its char and token fields are totals over all of them
+    call_count = models.IntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.caller} ({self.cache}, {self.prompt_tokens}+{self.response_tokens} tokens)"
@@ -1,61 +1,134 @@
-import pdfplumber
+import time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
-from .ai_processor import AIStoryTransformer
-from .models import Document, ContentChunk
+from .ai_processor import get_story_transformer, is_fallback
+from .concurrency import ordered_map
+from .content_intelligence import ContentIntelligenceEngine
+from .enhancements import schedule_precompute
+from .extraction import PageProcessingError
+from .models import Document, ContentChunk, PageCheckpoint
+from .lazy_story import pending_section_metadata, story_metadata
+from .repair import schedule_upgrade
+from .text_store import PageTextStore, clean_section, estimate_reading_time, split_into_sections, story_sections
 
 class PDFProcessor:
     def __init__(self, document_id):
         self.document_id = document_id
         self.document = Document.objects.get(id=document_id)
-        self.ai_transformer = AIStoryTransformer()
+        self.ai_transformer = get_story_transformer()
+        self.page_store = PageTextStore(self.document)
+        self.skipped_pages = set()
     
-    def process_story_mode(self):
-        """Enhanced story mode with AI transformation"""
-        chunks = []
-        chunk_index = 0
+    def process_story_mode(self, start_page=1, chunk_index=0):
+        """Enhanced story mode with AI transformation, yielding (page_number, chunks) per page"""
+        self.document.pages = self.page_store.page_count()
+        self.document.save()
         
-        with pdfplumber.open(self.document.file.path) as pdf:
-            self.document.pages = len(pdf.pages)
-            self.document.save()
-            
-            # Get user interests from profile
-            user_interests = self.get_user_interests()
-            reading_level = self.get_reading_level()
+        # Get user interests from profile
+        user_interests = self.get_user_interests()
+        reading_level = self.get_reading_level()
+        
+        def transform(batch):
+            sections = [section for page_num, section_index, section, last_on_page in batch if section is not None]
+            if not sections:
+                return batch, []
+            try:
+                # Transform with AI, several sections per request
+                return batch, self.ai_transformer.transform_batch(sections, user_interests, reading_level)
+            except Exception as e:
+                return batch, PageProcessingError(batch[0][0], str(e))
+        
+        # Batches are transformed concurrently but come back in document order
+        results = ordered_map(
+            transform, self._iter_story_batches(start_page), settings.STORY_MAX_IN_FLIGHT
+        )
+        
+        page_chunks = []
+        for batch, stories in results:
+            if isinstance(stories, PageProcessingError):
+                raise stories
             
-            for page_num, page in enumerate(pdf.pages, 1):
-                text = page.extract_text() or ""
-                
-                if text.strip():
-                    # Split into logical sections for AI processing
-                    sections = self.split_into_sections(text)
-                    
-                    for section in sections:
-                        if len(section.strip()) > 50:  # Only process substantial content
-                            # Transform with AI
-                            story_content = self.ai_transformer.transform_to_story(
-                                section, user_interests, reading_level
+            stories = iter(stories)
+            for page_num, section_index, section, last_on_page in batch:
+                if section is not None:
+                    story_content = next(stories)
+                    if is_fallback(story_content):
+                        # Keep the original text rather than a placeholder; it is upgraded later
+                        page_chunks.append(self.degraded_story_chunk(
+                            chunk_index, page_num, section_index, section, user_interests, reading_level
+                        ))
+                    else:
+                        page_chunks.append({
+                            'chunk_index': chunk_index,
+                            'content_type': ContentChunk.TEXT,
+                            'content': story_content,
+                            'reading_time': self.estimate_reading_time(story_content),
+                            'metadata': story_metadata(
+                                page_num, section_index, section, story_content, user_interests, reading_level
                             )
-                            
-                            chunks.append({
-                                'chunk_index': chunk_index,
-                                'content_type': ContentChunk.TEXT,
-                                'content': story_content,
-                                'reading_time': self.estimate_reading_time(story_content),
-                                'metadata': {
-                                    'page_number': page_num,
-                                    'word_count': len(story_content.split()),
-                                    'char_count': len(story_content),
-                                    'chunk_type': 'ai_enhanced_story',
-                                    'reading_mode': 'story',
-                                    'is_enhanced': True,
-                                    'user_interests': user_interests,
-                                    'reading_level': reading_level,
-                                    'original_text_preview': section[:100] + '...' if len(section) > 100 else section
-                                }
-                            })
-                            chunk_index += 1
+                        })
+                    chunk_index += 1
+                
+                if last_on_page:
+                    yield page_num, page_chunks
+                    page_chunks = []
+    
+    def degraded_story_chunk(self, chunk_index, page_num, section_index, section, user_interests, reading_level):
+        """Chunk showing the original section when the AI is unavailable, flagged for upgrade"""
+        content = clean_section(section)
+        metadata = pending_section_metadata(page_num, section_index, content)
+        metadata.update({
+            'ai_fallback': True,
+            'user_interests': user_interests,
+            'reading_level': reading_level
+        })
+        return {
+            'chunk_index': chunk_index,
+            'content_type': ContentChunk.TEXT,
+            'content': content,
+            'reading_time': self.estimate_reading_time(content),
+            'metadata': metadata,
+            'is_transformed': False
+        }
+    
+    def process_lazy_story_mode(self, start_page=1, chunk_index=0):
+        """Lazy story mode: store the raw sections now and transform them when first read"""
+        self.document.pages = self.page_store.page_count()
+        self.document.save()
         
-        return chunks
+        page_chunks = []
+        for page_num, section_index, section, last_on_page in self._iter_story_sections(start_page):
+            if section is not None:
+                page_chunks.append({
+                    'chunk_index': chunk_index,
+                    'content_type': ContentChunk.TEXT,
+                    'content': section,
+                    'reading_time': self.estimate_reading_time(section),
+                    'metadata': pending_section_metadata(page_num, section_index, section),
+                    'is_transformed': False
+                })
+                chunk_index += 1
+            
+            if last_on_page:
+                yield page_num, page_chunks
+                page_chunks = []
+    
+    def _iter_story_batches(self, start_page):
+        """Group story sections into batches that fit in one prompt"""
+        return self.ai_transformer.batch_sections(self._iter_story_sections(start_page), lambda item: item[2])
+    
+    def _iter_story_sections(self, start_page):
+        """Yield (page_number, section_index, section, last_on_page) for every section to transform"""
+        for page_num, text in self.page_store.iter_pages(start_page, self.skipped_pages):
+            # Split into logical sections for AI processing, keeping substantial content
+            sections = story_sections(text)
+            if not sections:
+                # Pages without content still need a checkpoint
+                yield page_num, None, None, True
+            for section_index, section in enumerate(sections):
+                yield page_num, section_index, section, section_index == len(sections) - 1
     
     def get_user_interests(self):
         """Get user interests from profile"""
@@ -75,89 +148,219 @@ class PDFProcessor:
     
     def split_into_sections(self, text):
         """Split text into logical sections for AI processing"""
-        # Split by paragraphs first
-        paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
-        
-        sections = []
-        current_section = ""
-        
-        for para in paragraphs:
-            # If paragraph is substantial, make it a section
-            if len(para.split()) > 30:
-                if current_section:
-                    sections.append(current_section)
-                sections.append(para)
-                current_section = ""
-            else:
-                # Combine short paragraphs
-                if current_section:
-                    current_section += " " + para
-                else:
-                    current_section = para
-        
-        if current_section and len(current_section.split()) > 10:
-            sections.append(current_section)
-        
-        return sections
+        return split_into_sections(text)
     
     def process_document(self):
-        """Main method to process document based on reading mode"""
+        """Main method to process document based on reading mode, resuming from the last checkpoint"""
         try:
             self.document.status = Document.PROCESSING
             self.document.save()
             
-            if self.document.reading_mode == 'story':
-                chunks = self.process_story_mode()
-            else:
-                chunks = self.process_direct_mode()
+            # Identical files that were already extracted don't need parsing again
+            if not self.clone_from_duplicate():
+                self.process_pages()
             
-            # Save chunks to database
-            for chunk_data in chunks:
-                ContentChunk.objects.create(
-                    document=self.document,
-                    **chunk_data
-                )
+            self.analyze_content()
+            
+            # Story chunks saved while the AI was unavailable get another go later
+            if self.document.chunks.filter(metadata__ai_fallback=True).exists():
+                schedule_upgrade(self.document)
             
             self.document.status = Document.COMPLETED
             self.document.processed_at = timezone.now()
             self.document.save()
             
+            # Have the opening chunks' enhancements ready before the reader asks
+            schedule_precompute(self.document)
+            
         except Exception as e:
             self.document.status = Document.FAILED
             self.document.save()
             raise e
     
-    def process_direct_mode(self):
-        """Process document in direct reading mode"""
-        chunks = []
-        chunk_index = 0
+    def analyze_content(self):
+        """Themes, complexity and reading time from the stored source text (best-effort)"""
+        metadata = dict(self.document.metadata)
+        try:
+            with transaction.atomic():
+                ContentIntelligenceEngine().analyze_document_structure(self.document)
+        except Exception as e:
+            # The chunks are all saved; missing themes shouldn't fail the document
+            print(f"📄 Content analysis of document {self.document.id} failed: {e}")
+            self.document.metadata = metadata
+    
+    def process_pages(self):
+        """Process pages from the last checkpoint on, skipping pages that keep failing"""
+        while True:
+            start_page, chunk_index = self.get_resume_point()
+            
+            if self.document.reading_mode == 'story' and self.document.story_strategy == Document.LAZY:
+                pages = self.process_lazy_story_mode(start_page, chunk_index)
+            elif self.document.reading_mode == 'story':
+                pages = self.process_story_mode(start_page, chunk_index)
+            else:
+                pages = self.process_direct_mode(start_page, chunk_index)
+            
+            try:
+                self.save_pages(pages)
+                return
+            except PageProcessingError as e:
+                # Retry the failing page on the next attempt, or skip it once it runs out of retries
+                if not self.record_page_failure(e):
+                    raise
+    
+    def clone_from_duplicate(self):
+        """Copy direct-mode chunks from an already processed upload of the same file"""
+        if self.document.reading_mode != 'direct' or not self.document.content_hash:
+            return False
+        if self.document.checkpoints.exists():
+            return False
         
-        with pdfplumber.open(self.document.file.path) as pdf:
-            self.document.pages = len(pdf.pages)
-            self.document.save()
+        source = Document.objects.filter(
+            content_hash=self.document.content_hash,
+            reading_mode='direct',
+            status=Document.COMPLETED
+        ).exclude(id=self.document.id).order_by('-processed_at').first()
+        if not source:
+            return False
+        
+        batch_size = settings.CHUNK_BATCH_SIZE
+        with transaction.atomic():
+            batch = []
+            for chunk in source.chunks.iterator(chunk_size=batch_size):
+                batch.append(ContentChunk(
+                    document=self.document,
+                    chunk_index=chunk.chunk_index,
+                    content_type=chunk.content_type,
+                    content=chunk.content,
+                    image=chunk.image.name if chunk.image else None,
+                    reading_time=chunk.reading_time,
+                    metadata=chunk.metadata
+                ))
+                if len(batch) >= batch_size:
+                    ContentChunk.objects.bulk_create(batch)
+                    batch = []
+            if batch:
+                ContentChunk.objects.bulk_create(batch)
             
-            for page_num, page in enumerate(pdf.pages, 1):
-                text = page.extract_text() or ""
+            self.document.pages = source.pages
+            self.document.processed_chunks = source.processed_chunks
+            self.document.processed_pages = source.processed_pages
+            self.document.metadata = {**source.metadata, 'cloned_from': source.id}
+            self.document.save()
+        
+        return True
+    
+    def get_resume_point(self):
+        """Return the first page still to process and the next free chunk index"""
+        last_page = self.document.checkpoints.filter(
+            status=PageCheckpoint.COMPLETED
+        ).aggregate(last=Max('page_number'))['last'] or 0
+        self.skipped_pages = set(self.document.checkpoints.filter(
+            status=PageCheckpoint.SKIPPED
+        ).values_list('page_number', flat=True))
+        last_chunk = self.document.chunks.aggregate(last=Max('chunk_index'))['last']
+        
+        return last_page + 1, 0 if last_chunk is None else last_chunk + 1
+    
+    def save_pages(self, pages, batch_size=None):
+        """Commit chunks in bulk batches, checkpointing the pages they came from"""
+        batch_size = batch_size or settings.CHUNK_BATCH_SIZE
+        chunks = []
+        checkpoints = []
+        last_flush = time.monotonic()
+        
+        try:
+            for page_num, page_chunks in pages:
+                chunks.extend(ContentChunk(document=self.document, **chunk_data) for chunk_data in page_chunks)
+                checkpoints.append(PageCheckpoint(
+                    document=self.document,
+                    page_number=page_num,
+                    status=PageCheckpoint.COMPLETED,
+                    chunk_count=len(page_chunks)
+                ))
                 
-                if text.strip():
-                    chunks.append({
-                        'chunk_index': chunk_index,
-                        'content_type': ContentChunk.TEXT,
-                        'content': text,
-                        'reading_time': self.estimate_reading_time(text),
-                        'metadata': {
-                            'page_number': page_num,
-                            'word_count': len(text.split()),
-                            'char_count': len(text),
-                            'chunk_type': 'direct_text',
-                            'reading_mode': 'direct'
-                        }
-                    })
-                    chunk_index += 1
+                # Only flush on page boundaries so a checkpoint always covers whole pages.
+                # Slow (story mode) pages are flushed early so readers can start sooner.
+                if (len(chunks) >= batch_size or len(checkpoints) >= batch_size or
+                        time.monotonic() - last_flush >= settings.CHUNK_FLUSH_INTERVAL):
+                    # Hand the batch over first so a failed commit isn't retried below
+                    batch, chunks = chunks, []
+                    batch_checkpoints, checkpoints = checkpoints, []
+                    self._commit_batch(batch, batch_checkpoints)
+                    last_flush = time.monotonic()
+        finally:
+            # Pages finished before a failure are kept so a retry doesn't redo them
+            if checkpoints:
+                self._commit_batch(chunks, checkpoints)
+    
+    def _commit_batch(self, chunks, checkpoints):
+        """Write a batch of chunks and their page checkpoints in one transaction"""
+        if chunks:
+            self.document.processed_chunks = chunks[-1].chunk_index + 1
+        self.document.processed_pages = checkpoints[-1].page_number
         
-        return chunks
+        with transaction.atomic():
+            ContentChunk.objects.bulk_create(chunks)
+            PageCheckpoint.objects.bulk_create(
+                checkpoints,
+                update_conflicts=True,
+                unique_fields=['document', 'page_number'],
+                update_fields=['status', 'chunk_count', 'last_error', 'updated_at']
+            )
+            # Advance the watermark readers use to see how far processing has got
+            Document.objects.filter(id=self.document.id).update(
+                processed_chunks=self.document.processed_chunks,
+                processed_pages=self.document.processed_pages
+            )
+    
+    def record_page_failure(self, error):
+        """Count a failed attempt on a page; returns True if the page is now skipped"""
+        checkpoint, _ = PageCheckpoint.objects.get_or_create(
+            document=self.document,
+            page_number=error.page_number,
+            defaults={'status': PageCheckpoint.FAILED}
+        )
+        checkpoint.attempts += 1
+        checkpoint.last_error = error.message[:2000]
+        checkpoint.status = (
+            PageCheckpoint.SKIPPED if checkpoint.attempts >= settings.PAGE_MAX_RETRIES
+            else PageCheckpoint.FAILED
+        )
+        checkpoint.save()
+        
+        if checkpoint.status == PageCheckpoint.SKIPPED:
+            # Keep the text store complete so later runs don't hit this page again
+            self.page_store.save_page(error.page_number, '', self.document.pages)
+        
+        print(f"📄 {error} (attempt {checkpoint.attempts}, {checkpoint.status})")
+        return checkpoint.status == PageCheckpoint.SKIPPED
+    
+    def process_direct_mode(self, start_page=1, chunk_index=0):
+        """Process document in direct reading mode, yielding (page_number, chunks) per page"""
+        self.document.pages = self.page_store.page_count()
+        self.document.save()
+        
+        for page_num, text in self.page_store.iter_pages(start_page, self.skipped_pages):
+            page_chunks = []
+            if text.strip():
+                page_chunks.append({
+                    'chunk_index': chunk_index,
+                    'content_type': ContentChunk.TEXT,
+                    'content': text,
+                    'reading_time': self.estimate_reading_time(text),
+                    'metadata': {
+                        'page_number': page_num,
+                        'word_count': len(text.split()),
+                        'char_count': len(text),
+                        'chunk_type': 'direct_text',
+                        'reading_mode': 'direct'
+                    }
+                })
+                chunk_index += 1
+            
+            yield page_num, page_chunks
     
     def estimate_reading_time(self, text):
         """Estimate reading time in seconds (average 200 words per minute)"""
-        word_count = len(text.split())
-        return max(1, int((word_count / 200) * 60))
\ No newline at end of file
+        return estimate_reading_time(text)
\ No newline at end of file
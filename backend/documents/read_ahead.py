@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.db import transaction
+from .enhancements import enhance_chunk, profile_key
+from .lazy_story import LazyStoryTransformer
+from .models import Document, ProcessingJob
+
+# Reading speed READ_AHEAD_CHUNKS is tuned for (same as the reading time estimate)
+BASE_READING_SPEED_WPM = 200
+
+def read_ahead_size(reading_speed_wpm):
+    """How many chunks to prepare ahead of a reader, scaled by how fast they read"""
+    scaled = round(settings.READ_AHEAD_CHUNKS * (reading_speed_wpm or BASE_READING_SPEED_WPM) / BASE_READING_SPEED_WPM)
+    return max(1, min(settings.READ_AHEAD_MAX_CHUNKS, scaled))
+
+def _profile(user):
+    try:
+        return user.profile.interests, user.profile.reading_level
+    except Exception:
+        return None
+
+def _is_lazy_story(document):
+    # Only lazy sections are transformed here; degraded eager chunks wait for the upgrade job
+    return document.reading_mode == 'story' and document.story_strategy == Document.LAZY
+
+class ReadAheadScheduler:
+    """Queues preparation of the chunks a reader is about to reach"""
+
+    def schedule(self, session):
+        """Queue read-ahead after a progress update; returns the job, or None if nothing is needed
+
+        Read-ahead for the reader's other documents is cancelled, running or
+        not, and a job still waiting for this document is moved to the new
+        position. Whether the range actually needs work is left to the worker
+        so this stays a couple of cheap writes inside the progress request.
+        """
+        start = session.current_chunk + 1
+        end = start + read_ahead_size(session.reading_speed_wpm)
+        payload = {'start': start, 'end': end}
+
+        with transaction.atomic():
+            ProcessingJob.objects.filter(
+                job_type=ProcessingJob.READ_AHEAD,
+                user=session.user,
+                status__in=[ProcessingJob.QUEUED, ProcessingJob.RUNNING]
+            ).exclude(document=session.document).update(status=ProcessingJob.CANCELLED)
+
+            if not (_is_lazy_story(session.document) or settings.READ_AHEAD_ENHANCE):
+                return None
+
+            job = ProcessingJob.objects.filter(
+                job_type=ProcessingJob.READ_AHEAD,
+                user=session.user,
+                document=session.document,
+                status=ProcessingJob.QUEUED
+            ).first()
+            if job:
+                job.payload = payload
+                job.save(update_fields=['payload', 'updated_at'])
+                return job
+            return ProcessingJob.objects.create(
+                document=session.document,
+                job_type=ProcessingJob.READ_AHEAD,
+                user=session.user,
+                payload=payload,
+                priority=settings.READ_AHEAD_PRIORITY
+            )
+
+    def is_cancelled(self, job):
+        return ProcessingJob.objects.filter(id=job.id, status=ProcessingJob.CANCELLED).exists()
+
+    def run(self, job):
+        """Transform and (optionally) enhance the chunks in a read-ahead job's range
+
+        Chunks are prepared READ_AHEAD_CHUNKS at a time, stopping between
+        batches once the job has been cancelled.
+        """
+        document = Document.objects.get(id=job.document_id)
+        lazy = _is_lazy_story(document)
+        profile = _profile(job.user) if settings.READ_AHEAD_ENHANCE and job.user else None
+        start, end = job.payload.get('start', 0), job.payload.get('end', 0)
+        step = max(1, settings.READ_AHEAD_CHUNKS)
+
+        for batch_start in range(start, end, step):
+            if self.is_cancelled(job):
+                return
+            chunks = document.chunks.filter(
+                chunk_index__gte=batch_start,
+                chunk_index__lt=min(batch_start + step, end)
+            )
+            if lazy:
+                chunks = LazyStoryTransformer(document).ensure_transformed(chunks)
+            if profile:
+                key = profile_key(*profile)
+                for chunk in chunks:
+                    if not chunk.enhancements.filter(profile_key=key).exists():
+                        enhance_chunk(chunk, *profile)
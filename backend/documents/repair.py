@@ -0,0 +1,109 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .ai_accounting import ai_call_context
+from .ai_processor import get_story_transformer, is_fallback
+from .ai_resilience import get_ai_scheduler
+from .concurrency import ordered_map
+from .lazy_story import story_metadata
+from .models import ContentChunk, ProcessingJob
+from .text_store import PageTextStore, estimate_reading_time
+
+def schedule_upgrade(document, delay=None, upgrade_round=0):
+    """Queue an upgrade of the document's fallback chunks, unless one is already waiting"""
+    waiting = ProcessingJob.objects.filter(
+        document=document, job_type=ProcessingJob.UPGRADE, status=ProcessingJob.QUEUED
+    )
+    if waiting.exists():
+        return None
+    
+    # Give the circuit breaker time to cool down before trying again
+    delay = settings.AI_CIRCUIT_RESET_TIMEOUT if delay is None else delay
+    return ProcessingJob.objects.create(
+        document=document,
+        job_type=ProcessingJob.UPGRADE,
+        payload={'round': upgrade_round},
+        run_after=timezone.now() + timedelta(seconds=delay)
+    )
+
+class FallbackRepairService:
+    """Re-runs AI transformation for story chunks saved while the AI was unavailable"""
+    
+    def __init__(self):
+        self.ai_transformer = get_story_transformer()
+    
+    def pending_chunks(self, document=None):
+        """Chunks flagged as holding fallback text"""
+        chunks = ContentChunk.objects.filter(metadata__ai_fallback=True).select_related('document')
+        if document is not None:
+            chunks = chunks.filter(document=document)
+        return chunks.order_by('document_id', 'chunk_index')
+    
+    def run_upgrade(self, job):
+        """Upgrade job: repair the document's fallback chunks, retrying later while any remain"""
+        chunks = self.pending_chunks(job.document)
+        if not get_ai_scheduler().breaker.is_open:
+            repaired, failed = self.repair(chunks)
+            print(f"🤖 Upgraded {repaired} fallback chunk(s) of document {job.document_id}")
+        
+        upgrade_round = job.payload.get('round', 0) + 1
+        if chunks.exists() and upgrade_round < settings.AI_UPGRADE_MAX_ROUNDS:
+            schedule_upgrade(job.document, settings.AI_UPGRADE_RETRY_DELAY, upgrade_round)
+    
+    def repair(self, chunks):
+        """Transform the chunks again; returns (repaired, still_failing) counts"""
+        repaired = 0
+        failed = 0
+        
+        def transform(item):
+            chunk, source_text = item
+            with ai_call_context('repair', chunk.document.user_id, chunk.document_id):
+                return chunk, source_text, self.ai_transformer.transform_to_story(
+                    source_text,
+                    chunk.metadata.get('user_interests', []),
+                    chunk.metadata.get('reading_level', 'casual')
+                )
+        
+        results = ordered_map(transform, self._with_source_text(chunks), settings.STORY_MAX_IN_FLIGHT)
+        for chunk, source_text, content in results:
+            if is_fallback(content):
+                failed += 1
+                continue
+            
+            metadata = story_metadata(
+                chunk.metadata.get('page_number'), chunk.metadata.get('section_index'), source_text, content,
+                chunk.metadata.get('user_interests', []), chunk.metadata.get('reading_level', 'casual')
+            )
+            metadata['repaired_at'] = timezone.now().isoformat()
+            
+            chunk.content = content
+            chunk.reading_time = estimate_reading_time(content)
+            chunk.metadata = metadata
+            chunk.is_transformed = True
+            with transaction.atomic():
+                chunk.save(update_fields=['content', 'reading_time', 'metadata', 'is_transformed'])
+                # Enhancements were written for the degraded text
+                chunk.enhancements.all().delete()
+            repaired += 1
+        
+        return repaired, failed
+    
+    def _with_source_text(self, chunks):
+        """Pair each chunk with the section it was built from (read here, not in worker threads)"""
+        stores = {}
+        for chunk in chunks.iterator():
+            if not chunk.is_transformed:
+                # Degraded chunks still hold the original section
+                yield chunk, chunk.content
+                continue
+            
+            store = stores.get(chunk.document_id)
+            if store is None:
+                store = stores[chunk.document_id] = PageTextStore(chunk.document)
+            
+            source_text = store.chunk_source_text(chunk)
+            if source_text == chunk.content:
+                # Without the source section there's nothing to transform
+                continue
+            yield chunk, source_text
@@ -0,0 +1,171 @@
+import html
+import re
+from django.conf import settings
+from django.db import connection
+from .models import ContentChunk
+
+# Highlight markers put into snippets by the database, swapped for <mark> tags after escaping
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+
+# FTS5's snippet() accepts at most 64 tokens; ts_headline needs room for MinWords < MaxWords
+MAX_SNIPPET_WORDS = 64
+MIN_SNIPPET_WORDS = 2
+
+SQLITE_SEARCH = """
+    SELECT c.id, c.document_id, d.title, c.chunk_index, -bm25(documents_contentchunk_fts)
+    FROM documents_contentchunk_fts
+    JOIN documents_contentchunk c ON c.id = documents_contentchunk_fts.rowid
+    JOIN documents_document d ON d.id = c.document_id
+    WHERE documents_contentchunk_fts MATCH %s AND d.user_id = %s {document_filter}
+    ORDER BY bm25(documents_contentchunk_fts)
+    LIMIT %s OFFSET %s
+"""
+
+# Snippets in a second query, so they're only built for the page of results
+SQLITE_SNIPPETS = """
+    SELECT rowid, snippet(documents_contentchunk_fts, 0, %s, %s, '…', %s)
+    FROM documents_contentchunk_fts
+    WHERE documents_contentchunk_fts MATCH %s AND rowid IN ({chunk_ids})
+"""
+
+# Rank and page first so ts_headline only runs on the rows returned
+POSTGRES_SEARCH = """
+    SELECT m.id, m.document_id, m.title, m.chunk_index,
+           ts_headline('english', m.content, m.query, %s),
+           m.rank
+    FROM (
+        SELECT c.id, c.document_id, d.title, c.chunk_index, c.content, query,
+               ts_rank(c.search_vector, query) AS rank
+        FROM documents_contentchunk c
+        JOIN documents_document d ON d.id = c.document_id,
+             websearch_to_tsquery('english', %s) query
+        WHERE c.search_vector @@ query AND d.user_id = %s {document_filter}
+        ORDER BY rank DESC
+        LIMIT %s OFFSET %s
+    ) m
+    ORDER BY m.rank DESC
+"""
+
+def fts5_query(text):
+    """FTS5 MATCH expression requiring every word of text, so user input can't be FTS5 syntax"""
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', text))
+
+def snippet_words():
+    return max(MIN_SNIPPET_WORDS, min(settings.SEARCH_SNIPPET_WORDS, MAX_SNIPPET_WORDS))
+
+def headline_options():
+    """ts_headline options for one highlighted fragment of about snippet_words() words"""
+    max_words = snippet_words()
+    min_words = max(1, min(max_words // 3, max_words - 1))
+    return (
+        f'StartSel={MATCH_START}, StopSel={MATCH_END}, MaxFragments=1, '
+        f'MaxWords={max_words}, MinWords={min_words}'
+    )
+
+def plain_snippet(content, words):
+    """Snippet around the first match of any of words, with the matches marked (for the icontains fallback)"""
+    size = snippet_words()
+    tokens = content.split()
+    lowered = [word.lower() for word in words]
+    first = next((i for i, token in enumerate(tokens) if any(word in token.lower() for word in lowered)), 0)
+    start = max(0, first - size // 3)
+
+    pattern = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+    text = pattern.sub(lambda match: MATCH_START + match.group(0) + MATCH_END, ' '.join(tokens[start:start + size]))
+    return ('…' if start > 0 else '') + text + ('…' if start + size < len(tokens) else '')
+
+def highlight(snippet):
+    """HTML-escape a snippet and wrap the matched words in <mark>"""
+    return html.escape(snippet).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+class ChunkSearch:
+    """Ranked full-text search over the chunks of a user's documents
+
+    Uses the FTS5 index on SQLite (bm25 ranking, snippet()) and the
+    tsvector GIN index on Postgres (ts_rank, ts_headline); both are kept
+    current by the database as chunks are inserted, updated and deleted.
+    Other databases get an unranked icontains scan.
+    """
+
+    def __init__(self, user, document=None):
+        self.user = user
+        self.document = document
+
+    def search(self, query, limit=None, offset=0):
+        """Up to limit matches for query, best first, as dicts with a highlighted snippet"""
+        limit = min(limit or settings.SEARCH_PAGE_SIZE, settings.SEARCH_MAX_RESULTS)
+        if connection.vendor == 'sqlite':
+            rows = self._search_sqlite(query, limit, offset)
+        elif connection.vendor == 'postgresql':
+            rows = self._search_postgres(query, limit, offset)
+        else:
+            rows = self._search_icontains(query, limit, offset)
+
+        return [{
+            'chunk_id': chunk_id,
+            'document_id': document_id,
+            'document_title': title,
+            'chunk_index': chunk_index,
+            'snippet': highlight(snippet or ''),
+            'score': round(score, 4),
+        } for chunk_id, document_id, title, chunk_index, snippet, score in rows]
+
+    def _execute(self, sql, params, **placeholders):
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(**placeholders), params)
+            return cursor.fetchall()
+
+    def _scope(self, params, limit, offset):
+        """Parameters with the page bounds and, when searching one document, its filter"""
+        if self.document:
+            return params + [self.document.id, limit, offset], 'AND c.document_id = %s'
+        return params + [limit, offset], ''
+
+    def _search_sqlite(self, query, limit, offset):
+        match = fts5_query(query)
+        if not match:
+            return []
+
+        params, document_filter = self._scope([match, self.user.id], limit, offset)
+        ranked = self._execute(SQLITE_SEARCH, params, document_filter=document_filter)
+        if not ranked:
+            return []
+
+        chunk_ids = [row[0] for row in ranked]
+        snippets = dict(self._execute(
+            SQLITE_SNIPPETS,
+            [MATCH_START, MATCH_END, snippet_words(), match] + chunk_ids,
+            chunk_ids=', '.join(['%s'] * len(chunk_ids))
+        ))
+        return [
+            (chunk_id, document_id, title, chunk_index, snippets.get(chunk_id), score)
+            for chunk_id, document_id, title, chunk_index, score in ranked
+        ]
+
+    def _search_postgres(self, query, limit, offset):
+        if not query.strip():
+            return []
+
+        params, document_filter = self._scope([headline_options(), query, self.user.id], limit, offset)
+        return self._execute(POSTGRES_SEARCH, params, document_filter=document_filter)
+
+    def _search_icontains(self, query, limit, offset):
+        """Chunks containing every word of query, in reading order (no index or ranking)"""
+        words = re.findall(r'\w+', query)
+        if not words:
+            return []
+
+        chunks = ContentChunk.objects.filter(document__user=self.user)
+        if self.document:
+            chunks = chunks.filter(document=self.document)
+        for word in words:
+            chunks = chunks.filter(content__icontains=word)
+
+        rows = chunks.order_by('document_id', 'chunk_index').values_list(
+            'id', 'document_id', 'document__title', 'chunk_index', 'content'
+        )[offset:offset + limit]
+        return [
+            (chunk_id, document_id, title, chunk_index, plain_snippet(content, words), 0.0)
+            for chunk_id, document_id, title, chunk_index, content in rows
+        ]
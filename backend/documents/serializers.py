@@ -12,7 +12,8 @@ class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
         fields = '__all__'
-        read_only_fields = ('user', 'status', 'processed_at', 'metadata', 'pages')
+        read_only_fields = ('user', 'status', 'processed_at', 'metadata', 'pages',
+                            'processed_pages', 'processed_chunks', 'content_hash')
 
 class DocumentUploadSerializer(serializers.Serializer):
     file = serializers.FileField()
@@ -21,6 +22,10 @@ class DocumentUploadSerializer(serializers.Serializer):
         choices=Document.READING_MODE_CHOICES,
         default='direct'
     )
+    story_strategy = serializers.ChoiceField(
+        choices=Document.STORY_STRATEGY_CHOICES,
+        default=Document.EAGER
+    )
     
     def validate_file(self, value):
         if not value.name.lower().endswith('.pdf'):
@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from .models import Document, DocumentTerm
+
+def metadata_terms(metadata):
+    """{(kind, term): (weight, position)} for the themes and categories listed in document metadata"""
+    terms = {}
+    weights = metadata.get('theme_weights') or {}
+    for kind, key in ((DocumentTerm.THEME, 'themes'), (DocumentTerm.CATEGORY, 'categories')):
+        for position, term in enumerate(metadata.get(key) or []):
+            if not isinstance(term, str) or not term or (kind, term[:100]) in terms:
+                continue
+            weight = weights.get(term, 1.0) if kind == DocumentTerm.THEME else 1.0
+            terms[(kind, term[:100])] = (weight, position)
+    return terms
+
+def sync_document_terms(documents):
+    """Replace the DocumentTerm rows of documents with what their metadata lists now"""
+    documents = list(documents)
+    rows = []
+    for document in documents:
+        document._indexed_terms = metadata_terms(document.metadata)
+        rows.extend(
+            DocumentTerm(document=document, kind=kind, term=term, weight=weight, position=position)
+            for (kind, term), (weight, position) in document._indexed_terms.items()
+        )
+    
+    with transaction.atomic():
+        DocumentTerm.objects.filter(document__in=documents).delete()
+        DocumentTerm.objects.bulk_create(rows, batch_size=1000)
+
+@receiver(post_init, sender=Document)
+def remember_indexed_terms(sender, instance, **kwargs):
+    # Lets post_save skip the sync for the many saves that don't touch themes or categories
+    if 'metadata' in instance.get_deferred_fields():
+        instance._indexed_terms = None
+    else:
+        instance._indexed_terms = metadata_terms(instance.metadata)
+
+@receiver(post_save, sender=Document)
+def index_document_terms(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and 'metadata' not in update_fields:
+        return
+    previous = {} if created else instance._indexed_terms
+    if metadata_terms(instance.metadata) != previous:
+        sync_document_terms([instance])
@@ -0,0 +1,87 @@
+import os
+import threading
+from concurrent.futures import Future
+from django.conf import settings
+from filelock import FileLock, Timeout
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one call
+
+    Within a process, callers wait on the first caller's future. Across
+    processes on the same host, a file lock lets one process make the call
+    while the others wait and then re-check (e.g. the shared cache) before
+    calling themselves.
+    """
+
+    def __init__(self, lock_dir=None, lock_timeout=None):
+        self.lock_dir = lock_dir or settings.AI_SINGLE_FLIGHT_LOCK_DIR
+        self.lock_timeout = lock_timeout or settings.AI_SINGLE_FLIGHT_TIMEOUT
+        self._calls = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, func, recheck=None):
+        """Return func(), sharing one call among concurrent callers with the same key
+
+        recheck() is tried after waiting on another process; a non-None
+        result is returned without calling func.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._call_locked(key, func, recheck)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def _call_locked(self, key, func, recheck):
+        path = os.path.join(self.lock_dir, f"{key}.lock")
+        lock = FileLock(path, timeout=self.lock_timeout)
+        try:
+            with lock:
+                try:
+                    if recheck:
+                        result = recheck()
+                        if result is not None:
+                            return result
+                    return func()
+                finally:
+                    self._remove(path)
+        except Timeout:
+            # Don't keep a reader waiting on a stuck process; make the call ourselves
+            return func()
+
+    @staticmethod
+    def _remove(path):
+        # Keys are prompt hashes, so lock files would otherwise pile up. A process
+        # still waiting on the removed file may overlap with one that creates a new
+        # file, but both recheck first; at worst a failed call is retried twice.
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+def get_single_flight():
+    """The process-wide single-flight group for AI calls"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
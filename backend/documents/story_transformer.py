@@ -1,33 +1,45 @@
-from .ai_processor import AIStoryTransformer
+from .ai_processor import get_story_transformer
+from .concurrency import ordered_map
 from .models import Document, ContentChunk
+from .text_store import PageTextStore
 from django.conf import settings
 
 class StoryTransformationEngine:
     """Core engine for transforming documents into personalized stories"""
     
     def __init__(self):
-        self.ai_processor = AIStoryTransformer()
+        self.ai_processor = get_story_transformer()
     
     def transform_document(self, document, user_profile):
-        """Transform entire document based on user interests and reading level"""
-        chunks = document.chunks.all().order_by('chunk_index')
-        transformed_chunks = []
+        """Yield the document's text chunks transformed for the profile, in chunk order
+
+        Sections whose story for these interests and reading level is already
+        in the shared cache cost nothing, so re-personalizing only pays for
+        what changed. The rest are batched and transformed concurrently.
+        """
+        page_store = PageTextStore(document)
+        user_interests = user_profile.interests
+        reading_level = user_profile.reading_level
+        
+        def source_texts():
+            chunks = document.chunks.filter(content_type=ContentChunk.TEXT).order_by('chunk_index')
+            for chunk in chunks.iterator():
+                # Work from the stored source text rather than an earlier transformation
+                yield chunk.chunk_index, page_store.chunk_source_text(chunk)
         
-        for chunk in chunks:
-            if chunk.content_type == 'text':
-                transformed_content = self.ai_processor.transform_to_story(
-                    chunk.content,
-                    user_profile.interests,
-                    user_profile.reading_level
-                )
-                transformed_chunks.append({
-                    'chunk_index': chunk.chunk_index,
-                    'original_content': chunk.content,
+        def transform(batch):
+            originals = [original_content for chunk_index, original_content in batch]
+            return batch, self.ai_processor.transform_batch(originals, user_interests, reading_level)
+        
+        batches = self.ai_processor.batch_sections(source_texts(), lambda item: item[1])
+        for batch, stories in ordered_map(transform, batches, settings.STORY_MAX_IN_FLIGHT):
+            for (chunk_index, original_content), transformed_content in zip(batch, stories):
+                yield {
+                    'chunk_index': chunk_index,
+                    'original_content': original_content,
                     'transformed_content': transformed_content,
                     'reading_time': self._calculate_reading_time(transformed_content)
-                })
-        
-        return transformed_chunks
+                }
     
     def enhance_chunk_with_context(self, chunk, user_interests, reading_level):
         """Add contextual enhancements to a single chunk"""
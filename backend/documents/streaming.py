@@ -0,0 +1,63 @@
+import asyncio
+import json
+from rest_framework.renderers import BaseRenderer
+from .ai_accounting import ai_call_context
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets views answer clients that only accept text/event-stream"""
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only reached for error responses; streams bypass the renderer
+        return sse_event('error', data)
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def merge_streams(streams):
+    """Interleave several named async iterators, yielding (name, item) as items arrive
+
+    Each stream ends with a (name, None) item. Streams still running are
+    cancelled if the consumer stops early (e.g. the client disconnects).
+    """
+    queue = asyncio.Queue()
+
+    async def pump(name, stream):
+        try:
+            async for item in stream:
+                await queue.put((name, item))
+        finally:
+            await queue.put((name, None))
+
+    tasks = [asyncio.create_task(pump(name, stream)) for name, stream in streams.items()]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            name, item = await queue.get()
+            if item is None:
+                remaining -= 1
+            yield name, item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def enhancement_events(ai_transformer, text, user_interests, reading_level, user_id=None, document_id=None):
+    """SSE stream for the enhance panel, generating enhancements and connections concurrently"""
+    yield sse_event('original_content', {'text': text})
+
+    streams = {
+        'enhanced_content': ai_transformer.stream_contextual_enhancements(text, user_interests, reading_level),
+        'connections': ai_transformer.stream_connections(text, user_interests),
+    }
+    # The view has returned by now, so attribution is set up here where the calls run
+    with ai_call_context('enhance_stream', user_id, document_id):
+        async for field, piece in merge_streams(streams):
+            if piece is None:
+                yield sse_event(f'{field}_done', {})
+            else:
+                yield sse_event(field, {'text': piece})
+
+    yield sse_event('done', {})
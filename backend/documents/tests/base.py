@@ -0,0 +1,67 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from users.models import User
+from ..ai_accounting import get_hit_tally
+from ..models import ContentChunk, Document
+from ..text_store import PageTextStore
+
+def page_text(topic, paragraphs=2):
+    """Page text that splits into one story section per paragraph"""
+    return '\n\n'.join(
+        f"Paragraph {number} is about {topic}. " + ' '.join(f"{topic} detail {i}." for i in range(12))
+        for number in range(1, paragraphs + 1)
+    )
+
+@override_settings(
+    AI_BACKEND='offline',
+    AI_OFFLINE_LATENCY_MS=0,
+    AI_OFFLINE_JITTER_MS=0,
+    AI_OFFLINE_ERROR_RATE=0,
+    AI_OFFLINE_RATE_LIMIT_RATE=0,
+    AI_MAX_RETRIES=0,
+    STORY_MAX_IN_FLIGHT=1
+)
+class OfflineAITestCase(TestCase):
+    """Runs against the offline AI backend with fresh process-wide AI state per test"""
+
+    def setUp(self):
+        # The backend, scheduler, transformer and cache are process-wide singletons
+        for name in ('ai_backends._backend', 'ai_resilience._scheduler', 'ai_processor._transformer',
+                     'ai_cache._cache', 'ai_accounting._hit_tally', 'single_flight._single_flight'):
+            patcher = mock.patch(f'documents.{name}', None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Cache hits are tallied in memory; save them while the test database is still there
+        self.addCleanup(lambda: get_hit_tally().flush())
+
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='pw12345678')
+
+    def create_document(self, reading_mode='direct', story_strategy=Document.EAGER, user=None, pages=()):
+        """A document whose page text is already stored, so no PDF is needed"""
+        document = Document.objects.create(
+            user=user or self.user,
+            title=f'{reading_mode} document',
+            original_filename='book.pdf',
+            file='documents/book.pdf',
+            file_size=1024,
+            content_hash=f'{Document.objects.count() + 1:064x}',
+            reading_mode=reading_mode,
+            story_strategy=story_strategy
+        )
+        store = PageTextStore(document)
+        for page_num, text in enumerate(pages, 1):
+            store.save_page(page_num, text, len(pages))
+        return document
+
+    def create_chunks(self, document, contents, is_transformed=True):
+        return ContentChunk.objects.bulk_create([
+            ContentChunk(
+                document=document,
+                chunk_index=index,
+                content_type=ContentChunk.TEXT,
+                content=content,
+                metadata={'page_number': 1, 'section_index': index},
+                is_transformed=is_transformed
+            )
+            for index, content in enumerate(contents)
+        ])
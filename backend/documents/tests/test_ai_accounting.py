@@ -0,0 +1,66 @@
+from unittest import mock
+from ..ai_accounting import ai_call_context, get_hit_tally, measure_call, note_retry, new_record, report_usage
+from ..ai_backends import OfflineBackend
+from ..ai_processor import get_story_transformer
+from ..models import AICallRecord
+from .base import OfflineAITestCase, page_text
+
+class AICallRecordTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.document = self.create_document('story')
+        self.transformer = get_story_transformer()
+
+    def transform(self, topic='comets'):
+        with ai_call_context('story_ingest', self.user.id, self.document.id):
+            return self.transformer.transform_to_story(page_text(topic, 1), ['science'])
+
+    def test_miss_is_recorded_with_its_context(self):
+        story = self.transform()
+
+        record = AICallRecord.objects.get()
+        self.assertEqual(record.cache, AICallRecord.MISS)
+        self.assertEqual(record.outcome, AICallRecord.OK)
+        self.assertEqual((record.caller, record.user_id, record.document_id),
+                         ('story_ingest', self.user.id, self.document.id))
+        self.assertEqual(record.model_name, self.transformer.backend.model_name)
+        self.assertEqual(record.response_chars, len(story))
+        self.assertGreater(record.prompt_tokens, 0)
+        self.assertGreater(record.response_tokens, 0)
+
+    def test_hits_are_tallied_into_one_row(self):
+        self.transform()
+        self.transform()
+        self.transform()
+        self.assertEqual(AICallRecord.objects.count(), 1)
+
+        get_hit_tally().flush()
+        hit = AICallRecord.objects.get(cache=AICallRecord.HIT)
+        miss = AICallRecord.objects.get(cache=AICallRecord.MISS)
+        self.assertEqual(hit.call_count, 2)
+        self.assertEqual(hit.prompt_chars, 2 * miss.prompt_chars)
+        self.assertEqual(hit.caller, 'story_ingest')
+
+    def test_failed_call_is_recorded_as_fallback(self):
+        with mock.patch.object(OfflineBackend, 'generate', side_effect=RuntimeError('down')):
+            self.transform()
+
+        self.assertEqual(AICallRecord.objects.get().outcome, AICallRecord.FALLBACK)
+
+    def test_calls_outside_a_context_are_attributed_to_other(self):
+        self.transformer.transform_to_story(page_text('tides', 1), ['science'])
+
+        record = AICallRecord.objects.get()
+        self.assertEqual((record.caller, record.user_id, record.document_id), ('other', None, None))
+
+    def test_retries_and_reported_usage_go_to_the_current_call(self):
+        record = new_record('model', 'prompt', AICallRecord.MISS)
+        with measure_call(record):
+            note_retry()
+            note_retry()
+            report_usage(prompt_tokens=120, response_tokens=40)
+        note_retry()
+
+        self.assertEqual(record.retries, 2)
+        self.assertEqual((record.prompt_tokens, record.response_tokens), (120, 40))
@@ -0,0 +1,53 @@
+import time
+from datetime import timedelta
+from unittest import mock
+from django.utils import timezone
+from ..ai_backends import OfflineBackend
+from ..ai_cache import TransformationCache
+from ..ai_processor import get_story_transformer
+from ..models import TransformationCacheEntry
+from .base import OfflineAITestCase, page_text
+
+class TransformationCacheTests(OfflineAITestCase):
+
+    def test_hits_and_misses(self):
+        cache = TransformationCache(ttl=60)
+        key = cache.make_key('story', 'some text')
+
+        self.assertIsNone(cache.get(key))
+        cache.set(key, 'a story')
+        self.assertEqual(cache.get(key), 'a story')
+        # Another process only shares the database tier
+        self.assertEqual(TransformationCache(ttl=60).get(key), 'a story')
+
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['memory_hits'], 1)
+        self.assertEqual(TransformationCacheEntry.objects.get(key=key).hits, 1)
+
+    def test_expired_entries_miss_and_are_pruned(self):
+        cache = TransformationCache(ttl=60)
+        key = cache.make_key('story', 'old text')
+        TransformationCacheEntry.objects.create(key=key, response='stale', expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.prune(), 1)
+        self.assertFalse(TransformationCacheEntry.objects.exists())
+
+    def test_memory_entries_expire(self):
+        cache = TransformationCache(ttl=60)
+        key = cache.make_key('story', 'text')
+        cache.set(key, 'a story')
+
+        with mock.patch('documents.ai_cache.time.time', return_value=time.time() + 120):
+            TransformationCacheEntry.objects.filter(key=key).update(expires_at=timezone.now())
+            self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.stats()['memory_entries'], 0)
+
+    def test_repeated_transform_calls_backend_once(self):
+        transformer = get_story_transformer()
+        with mock.patch.object(OfflineBackend, 'generate', autospec=True, side_effect=OfflineBackend.respond) as generate:
+            first = transformer.transform_to_story(page_text('comets', 1), ['science'])
+            second = transformer.transform_to_story(page_text('comets', 1), ['science'])
+
+        self.assertEqual(first, second)
+        self.assertEqual(generate.call_count, 1)
@@ -0,0 +1,59 @@
+import threading
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from .. import ai_client
+from ..ai_backends import GeminiBackend
+
+@override_settings(GEMINI_API_KEY='test-key', GEMINI_MAX_CONNECTIONS=7, GEMINI_TIMEOUT_MS=1000)
+class SharedClientTests(SimpleTestCase):
+
+    def setUp(self):
+        for name, value in (('_client', None), ('_client_pid', None)):
+            patcher = mock.patch.object(ai_client, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ai_client.genai, 'Client', side_effect=lambda **kwargs: mock.Mock())
+        self.client_class = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_client_is_created_once_and_shared(self):
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(ai_client.get_gemini_client())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.client_class.call_count, 1)
+        self.assertEqual(len({id(client) for client in clients}), 1)
+
+    def test_connection_pool_is_bounded(self):
+        ai_client.get_gemini_client()
+
+        options = self.client_class.call_args.kwargs['http_options']
+        self.assertEqual(self.client_class.call_args.kwargs['api_key'], 'test-key')
+        self.assertEqual(options.timeout, 1000)
+        self.assertEqual(options.client_args['limits'].max_connections, 7)
+        self.assertEqual(options.async_client_args['limits'].max_connections, 7)
+
+    def test_forked_process_gets_its_own_client(self):
+        parent = ai_client.get_gemini_client()
+        with mock.patch.object(ai_client.os, 'getpid', return_value=ai_client._client_pid + 1):
+            child = ai_client.get_gemini_client()
+
+        self.assertIsNot(child, parent)
+        self.assertEqual(self.client_class.call_count, 2)
+
+    def test_close_releases_the_pool(self):
+        client = ai_client.get_gemini_client()
+        GeminiBackend().close()
+
+        client.close.assert_called_once_with()
+        self.assertIsNot(ai_client.get_gemini_client(), client)
+
+    def test_close_leaves_a_parent_client_alone(self):
+        client = ai_client.get_gemini_client()
+        with mock.patch.object(ai_client.os, 'getpid', return_value=ai_client._client_pid + 1):
+            ai_client.shutdown_gemini_client()
+
+        client.close.assert_not_called()
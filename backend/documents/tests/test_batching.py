@@ -0,0 +1,39 @@
+from unittest import mock
+from ..ai_backends import OfflineBackend
+from ..ai_processor import get_story_transformer
+from .base import OfflineAITestCase, page_text
+
+class BatchResponseTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.transformer = get_story_transformer()
+
+    def test_sections_in_order(self):
+        response = "=== SECTION 1 ===\nFirst story\n\n=== SECTION 2 ===\nSecond story"
+        self.assertEqual(self.transformer.parse_batch_response(response, 2), ['First story', 'Second story'])
+
+    def test_sections_out_of_order(self):
+        response = "=== SECTION 2 ===\nSecond story\n== Section 1 ==\nFirst story"
+        self.assertEqual(self.transformer.parse_batch_response(response, 2), ['First story', 'Second story'])
+
+    def test_missing_and_extra_sections(self):
+        response = (
+            "Here you go!\n=== SECTION 1 ===\nFirst story\n=== SECTION 3 ===\n\n"
+            "=== SECTION 1 ===\nDuplicate\n=== SECTION 4 ===\nOut of range"
+        )
+        self.assertEqual(self.transformer.parse_batch_response(response, 3), ['First story', None, None])
+
+    def test_no_markers(self):
+        self.assertEqual(self.transformer.parse_batch_response("Just one story", 2), [None, None])
+
+    def test_missing_sections_are_transformed_singly(self):
+        texts = [page_text('volcanoes', 1), page_text('glaciers', 1), page_text('deserts', 1)]
+        with mock.patch.object(OfflineBackend, 'respond', autospec=True, side_effect=lambda backend, prompt: (
+            "=== SECTION 2 ===\nOnly the second" if 'SECTION' in prompt else f"Single story {len(prompt)}"
+        )):
+            stories = self.transformer.transform_batch(texts, ['science'])
+
+        self.assertEqual(stories[1], 'Only the second')
+        self.assertTrue(stories[0].startswith('Single story'))
+        self.assertTrue(stories[2].startswith('Single story'))
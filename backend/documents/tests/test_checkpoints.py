@@ -0,0 +1,80 @@
+from unittest import mock
+from django.test import override_settings
+from ..extraction import PageProcessingError
+from ..models import Document, PageCheckpoint
+from ..pdf_processor import PDFProcessor
+from ..text_store import PageTextStore
+from .base import OfflineAITestCase
+
+class FakeExtractor:
+    """Stands in for PageExtractionEngine, failing on the poisoned pages"""
+
+    def __init__(self, pages, poisoned=()):
+        self.pages = pages
+        self.poisoned = set(poisoned)
+        self.start_pages = []
+
+    def count_pages(self, path):
+        return len(self.pages)
+
+    def extract_pages(self, path, page_count=None, start_page=1, skip_pages=()):
+        self.start_pages.append(start_page)
+        for page_num in range(start_page, len(self.pages) + 1):
+            if page_num in skip_pages:
+                continue
+            if page_num in self.poisoned:
+                raise PageProcessingError(page_num, 'unreadable page')
+            yield page_num, self.pages[page_num - 1]
+
+@override_settings(PAGE_MAX_RETRIES=2)
+class PageCheckpointTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pages = [f"Page {page_num} text about photosynthesis." for page_num in range(1, 5)]
+        self.document = self.create_document()
+
+    def process(self, extractor):
+        processor = PDFProcessor(self.document.id)
+        processor.page_store = PageTextStore(processor.document, extractor)
+        processor.process_document()
+
+    def test_resumes_from_checkpoint_and_skips_poisoned_page(self):
+        extractor = FakeExtractor(self.pages, poisoned={3})
+
+        with self.assertRaises(PageProcessingError):
+            self.process(extractor)
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.status, Document.FAILED)
+        self.assertEqual(self.document.processed_pages, 2)
+        self.assertEqual(self.document.checkpoints.get(page_number=3).status, PageCheckpoint.FAILED)
+
+        # The second attempt starts at the failing page and gives up on it
+        self.process(extractor)
+        self.document.refresh_from_db()
+        self.assertEqual(extractor.start_pages, [1, 3, 3])
+        self.assertEqual(self.document.status, Document.COMPLETED)
+        self.assertEqual(self.document.checkpoints.get(page_number=3).status, PageCheckpoint.SKIPPED)
+        self.assertEqual(
+            list(self.document.chunks.values_list('chunk_index', 'metadata__page_number')),
+            [(0, 1), (1, 2), (2, 4)]
+        )
+
+    def test_completed_pages_are_not_extracted_again(self):
+        extractor = FakeExtractor(self.pages, poisoned={3})
+        with self.assertRaises(PageProcessingError):
+            self.process(extractor)
+
+        extractor.poisoned.clear()
+        self.process(extractor)
+        self.assertEqual(extractor.start_pages, [1, 3])
+        self.assertEqual(self.document.chunks.count(), 4)
+
+    def test_failed_batch_commit_is_not_retried(self):
+        processor = PDFProcessor(self.document.id)
+        processor.page_store = PageTextStore(processor.document, FakeExtractor(self.pages))
+
+        with mock.patch.object(processor, '_commit_batch', side_effect=RuntimeError('disk full')) as commit:
+            with self.assertRaisesMessage(RuntimeError, 'disk full'):
+                processor.save_pages(processor.process_direct_mode(), batch_size=2)
+        self.assertEqual(commit.call_count, 1)
@@ -0,0 +1,89 @@
+import contextvars
+import threading
+import time
+from django.test import SimpleTestCase
+from ..concurrency import ordered_map
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+class OrderedMapTests(SimpleTestCase):
+
+    def test_results_keep_input_order(self):
+        # Later items finish first
+        def slow_square(n):
+            time.sleep((5 - n) * 0.01)
+            return n * n
+
+        self.assertEqual(list(ordered_map(slow_square, range(5), 3)), [0, 1, 4, 9, 16])
+
+    def test_in_flight_calls_are_bounded(self):
+        lock = threading.Lock()
+        running = [0]
+        peak = [0]
+
+        def track(n):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return n
+
+        self.assertEqual(list(ordered_map(track, range(20), 3)), list(range(20)))
+        self.assertLessEqual(peak[0], 3)
+
+    def test_input_is_pulled_lazily(self):
+        pulled = []
+
+        def items():
+            for n in range(100):
+                pulled.append(n)
+                yield n
+
+        results = ordered_map(lambda n: n, items(), 2)
+        self.assertEqual(next(results), 0)
+        self.assertLess(len(pulled), 10)
+        results.close()
+
+    def test_failed_call_raises_in_order(self):
+        started = []
+
+        def fail_on_two(n):
+            started.append(n)
+            time.sleep(0.01)
+            if n == 2:
+                raise ValueError('bad item')
+            return n
+
+        results = []
+        with self.assertRaisesMessage(ValueError, 'bad item'):
+            for result in ordered_map(fail_on_two, range(50), 2):
+                results.append(result)
+
+        # Nothing after the failure is handed out, and the rest of the input is never started
+        self.assertEqual(results, [0, 1])
+        self.assertLess(len(started), 10)
+
+    def test_input_failure_after_submitted_items(self):
+        def items():
+            yield 1
+            yield 2
+            raise RuntimeError('input broke')
+
+        results = []
+        with self.assertRaisesMessage(RuntimeError, 'input broke'):
+            for result in ordered_map(lambda n: n * 10, items(), 4):
+                results.append(result)
+        self.assertEqual(results, [10, 20])
+
+    def test_single_slot_runs_inline(self):
+        threads = set(ordered_map(lambda n: threading.get_ident(), range(3), 1))
+        self.assertEqual(threads, {threading.get_ident()})
+
+    def test_context_follows_calls_into_threads(self):
+        token = request_id.set('req-1')
+        try:
+            self.assertEqual(list(ordered_map(lambda n: request_id.get(), range(4), 2)), ['req-1'] * 4)
+        finally:
+            request_id.reset(token)
@@ -0,0 +1,43 @@
+from collections import Counter
+from django.test import SimpleTestCase
+from ..content_intelligence import ContentIntelligenceEngine, TextStatistics
+from ..models import Document
+from .base import OfflineAITestCase
+
+class TextStatisticsTests(SimpleTestCase):
+
+    def test_matches_whole_text_figures(self):
+        pieces = ['Volcanoes erupt. Lava flows downhill', ' slowly. Ash clouds rise.', '', 'Magma cools']
+        stats = TextStatistics()
+        for piece in pieces:
+            stats.add(piece)
+
+        whole = ' '.join(pieces)
+        sentences = whole.split('.')
+        self.assertEqual(stats.words, len(whole.split()))
+        self.assertEqual(stats.avg_sentence_length, sum(len(s.split()) for s in sentences) / len(sentences))
+        self.assertEqual(stats.terms, Counter(['volcanoes', 'erupt', 'lava', 'flows', 'downhill',
+                                               'slowly', 'clouds', 'rise', 'magma', 'cools']))
+
+    def test_empty(self):
+        stats = TextStatistics()
+
+        self.assertEqual(stats.words, 0)
+        self.assertEqual(stats.avg_sentence_length, 0)
+        self.assertEqual(stats.terms, Counter())
+
+class AnalyzeDocumentStructureTests(OfflineAITestCase):
+
+    def test_measures_the_chunks_the_reader_sees(self):
+        # The stored page text differs from the (transformed) chunks
+        document = self.create_document('story', Document.EAGER, pages=['source text ' * 500])
+        chunks = ['Chapter one. ' + 'comet ' * 200, 'comet tail ' * 100, 'orbit ' * 100]
+        self.create_chunks(document, chunks)
+
+        metadata = ContentIntelligenceEngine().analyze_document_structure(document)
+
+        self.assertEqual(metadata['total_words'], sum(len(chunk.split()) for chunk in chunks))
+        self.assertEqual(metadata['estimated_reading_time'], 2)
+        self.assertEqual(metadata['structure_type'], 'short_form')
+        self.assertIn('comet', document.metadata['themes'])
+        self.assertNotIn('source', document.metadata['themes'])
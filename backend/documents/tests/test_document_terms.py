@@ -0,0 +1,78 @@
+from unittest import mock
+from ..models import Document, DocumentTerm
+from ..themes import ThemeExtractor
+from .base import OfflineAITestCase
+
+class DocumentTermSignalTests(OfflineAITestCase):
+
+    def terms(self, document):
+        return list(DocumentTerm.objects.filter(document=document).values_list('kind', 'term', 'weight', 'position'))
+
+    def test_metadata_lists_are_indexed_on_save(self):
+        document = self.create_document()
+        document.metadata = {
+            'themes': ['comet', 'orbit', 'comet', '', 42],
+            'theme_weights': {'comet': 0.8, 'orbit': 0.6},
+            'categories': ['science']
+        }
+        document.save()
+
+        self.assertEqual(self.terms(document), [
+            (DocumentTerm.CATEGORY, 'science', 1.0, 0),
+            (DocumentTerm.THEME, 'comet', 0.8, 0),
+            (DocumentTerm.THEME, 'orbit', 0.6, 1),
+        ])
+
+    def test_changed_lists_replace_the_rows(self):
+        document = self.create_document()
+        document.metadata = {'themes': ['comet', 'orbit']}
+        document.save()
+
+        document = Document.objects.get(id=document.id)
+        document.metadata = {'themes': ['glacier']}
+        document.save()
+
+        self.assertEqual(self.terms(document), [(DocumentTerm.THEME, 'glacier', 1.0, 0)])
+
+    def test_saves_that_leave_the_lists_alone_skip_the_sync(self):
+        document = self.create_document()
+        document.metadata = {'themes': ['comet']}
+        document.save()
+        document = Document.objects.get(id=document.id)
+
+        with mock.patch('documents.signals.sync_document_terms') as sync:
+            document.title = 'Renamed'
+            document.metadata['total_words'] = 500
+            document.save()
+            document.metadata['themes'] = ['orbit']
+            document.save(update_fields=['title'])
+        sync.assert_not_called()
+
+    def test_deferred_metadata_is_synced_when_saved(self):
+        document = self.create_document()
+        document.metadata = {'themes': ['comet']}
+        document.save()
+
+        deferred = Document.objects.only('id', 'title').get(id=document.id)
+        deferred.title = 'Renamed'
+        deferred.save()
+
+        self.assertEqual(self.terms(document), [(DocumentTerm.THEME, 'comet', 1.0, 0)])
+
+    def test_recompute_syncs_terms(self):
+        document = self.create_document()
+        ThemeExtractor(min_term_count=1).index_document(document, {'comet': 4, 'orbit': 1})
+
+        ThemeExtractor(min_term_count=1).recompute()
+
+        self.assertEqual([term for _, term, _, _ in self.terms(document)], ['comet', 'orbit'])
+
+    def test_queryset_helpers(self):
+        for themes in (['comet', 'orbit'], ['comet', 'tail'], ['tail']):
+            document = self.create_document()
+            document.metadata = {'themes': themes, 'categories': ['science']}
+            document.save()
+
+        self.assertEqual(DocumentTerm.objects.themes().counts(), {'comet': 2, 'orbit': 1, 'tail': 2})
+        self.assertEqual(DocumentTerm.objects.themes().top(1).counts(), {'comet': 2, 'tail': 1})
+        self.assertEqual(DocumentTerm.objects.categories().counts(), {'science': 3})
@@ -0,0 +1,94 @@
+from unittest import mock
+from django.test import override_settings
+from rest_framework.test import APIClient
+from users.models import User, UserProfile
+from ..ai_backends import OfflineBackend
+from ..enhancements import EnhancementPrecomputer, get_stored_enhancement, schedule_precompute
+from ..job_queue import IngestWorker
+from ..models import ChunkEnhancement, Document, ProcessingJob, ReadingSession
+from ..pdf_processor import PDFProcessor
+from .base import OfflineAITestCase
+
+@override_settings(ENHANCE_PREFETCH_BEHIND=1, ENHANCE_PREFETCH_AHEAD=2, ENHANCE_AFTER_INGEST=True)
+class EnhancementPrecomputeTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        UserProfile.objects.create(user=self.user, interests=['science'], reading_level='casual')
+        self.document = self.create_document()
+        self.create_chunks(self.document, [f'Chunk {i} about the water cycle.' for i in range(10)])
+
+    def enhanced_indexes(self, document=None):
+        return sorted(ChunkEnhancement.objects.filter(
+            chunk__document=document or self.document
+        ).values_list('chunk__chunk_index', flat=True))
+
+    def test_enhances_chunks_around_reader_position(self):
+        ReadingSession.objects.create(user=self.user, document=self.document, current_chunk=5)
+
+        self.assertEqual(EnhancementPrecomputer().run(), (4, 0))
+        self.assertEqual(self.enhanced_indexes(), [4, 5, 6, 7])
+        # Nothing left to do on the next pass
+        self.assertEqual(EnhancementPrecomputer().run(), (0, 0))
+
+    def test_readers_with_the_same_profile_share_enhancements(self):
+        other = User.objects.create_user(username='other', email='other@example.com', password='pw12345678')
+        UserProfile.objects.create(user=other, interests=['science'], reading_level='casual')
+        ReadingSession.objects.create(user=self.user, document=self.document, current_chunk=5)
+        ReadingSession.objects.create(user=other, document=self.document, current_chunk=6)
+
+        self.assertEqual(EnhancementPrecomputer().run(), (5, 0))
+        self.assertEqual(self.enhanced_indexes(), [4, 5, 6, 7, 8])
+
+    def test_untransformed_story_sections_are_skipped(self):
+        document = self.create_document('story', Document.LAZY)
+        self.create_chunks(document, ['Raw section one.', 'Raw section two.'], is_transformed=False)
+        ReadingSession.objects.create(user=self.user, document=document, current_chunk=0)
+
+        self.assertEqual(EnhancementPrecomputer().run(), (0, 0))
+
+    def test_fallbacks_are_counted_not_stored(self):
+        ReadingSession.objects.create(user=self.user, document=self.document, current_chunk=0)
+
+        with mock.patch.object(OfflineBackend, 'generate', side_effect=ValueError('bad prompt')):
+            self.assertEqual(EnhancementPrecomputer().run(), (0, 3))
+        self.assertFalse(ChunkEnhancement.objects.exists())
+
+    def test_stored_enhancement_is_served_without_ai_call(self):
+        ReadingSession.objects.create(user=self.user, document=self.document, current_chunk=0)
+        EnhancementPrecomputer().run()
+        chunk = self.document.chunks.get(chunk_index=1)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with mock.patch.object(OfflineBackend, 'generate') as generate:
+            response = client.get(f'/api/chunks/{chunk.id}/enhance/')
+        generate.assert_not_called()
+        stored = get_stored_enhancement(chunk, ['science'], 'casual')
+        self.assertEqual(response.data['enhanced_content'], stored.enhanced_content)
+
+    def test_processed_document_queues_precompute(self):
+        document = self.create_document(pages=['Page one about rivers.', 'Page two about lakes.'])
+        PDFProcessor(document.id).process_document()
+
+        job = ProcessingJob.objects.get(document=document, job_type=ProcessingJob.ENHANCE)
+        self.assertEqual((job.status, job.user_id), (ProcessingJob.QUEUED, self.user.id))
+        # Only one job waits per document
+        self.assertIsNone(schedule_precompute(document))
+
+    def test_precompute_job_enhances_opening_chunks_for_owner(self):
+        job = schedule_precompute(self.document)
+
+        IngestWorker().run(once=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProcessingJob.DONE)
+        self.assertEqual(self.enhanced_indexes(), [0, 1, 2])
+
+    def test_lazy_documents_are_not_queued(self):
+        document = self.create_document('story', Document.LAZY)
+        self.assertIsNone(schedule_precompute(document))
+
+    @override_settings(ENHANCE_AFTER_INGEST=False)
+    def test_can_be_turned_off(self):
+        self.assertIsNone(schedule_precompute(self.document))
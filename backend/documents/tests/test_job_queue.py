@@ -0,0 +1,78 @@
+from datetime import timedelta
+from django.test import override_settings
+from django.utils import timezone
+from ..job_queue import JobQueue
+from ..models import Document, ProcessingJob
+from .base import OfflineAITestCase
+
+@override_settings(INGEST_LEASE_SECONDS=60, INGEST_MAX_ATTEMPTS=2)
+class JobQueueTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.document = self.create_document()
+        self.job = JobQueue.enqueue(self.document)
+
+    def expire_lease(self):
+        ProcessingJob.objects.filter(id=self.job.id).update(leased_until=timezone.now() - timedelta(seconds=1))
+
+    def test_enqueue_reuses_waiting_job(self):
+        self.assertEqual(JobQueue.enqueue(self.document).id, self.job.id)
+
+    def test_lease_is_exclusive(self):
+        job = JobQueue('worker-1').lease()
+
+        self.assertEqual(job.id, self.job.id)
+        self.assertEqual(job.status, ProcessingJob.RUNNING)
+        self.assertEqual(job.leased_by, 'worker-1')
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(JobQueue('worker-2').lease())
+
+    def test_renew_extends_own_lease_only(self):
+        owner = JobQueue('worker-1')
+        job = owner.lease()
+        self.expire_lease()
+
+        self.assertEqual(JobQueue('worker-2').renew(job), 0)
+        self.assertEqual(owner.renew(job), 1)
+        job.refresh_from_db()
+        self.assertGreater(job.leased_until, timezone.now() + timedelta(seconds=50))
+        self.assertIsNone(JobQueue('worker-2').lease())
+
+    def test_expired_lease_is_reclaimed(self):
+        first = JobQueue('worker-1')
+        job = first.lease()
+        self.expire_lease()
+
+        reclaimed = JobQueue('worker-2').lease()
+        self.assertEqual(reclaimed.id, job.id)
+        self.assertEqual(reclaimed.leased_by, 'worker-2')
+        self.assertEqual(reclaimed.attempts, 2)
+
+        # The first worker lost the job and can no longer finish it
+        first.complete(job)
+        reclaimed.refresh_from_db()
+        self.assertEqual(reclaimed.status, ProcessingJob.RUNNING)
+
+    def test_expired_last_attempt_fails_job_and_document(self):
+        JobQueue('worker-1').lease()
+        Document.objects.filter(id=self.document.id).update(status=Document.PROCESSING)
+        ProcessingJob.objects.filter(id=self.job.id).update(attempts=2)
+        self.expire_lease()
+
+        self.assertIsNone(JobQueue('worker-2').lease())
+        self.job.refresh_from_db()
+        self.document.refresh_from_db()
+        self.assertEqual(self.job.status, ProcessingJob.FAILED)
+        self.assertEqual(self.document.status, Document.FAILED)
+
+    def test_fail_requeues_until_out_of_attempts(self):
+        queue = JobQueue('worker-1')
+        queue.fail(queue.lease(), Exception('boom'))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ProcessingJob.QUEUED)
+
+        queue.fail(queue.lease(), Exception('boom again'))
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ProcessingJob.FAILED)
+        self.assertEqual(self.job.last_error, 'boom again')
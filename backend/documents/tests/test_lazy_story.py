@@ -0,0 +1,55 @@
+from unittest import mock
+from django.test import override_settings
+from rest_framework.test import APIClient
+from ..ai_backends import OfflineBackend
+from ..models import Document
+from .base import OfflineAITestCase, page_text
+
+class LazyStoryTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.document = self.create_document('story', Document.LAZY)
+        self.create_chunks(self.document, [page_text(f'topic{i}', 1) for i in range(6)], is_transformed=False)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_range_transforms_only_requested_chunks(self):
+        response = self.client.get(f'/api/documents/{self.document.id}/chunks/range/', {'start': 2, 'end': 4})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([chunk['chunk_index'] for chunk in response.data], [2, 3])
+        self.assertTrue(all(chunk['content'].startswith('[offline') for chunk in response.data))
+        self.assertEqual(
+            list(self.document.chunks.filter(is_transformed=True).values_list('chunk_index', flat=True)),
+            [2, 3]
+        )
+
+    def test_range_is_transformed_once(self):
+        url = f'/api/documents/{self.document.id}/chunks/range/'
+        first = self.client.get(url, {'start': 0, 'end': 2}).data
+
+        with mock.patch.object(OfflineBackend, 'generate') as generate:
+            second = self.client.get(url, {'start': 0, 'end': 2}).data
+        generate.assert_not_called()
+        self.assertEqual([chunk['content'] for chunk in first], [chunk['content'] for chunk in second])
+
+    @override_settings(LAZY_STORY_PAGE_SIZE=2)
+    def test_unbounded_chunks_transforms_one_window(self):
+        response = self.client.get(f'/api/documents/{self.document.id}/chunks/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([chunk['chunk_index'] for chunk in response.data], [0, 1])
+        self.assertEqual(self.document.chunks.filter(is_transformed=True).count(), 2)
+
+    @override_settings(LAZY_STORY_PAGE_SIZE=2, LAZY_STORY_MAX_RANGE=3)
+    def test_chunks_limit_is_capped(self):
+        response = self.client.get(f'/api/documents/{self.document.id}/chunks/', {'after': 0, 'limit': 100})
+
+        self.assertEqual([chunk['chunk_index'] for chunk in response.data], [1, 2, 3])
+        self.assertEqual(self.document.chunks.filter(is_transformed=True).count(), 3)
+
+    def test_invalid_range(self):
+        url = f'/api/documents/{self.document.id}/chunks/range/'
+        self.assertEqual(self.client.get(url, {'start': 4, 'end': 2}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'x'}).status_code, 400)
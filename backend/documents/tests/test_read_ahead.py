@@ -0,0 +1,86 @@
+from unittest import mock
+from django.test import override_settings
+from ..lazy_story import LazyStoryTransformer
+from ..models import Document, ProcessingJob, ReadingSession
+from ..read_ahead import ReadAheadScheduler, read_ahead_size
+from .base import OfflineAITestCase, page_text
+
+@override_settings(READ_AHEAD_CHUNKS=2, READ_AHEAD_MAX_CHUNKS=6, READ_AHEAD_ENHANCE=False)
+class ReadAheadTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.document = self.create_document('story', Document.LAZY)
+        self.create_chunks(self.document, [page_text(f'topic{i}', 1) for i in range(8)], is_transformed=False)
+        self.session = ReadingSession.objects.create(user=self.user, document=self.document, current_chunk=0)
+
+    def read_ahead_jobs(self, **filters):
+        return ProcessingJob.objects.filter(job_type=ProcessingJob.READ_AHEAD, **filters)
+
+    def test_size_scales_with_reading_speed(self):
+        self.assertEqual(read_ahead_size(200), 2)
+        self.assertEqual(read_ahead_size(400), 4)
+        self.assertEqual(read_ahead_size(50), 1)
+        self.assertEqual(read_ahead_size(2000), 6)
+
+    def test_waiting_job_moves_with_the_reader(self):
+        job = ReadAheadScheduler().schedule(self.session)
+        self.session.current_chunk = 3
+        moved = ReadAheadScheduler().schedule(self.session)
+
+        self.assertEqual(moved.id, job.id)
+        self.assertEqual(moved.payload, {'start': 4, 'end': 6})
+        self.assertEqual(self.read_ahead_jobs().count(), 1)
+
+    def test_eager_document_needs_no_job(self):
+        document = self.create_document('direct')
+        session = ReadingSession.objects.create(user=self.user, document=document)
+
+        self.assertIsNone(ReadAheadScheduler().schedule(session))
+        self.assertFalse(self.read_ahead_jobs().exists())
+
+    def test_switching_documents_cancels_queued_and_running_jobs(self):
+        queued = ReadAheadScheduler().schedule(self.session)
+        running = ProcessingJob.objects.create(
+            document=self.document, job_type=ProcessingJob.READ_AHEAD, user=self.user,
+            status=ProcessingJob.RUNNING, payload={'start': 1, 'end': 3}
+        )
+        other = self.create_document('story', Document.LAZY)
+        ReadAheadScheduler().schedule(ReadingSession.objects.create(user=self.user, document=other))
+
+        for job in (queued, running):
+            job.refresh_from_db()
+            self.assertEqual(job.status, ProcessingJob.CANCELLED)
+        self.assertTrue(self.read_ahead_jobs(document=other, status=ProcessingJob.QUEUED).exists())
+
+    def test_run_transforms_the_range(self):
+        job = ReadAheadScheduler().schedule(self.session)
+        ReadAheadScheduler().run(job)
+
+        self.assertEqual(
+            list(self.document.chunks.filter(is_transformed=True).values_list('chunk_index', flat=True)),
+            [1, 2]
+        )
+
+    @override_settings(READ_AHEAD_CHUNKS=1)
+    def test_run_stops_between_batches_once_cancelled(self):
+        job = ProcessingJob.objects.create(
+            document=self.document, job_type=ProcessingJob.READ_AHEAD, user=self.user,
+            status=ProcessingJob.RUNNING, payload={'start': 1, 'end': 5}
+        )
+        ensure_transformed = LazyStoryTransformer.ensure_transformed
+
+        def transform_then_cancel(transformer, chunks):
+            # The reader moves to another document while the first batch is in flight
+            ProcessingJob.objects.filter(id=job.id).update(status=ProcessingJob.CANCELLED)
+            return ensure_transformed(transformer, chunks)
+
+        with mock.patch.object(LazyStoryTransformer, 'ensure_transformed', autospec=True,
+                               side_effect=transform_then_cancel) as transform:
+            ReadAheadScheduler().run(job)
+
+        self.assertEqual(transform.call_count, 1)
+        self.assertEqual(
+            list(self.document.chunks.filter(is_transformed=True).values_list('chunk_index', flat=True)),
+            [1]
+        )
@@ -0,0 +1,49 @@
+from django.test import override_settings
+from ..ai_backends import get_ai_backend
+from ..ai_resilience import get_ai_scheduler
+from ..models import Document, ProcessingJob
+from ..pdf_processor import PDFProcessor
+from ..repair import FallbackRepairService
+from .base import OfflineAITestCase, page_text
+
+@override_settings(AI_CIRCUIT_FAILURE_THRESHOLD=1, AI_CIRCUIT_RESET_TIMEOUT=60)
+class FallbackRepairTests(OfflineAITestCase):
+
+    def test_circuit_fallback_then_repair(self):
+        document = self.create_document('story', pages=[page_text('tides'), page_text('moons')])
+        backend = get_ai_backend()
+        backend.error_rate = 1
+
+        PDFProcessor(document.id).process_document()
+        document.refresh_from_db()
+        scheduler = get_ai_scheduler()
+        service = FallbackRepairService()
+        pending = service.pending_chunks(document)
+
+        # The document is readable with the original text while the AI is down
+        self.assertEqual(document.status, Document.COMPLETED)
+        self.assertTrue(scheduler.breaker.is_open)
+        self.assertEqual(pending.count(), 4)
+        self.assertTrue(all(chunk.content.startswith('Paragraph') for chunk in pending))
+        self.assertTrue(ProcessingJob.objects.filter(document=document, job_type=ProcessingJob.UPGRADE).exists())
+
+        # Once the backend recovers and the breaker cools down, the probe call closes it
+        backend.error_rate = 0
+        scheduler.breaker.opened_at -= scheduler.breaker.reset_timeout
+        repaired, failed = service.repair(pending)
+
+        self.assertEqual((repaired, failed), (4, 0))
+        self.assertFalse(scheduler.breaker.is_open)
+        self.assertFalse(service.pending_chunks(document).exists())
+        chunks = list(document.chunks.all())
+        self.assertTrue(all(chunk.is_transformed and chunk.content.startswith('[offline') for chunk in chunks))
+        self.assertIn('moons', chunks[-1].content)
+
+    def test_repair_leaves_chunks_pending_while_failing(self):
+        document = self.create_document('story', pages=[page_text('tides', 1)])
+        get_ai_backend().error_rate = 1
+        PDFProcessor(document.id).process_document()
+
+        service = FallbackRepairService()
+        self.assertEqual(service.repair(service.pending_chunks(document)), (0, 1))
+        self.assertEqual(service.pending_chunks(document).count(), 1)
@@ -0,0 +1,195 @@
+import threading
+from unittest import mock
+import httpx
+from django.test import SimpleTestCase, override_settings
+from .. import ai_resilience
+from ..ai_backends import OfflineBackendError
+from ..ai_resilience import (PERMANENT, RATE_LIMITED, TRANSIENT, AdaptiveConcurrencyLimiter, AICallScheduler,
+                             CircuitBreaker, CircuitOpenError, TokenBucket, classify_error)
+
+class FakeClock:
+    """Replaces time.monotonic and time.sleep in ai_resilience; sleeping just moves the clock on"""
+
+    def __init__(self, test):
+        self.now = 1000.0
+        self.sleeps = []
+        for name, func in (('monotonic', lambda: self.now), ('sleep', self.sleep)):
+            patcher = mock.patch.object(ai_resilience.time, name, side_effect=func)
+            patcher.start()
+            test.addCleanup(patcher.stop)
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class ClassifyErrorTests(SimpleTestCase):
+
+    def test_classes(self):
+        self.assertEqual(classify_error(OfflineBackendError(429, 'RESOURCE_EXHAUSTED')), RATE_LIMITED)
+        self.assertEqual(classify_error(OfflineBackendError(503, 'UNAVAILABLE')), TRANSIENT)
+        self.assertEqual(classify_error(httpx.ConnectTimeout('timed out')), TRANSIENT)
+        self.assertEqual(classify_error(ConnectionError()), TRANSIENT)
+        self.assertEqual(classify_error(OfflineBackendError(400, 'INVALID_ARGUMENT')), PERMANENT)
+        self.assertEqual(classify_error(ValueError('bad prompt')), PERMANENT)
+
+class TokenBucketTests(SimpleTestCase):
+
+    def test_burst_then_steady_rate(self):
+        clock = FakeClock(self)
+        bucket = TokenBucket(rate_per_second=2, capacity=3)
+
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(clock.sleeps, [])
+
+        bucket.acquire()
+        self.assertEqual(clock.sleeps, [0.5])
+
+    def test_tokens_refill_up_to_capacity(self):
+        clock = FakeClock(self)
+        bucket = TokenBucket(rate_per_second=2, capacity=3)
+        for _ in range(3):
+            bucket.acquire()
+
+        clock.now += 60
+        for _ in range(3):
+            bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(clock.sleeps, [0.5])
+
+class AdaptiveConcurrencyLimiterTests(SimpleTestCase):
+
+    def test_throttle_halves_down_to_minimum(self):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=2, max_limit=10)
+
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 5)
+        limiter.on_throttle()
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 2)
+
+    def test_success_window_adds_one_slot(self):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=4)
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 2)
+
+        limiter.on_success()
+        self.assertEqual(limiter.limit, 2)
+        limiter.on_success()
+        self.assertEqual(limiter.limit, 3)
+        for _ in range(10):
+            limiter.on_success()
+        self.assertEqual(limiter.limit, 4)
+
+    def test_blocks_past_the_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(min_limit=1, max_limit=1)
+        entered = threading.Event()
+
+        def second_call():
+            with limiter:
+                entered.set()
+
+        with limiter:
+            thread = threading.Thread(target=second_call)
+            thread.start()
+            self.assertFalse(entered.wait(0.05))
+        self.assertTrue(entered.wait(1))
+        thread.join()
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(self)
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    def test_opens_after_threshold(self):
+        self.breaker.on_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.on_failure()
+
+        self.assertTrue(self.breaker.is_open)
+        self.assertFalse(self.breaker.allow())
+
+    def test_rate_limiting_does_not_count(self):
+        for _ in range(5):
+            self.breaker.on_failure(rate_limited=True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_success_resets_failures(self):
+        self.breaker.on_failure()
+        self.breaker.on_success()
+        self.breaker.on_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_one_probe_after_cool_down(self):
+        self.breaker.on_failure()
+        self.breaker.on_failure()
+        self.clock.now += 30
+
+        self.assertFalse(self.breaker.is_open)
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.on_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        self.breaker.on_failure()
+        self.breaker.on_failure()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.on_failure(rate_limited=True)
+        self.assertTrue(self.breaker.is_open)
+        self.assertFalse(self.breaker.allow())
+
+@override_settings(
+    AI_CIRCUIT_FAILURE_THRESHOLD=3, AI_CIRCUIT_RESET_TIMEOUT=30, AI_REQUESTS_PER_MINUTE=6000, AI_BURST=100,
+    AI_MIN_CONCURRENCY=1, AI_MAX_CONCURRENCY=4, AI_MAX_RETRIES=2,
+    AI_RETRY_BASE_DELAY=1, AI_RATE_LIMIT_BASE_DELAY=4, AI_RETRY_MAX_DELAY=60
+)
+class AICallSchedulerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(self)
+        self.scheduler = AICallScheduler()
+
+    def test_transient_errors_are_retried(self):
+        func = mock.Mock(side_effect=[OfflineBackendError(503, 'UNAVAILABLE'), 'story'])
+
+        self.assertEqual(self.scheduler.call(func), 'story')
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(len(self.clock.sleeps), 1)
+        self.assertLessEqual(self.clock.sleeps[0], 1)
+
+    def test_rate_limiting_shrinks_concurrency(self):
+        func = mock.Mock(side_effect=[OfflineBackendError(429, 'RESOURCE_EXHAUSTED'), 'story'])
+
+        self.assertEqual(self.scheduler.call(func), 'story')
+        self.assertEqual(self.scheduler.limiter.limit, 2)
+        self.assertEqual(self.scheduler.breaker.failures, 0)
+
+    def test_gives_up_after_max_retries(self):
+        func = mock.Mock(side_effect=OfflineBackendError(503, 'UNAVAILABLE'))
+
+        with self.assertRaises(OfflineBackendError):
+            self.scheduler.call(func)
+        self.assertEqual(func.call_count, 3)
+        self.assertTrue(self.scheduler.breaker.is_open)
+
+    def test_permanent_errors_are_not_retried(self):
+        func = mock.Mock(side_effect=ValueError('bad prompt'))
+
+        with self.assertRaises(ValueError):
+            self.scheduler.call(func)
+        self.assertEqual(func.call_count, 1)
+
+    def test_open_circuit_short_circuits(self):
+        for _ in range(3):
+            self.scheduler.breaker.on_failure()
+        func = mock.Mock(return_value='story')
+
+        with self.assertRaises(CircuitOpenError):
+            self.scheduler.call(func)
+        func.assert_not_called()
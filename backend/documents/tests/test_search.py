@@ -0,0 +1,79 @@
+import re
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+from users.models import User
+from ..search import ChunkSearch, headline_options
+from .base import OfflineAITestCase
+
+class SearchTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.document = self.create_document()
+        self.chunks = self.create_chunks(self.document, [
+            'Plants turn sunlight into sugar through photosynthesis.',
+            'Photosynthesis happens in chloroplasts; photosynthesis needs light and water.',
+            'Volcanoes erupt when magma reaches the surface.',
+        ])
+        other = User.objects.create_user(username='other', email='other@example.com', password='pw12345678')
+        # Enough other text that bm25 weighs the search terms as uncommon
+        self.create_chunks(self.create_document(user=other), ['Photosynthesis in algae.'] + [
+            f'Rivers carry sediment to delta number {i}.' for i in range(6)
+        ])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ranked_matches_for_own_documents(self):
+        results = ChunkSearch(self.user).search('photosynthesis')
+
+        self.assertEqual([result['chunk_index'] for result in results], [1, 0])
+        self.assertIn('<mark>Photosynthesis</mark>', results[0]['snippet'])
+        self.assertGreater(results[0]['score'], results[1]['score'])
+
+    def test_every_word_must_match(self):
+        results = ChunkSearch(self.user).search('photosynthesis water')
+        self.assertEqual([result['chunk_index'] for result in results], [1])
+
+    def test_query_syntax_is_escaped(self):
+        results = ChunkSearch(self.user).search('magma* "surface')
+        self.assertEqual([result['chunk_index'] for result in results], [2])
+        self.assertEqual(ChunkSearch(self.user).search('***'), [])
+
+    def test_index_follows_chunk_changes(self):
+        chunk = self.chunks[2]
+        chunk.content = 'Glaciers carve valleys.'
+        chunk.save()
+
+        self.assertEqual(ChunkSearch(self.user).search('volcanoes'), [])
+        self.assertEqual(len(ChunkSearch(self.user).search('glaciers')), 1)
+
+    def test_search_endpoints(self):
+        response = self.client.get('/api/documents/search/', {'q': 'photosynthesis', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+        response = self.client.get(f'/api/documents/{self.document.id}/search/', {'q': 'magma'})
+        self.assertEqual([result['chunk_index'] for result in response.data['results']], [2])
+
+        response = self.client.get('/api/documents/search/', {'q': 'magma', 'limit': 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_icontains_fallback(self):
+        with mock.patch('documents.search.connection') as connection:
+            connection.vendor = 'mysql'
+            results = ChunkSearch(self.user).search('photosynthesis')
+
+        self.assertEqual([result['chunk_index'] for result in results], [0, 1])
+        self.assertIn('<mark>photosynthesis</mark>', results[0]['snippet'])
+
+class HeadlineOptionsTests(SimpleTestCase):
+
+    def test_min_words_stays_below_max_words(self):
+        for size in (0, 1, 2, 3, 24, 1000):
+            with override_settings(SEARCH_SNIPPET_WORDS=size):
+                options = dict(re.findall(r'(\w+)=(\d+)', headline_options()))
+            max_words, min_words = int(options['MaxWords']), int(options['MinWords'])
+            self.assertGreaterEqual(min_words, 1)
+            self.assertLess(min_words, max_words)
+            self.assertLessEqual(max_words, 64)
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import threading
+from django.test import SimpleTestCase
+from ..single_flight import SingleFlight
+
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        self.lock_dir = lock_dir.name
+
+    def group(self):
+        return SingleFlight(lock_dir=self.lock_dir, lock_timeout=5)
+
+    def run_threads(self, *targets):
+        threads = [threading.Thread(target=target) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+    def test_concurrent_calls_with_one_key_share_a_call(self):
+        group = self.group()
+        started, release = threading.Event(), threading.Event()
+        calls, results = [], []
+
+        def call():
+            calls.append(True)
+            started.set()
+            release.wait(5)
+            return 'story'
+
+        def caller():
+            results.append(group.do('a' * 64, call))
+
+        leader = threading.Thread(target=caller)
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=caller)
+        follower.start()
+        release.set()
+        leader.join(10)
+        follower.join(10)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['story', 'story'])
+
+    def test_different_keys_run_concurrently(self):
+        # Separate groups stand in for separate processes, which only share the lock files
+        barrier = threading.Barrier(2, timeout=2)
+        errors = []
+
+        def caller(key):
+            def call():
+                barrier.wait()
+                return key
+            try:
+                self.group().do(key, call)
+            except threading.BrokenBarrierError as e:
+                errors.append(e)
+
+        # Keys with a common prefix must not share a lock
+        self.run_threads(lambda: caller('abc' + '1' * 61), lambda: caller('abc' + '2' * 61))
+
+        self.assertEqual(errors, [])
+
+    def test_recheck_skips_the_call(self):
+        calls = []
+        result = self.group().do('b' * 64, lambda: calls.append(True), recheck=lambda: 'cached')
+
+        self.assertEqual(result, 'cached')
+        self.assertEqual(calls, [])
+
+    def test_lock_file_is_removed(self):
+        self.group().do('c' * 64, lambda: 'story')
+
+        self.assertEqual(os.listdir(self.lock_dir), [])
+
+    def test_failure_is_raised_and_lock_removed(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.group().do('e' * 64, lambda: 1 / 0)
+        self.assertEqual(os.listdir(self.lock_dir), [])
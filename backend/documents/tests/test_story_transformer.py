@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+from unittest import mock
+from django.test import override_settings
+from ..ai_backends import OfflineBackend
+from ..models import ContentChunk, Document
+from ..story_transformer import StoryTransformationEngine
+from .base import OfflineAITestCase, page_text
+
+@override_settings(STORY_BATCH_MAX_SECTIONS=2)
+class TransformDocumentTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.sections = page_text('glaciers', 3).split('\n\n')
+        self.document = self.create_document('story', Document.EAGER, pages=['\n\n'.join(self.sections)])
+        # Chunks hold an earlier transformation; the engine must start from the stored page
+        self.create_chunks(self.document, [f'old story {i}' for i in range(3)])
+        ContentChunk.objects.create(
+            document=self.document, chunk_index=3, content_type=ContentChunk.IMAGE, content='figure'
+        )
+        self.profile = SimpleNamespace(interests=['geology'], reading_level='casual')
+
+    def test_yields_text_chunks_in_order_from_source_text(self):
+        results = list(StoryTransformationEngine().transform_document(self.document, self.profile))
+
+        self.assertEqual([result['chunk_index'] for result in results], [0, 1, 2])
+        self.assertEqual([result['original_content'] for result in results], self.sections)
+        for result in results:
+            self.assertTrue(result['transformed_content'].startswith('[offline'))
+            self.assertGreaterEqual(result['reading_time'], 1)
+
+    def test_is_a_generator(self):
+        with mock.patch.object(OfflineBackend, 'generate', autospec=True, side_effect=OfflineBackend.respond) as generate:
+            results = StoryTransformationEngine().transform_document(self.document, self.profile)
+            generate.assert_not_called()
+            next(results)
+        self.assertGreaterEqual(generate.call_count, 1)
+
+    def test_repersonalizing_reuses_cached_stories(self):
+        engine = StoryTransformationEngine()
+        first = list(engine.transform_document(self.document, self.profile))
+
+        with mock.patch.object(OfflineBackend, 'generate') as generate:
+            second = list(engine.transform_document(self.document, self.profile))
+        generate.assert_not_called()
+        self.assertEqual(first, second)
+
+        other = SimpleNamespace(interests=['music'], reading_level='casual')
+        with mock.patch.object(OfflineBackend, 'generate', autospec=True, side_effect=OfflineBackend.respond) as generate:
+            list(engine.transform_document(self.document, other))
+        self.assertGreaterEqual(generate.call_count, 1)
@@ -0,0 +1,115 @@
+import asyncio
+import json
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+from ..ai_processor import get_story_transformer
+from ..models import AICallRecord
+from ..streaming import enhancement_events, merge_streams, sse_event
+from .base import OfflineAITestCase
+
+def parse_events(body):
+    """[(event, data)] from a text/event-stream body"""
+    events = []
+    for block in body.strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+    return events
+
+async def ticker(name, count, delay):
+    for i in range(count):
+        await asyncio.sleep(delay)
+        yield f'{name}{i}'
+
+class MergeStreamsTests(SimpleTestCase):
+
+    def test_items_arrive_interleaved_and_each_stream_ends(self):
+        async def collect():
+            return [item async for item in merge_streams({
+                'fast': ticker('f', 3, 0.001), 'slow': ticker('s', 2, 0.015)
+            })]
+
+        items = asyncio.run(collect())
+        self.assertEqual([item for item in items if item[0] == 'fast'], [
+            ('fast', 'f0'), ('fast', 'f1'), ('fast', 'f2'), ('fast', None)
+        ])
+        self.assertEqual([item for item in items if item[0] == 'slow'], [
+            ('slow', 's0'), ('slow', 's1'), ('slow', None)
+        ])
+        # The fast stream finishes before the slow one has produced anything more
+        self.assertLess(items.index(('fast', None)), items.index(('slow', 's1')))
+
+    def test_early_stop_cancels_streams(self):
+        finished = []
+
+        async def endless():
+            try:
+                while True:
+                    await asyncio.sleep(0.001)
+                    yield 'tick'
+            finally:
+                finished.append(True)
+
+        async def first_item():
+            merged = merge_streams({'endless': endless()})
+            item = await anext(merged)
+            await merged.aclose()
+            await asyncio.sleep(0.01)
+            return item
+
+        self.assertEqual(asyncio.run(first_item()), ('endless', 'tick'))
+        self.assertEqual(finished, [True])
+
+    def test_sse_event_format(self):
+        self.assertEqual(sse_event('done', {'text': 'é'}), 'event: done\ndata: {"text": "\\u00e9"}\n\n')
+
+class EnhancementEventsTests(OfflineAITestCase):
+
+    async def collect(self, *args, **kwargs):
+        return ''.join([event async for event in enhancement_events(*args, **kwargs)])
+
+    def test_events_in_order(self):
+        document = self.create_document()
+        body = async_to_sync(self.collect)(
+            get_story_transformer(), 'Tides are caused by the moon.', ['science'], 'casual',
+            user_id=self.user.id, document_id=document.id
+        )
+        events = parse_events(body)
+        names = [event for event, _ in events]
+
+        self.assertEqual(events[0], ('original_content', {'text': 'Tides are caused by the moon.'}))
+        self.assertEqual(names[-1], 'done')
+        self.assertEqual(names.count('enhanced_content_done'), 1)
+        self.assertEqual(names.count('connections_done'), 1)
+        enhanced = ''.join(data['text'] for event, data in events if event == 'enhanced_content')
+        self.assertTrue(enhanced.startswith('[offline'))
+        self.assertEqual(
+            AICallRecord.objects.filter(caller='enhance_stream', document=document).count(), 2
+        )
+
+    def test_second_stream_is_answered_from_the_cache(self):
+        args = (get_story_transformer(), 'Tides are caused by the moon.', ['science'], 'casual')
+        first = parse_events(async_to_sync(self.collect)(*args))
+        second = parse_events(async_to_sync(self.collect)(*args))
+
+        def texts(events):
+            return {
+                field: ''.join(data['text'] for event, data in events if event == field).strip()
+                for field in ('enhanced_content', 'connections')
+            }
+        self.assertEqual(texts(first), texts(second))
+        self.assertEqual(AICallRecord.objects.filter(cache=AICallRecord.MISS).count(), 2)
+
+    def test_endpoint_streams_events(self):
+        chunk = self.create_chunks(self.create_document(), ['Tides are caused by the moon.'])[0]
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(f'/api/chunks/{chunk.id}/enhance/stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        async def read(content):
+            return b''.join([part async for part in content])
+
+        body = async_to_sync(read)(response.streaming_content).decode()
+        self.assertEqual(parse_events(body)[-1], ('done', {}))
@@ -0,0 +1,88 @@
+import math
+from django.test import SimpleTestCase
+from ..models import CorpusTerm, Document, DocumentTermCounts
+from ..themes import ThemeExtractor, extract_terms
+from .base import OfflineAITestCase
+
+class ExtractTermsTests(SimpleTestCase):
+
+    def test_drops_short_words_and_stopwords(self):
+        self.assertEqual(
+            extract_terms('The Glacier carved these valleys, and it would take years. Ice 42 glaciers'),
+            ['glacier', 'carved', 'valleys', 'glaciers']
+        )
+
+class ThemeExtractorTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.extractor = ThemeExtractor(theme_count=3, min_term_count=2, batch_size=2)
+
+    def index(self, counts, status=Document.COMPLETED):
+        document = self.create_document()
+        Document.objects.filter(id=document.id).update(status=status)
+        self.extractor.index_document(document, counts)
+        return document
+
+    def frequencies(self):
+        return dict(CorpusTerm.objects.values_list('term', 'document_frequency'))
+
+    def test_index_adjusts_corpus_frequencies(self):
+        first = self.index({'comet': 5, 'orbit': 2})
+        self.index({'comet': 3, 'tail': 4})
+        self.assertEqual(self.frequencies(), {'comet': 2, 'orbit': 1, 'tail': 1})
+
+        # Re-indexing only counts the terms a document gained or lost
+        self.extractor.index_document(first, {'comet': 9, 'dust': 2})
+        self.assertEqual(self.frequencies(), {'comet': 2, 'orbit': 0, 'tail': 1, 'dust': 1})
+        self.assertEqual(DocumentTermCounts.objects.get(document=first).counts, {'comet': 9, 'dust': 2})
+
+    def test_distinctive_terms_outrank_common_ones(self):
+        for _ in range(3):
+            self.index({'science': 4})
+        self.index({'science': 4, 'comet': 4, 'rare': 1})
+
+        themes = self.extractor.themes_for({'science': 4, 'comet': 4, 'rare': 1})
+
+        self.assertEqual([term for term, _ in themes], ['comet', 'science'])
+        self.assertAlmostEqual(sum(weight ** 2 for _, weight in themes), 1, places=3)
+
+    def test_theme_count_limits_themes(self):
+        counts = {term: 2 for term in ('alpha', 'bravo', 'charlie', 'delta')}
+        self.index(counts)
+
+        self.assertEqual([term for term, _ in self.extractor.themes_for(counts)], ['alpha', 'bravo', 'charlie'])
+        self.assertEqual(self.extractor.themes_for({'alpha': 1}), [])
+
+    def test_recompute_matches_incremental_themes(self):
+        documents = [
+            self.index({'comet': 5, 'orbit': 2}),
+            self.index({'comet': 3, 'tail': 4, 'dust': 2}),
+            self.index({'glacier': 6, 'valley': 3}),
+        ]
+        expected = [self.extractor.themes_for(DocumentTermCounts.objects.get(document=d).counts) for d in documents]
+        CorpusTerm.objects.update(document_frequency=99)
+
+        self.assertEqual(self.extractor.recompute(), 3)
+
+        self.assertEqual(self.frequencies()['comet'], 2)
+        for document, themes in zip(documents, expected):
+            document.refresh_from_db()
+            self.assertEqual(document.metadata['themes'], [term for term, _ in themes])
+            for term, weight in themes:
+                self.assertTrue(math.isclose(document.metadata['theme_weights'][term], weight, abs_tol=1e-4))
+
+    def test_count_documents_counts_processed_documents_missing_counts(self):
+        indexed = self.index({'comet': 5})
+        completed = self.create_document()
+        Document.objects.filter(id=completed.id).update(status=Document.COMPLETED)
+        self.create_chunks(completed, ['Glacier glacier valley.', 'Glacier ice.'])
+        pending = self.create_document()
+        self.create_chunks(pending, ['Comet comet.'])
+
+        self.assertEqual(self.extractor.count_documents(), 1)
+        self.assertEqual(DocumentTermCounts.objects.get(document=completed).counts, {'glacier': 3, 'valley': 1})
+        self.assertFalse(DocumentTermCounts.objects.filter(document=pending).exists())
+
+        self.assertEqual(self.extractor.count_documents(reindex=True), 2)
+        self.assertEqual(DocumentTermCounts.objects.get(document=indexed).counts, {})
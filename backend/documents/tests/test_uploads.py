@@ -0,0 +1,98 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from rest_framework.test import APIClient
+from users.models import User
+from ..models import ContentChunk, Document, ProcessingJob
+from ..pdf_processor import PDFProcessor
+from .base import OfflineAITestCase
+
+PDF_BYTES = b'%PDF-1.4\n% not a real document, only its bytes matter here\n%%EOF\n'
+
+class UploadTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root
+
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw12345678')
+
+    def upload(self, user, name='book.pdf', data=PDF_BYTES, **fields):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post(
+            '/api/documents/', {'file': SimpleUploadedFile(name, data, content_type='application/pdf'), **fields},
+            format='multipart'
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        first = Document.objects.get(id=self.upload(self.user).data['id'])
+        second = Document.objects.get(id=self.upload(self.other, name='copy.pdf').data['id'])
+
+        content_hash = hashlib.sha256(PDF_BYTES).hexdigest()
+        self.assertEqual(first.content_hash, content_hash)
+        self.assertEqual(first.file.name, f'documents/{content_hash[:2]}/{content_hash}.pdf')
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'documents', content_hash[:2])), [f'{content_hash}.pdf'])
+
+    def test_upload_queues_processing(self):
+        response = self.upload(self.user)
+
+        self.assertEqual(response.status_code, 202)
+        job = ProcessingJob.objects.get(document_id=response.data['id'])
+        self.assertEqual((job.job_type, job.status), (ProcessingJob.INGEST, ProcessingJob.QUEUED))
+
+    def test_each_user_is_charged_for_their_copy(self):
+        first = self.upload(self.user).data['id']
+        self.upload(self.user, name='again.pdf')
+        self.upload(self.other)
+
+        self.user.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 2 * len(PDF_BYTES))
+        self.assertEqual(self.other.storage_used, len(PDF_BYTES))
+
+        # Deleting one copy refunds its owner but keeps the shared file
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.delete(f'/api/documents/{first}/').status_code, 204)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, len(PDF_BYTES))
+        remaining = Document.objects.get(user=self.other)
+        self.assertTrue(remaining.file.storage.exists(remaining.file.name))
+
+    def test_refund_never_goes_negative(self):
+        document = self.upload(self.user).data['id']
+        User.objects.filter(id=self.user.id).update(storage_used=0)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.delete(f'/api/documents/{document}/')
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.storage_used, 0)
+
+    def test_direct_duplicate_clones_chunks(self):
+        source = self.create_document()
+        self.create_chunks(source, ['Page one text.', 'Page two text.'])
+        Document.objects.filter(id=source.id).update(status=Document.COMPLETED, pages=2, processed_chunks=2)
+        duplicate = self.create_document(user=self.other)
+        Document.objects.filter(id=duplicate.id).update(content_hash=source.content_hash)
+
+        PDFProcessor(duplicate.id).process_document()
+
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.status, Document.COMPLETED)
+        self.assertEqual(duplicate.metadata['cloned_from'], source.id)
+        self.assertEqual(
+            list(duplicate.chunks.values_list('content', flat=True)),
+            ['Page one text.', 'Page two text.']
+        )
+        self.assertEqual(ContentChunk.objects.filter(document=source).count(), 2)
@@ -0,0 +1,50 @@
+from rest_framework.test import APIClient
+from ..models import Document
+from ..pdf_processor import PDFProcessor
+from .base import OfflineAITestCase
+
+class WatermarkTests(OfflineAITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_chunks_carry_processing_headers(self):
+        document = self.create_document()
+        self.create_chunks(document, [f'Chunk {i}' for i in range(3)])
+        Document.objects.filter(id=document.id).update(
+            status=Document.PROCESSING, pages=10, processed_pages=4, processed_chunks=3
+        )
+
+        response = self.client.get(f'/api/documents/{document.id}/chunks/', {'after': 0})
+
+        self.assertEqual([chunk['chunk_index'] for chunk in response.data], [1, 2])
+        self.assertEqual(response['X-Document-Status'], Document.PROCESSING)
+        self.assertEqual(response['X-Processed-Chunks'], '3')
+        self.assertEqual(response['X-Processed-Pages'], '4')
+        self.assertEqual(response['X-Total-Pages'], '10')
+
+    def test_bad_cursor(self):
+        document = self.create_document()
+        response = self.client.get(f'/api/documents/{document.id}/chunks/', {'after': 'first'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_watermark_advances_with_each_batch(self):
+        pages = [f'Page {page_num} text.' for page_num in range(1, 6)]
+        document = self.create_document(pages=pages)
+        processor = PDFProcessor(document.id)
+        seen = []
+
+        def pages_with_watermark():
+            for page in processor.process_direct_mode():
+                seen.append(Document.objects.values_list('processed_pages', 'processed_chunks').get(id=document.id))
+                yield page
+
+        processor.save_pages(pages_with_watermark(), batch_size=2)
+
+        # Readers only ever see whole committed batches
+        self.assertEqual(seen, [(0, 0), (0, 0), (2, 2), (2, 2), (4, 4)])
+        document.refresh_from_db()
+        self.assertEqual((document.processed_pages, document.processed_chunks), (5, 5))
+        self.assertEqual(document.checkpoints.count(), 5)
@@ -0,0 +1,161 @@
+import hashlib
+import re
+import zlib
+from django.conf import settings
+from .extraction import PageExtractionEngine
+from .models import Document, PageText
+
+def split_into_sections(text):
+    """Split text into logical sections for AI processing"""
+    # Split by paragraphs first
+    paragraphs = [p.strip() for p in text.split('\n\n') if p.strip()]
+    
+    sections = []
+    current_section = ""
+    
+    for para in paragraphs:
+        # If paragraph is substantial, make it a section
+        if len(para.split()) > 30:
+            if current_section:
+                sections.append(current_section)
+            sections.append(para)
+            current_section = ""
+        else:
+            # Combine short paragraphs
+            if current_section:
+                current_section += " " + para
+            else:
+                current_section = para
+    
+    if current_section and len(current_section.split()) > 10:
+        sections.append(current_section)
+    
+    return sections
+
+def story_sections(text):
+    """Sections of a page with enough content to be worth transforming"""
+    if not text.strip():
+        return []
+    return [section for section in split_into_sections(text) if len(section.strip()) > 50]
+
+def clean_section(text):
+    """Section text tidied up for reading as-is (PDF line breaks and spacing collapsed)"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+def estimate_reading_time(text):
+    """Estimate reading time in seconds (average 200 words per minute)"""
+    word_count = len(text.split())
+    return max(1, int((word_count / 200) * 60))
+
+class PageTextStore:
+    """Per-page raw text of a document's PDF, extracted once and kept compressed"""
+    
+    def __init__(self, document, extractor=None):
+        self.document = document
+        self.extractor = extractor or PageExtractionEngine()
+        self._page_cache = (None, None)
+    
+    @property
+    def content_hash(self):
+        """The document's file hash, computed and saved for uploads that predate hashing"""
+        if not self.document.content_hash:
+            sha256 = hashlib.sha256()
+            with self.document.file.open('rb') as f:
+                for chunk in f.chunks():
+                    sha256.update(chunk)
+            self.document.content_hash = sha256.hexdigest()
+            Document.objects.filter(id=self.document.id).update(content_hash=self.document.content_hash)
+        return self.document.content_hash
+    
+    def _rows(self):
+        return PageText.objects.filter(content_hash=self.content_hash)
+    
+    def page_count(self):
+        """Number of pages in the PDF, without opening it if any page is stored"""
+        page_count = self._rows().values_list('page_count', flat=True).first()
+        if page_count is None:
+            page_count = self.extractor.count_pages(self.document.file.path)
+        return page_count
+    
+    def has_pages(self, start_page=1, page_count=None):
+        """Whether every page from start_page on is already stored"""
+        if page_count is None:
+            page_count = self.page_count()
+        stored = self._rows().filter(page_number__gte=start_page).count()
+        return stored == max(0, page_count - start_page + 1)
+    
+    def iter_pages(self, start_page=1, skip_pages=()):
+        """Yield (page_number, text) in page order, extracting and storing pages on first use"""
+        page_count = self.page_count()
+        
+        if self.has_pages(start_page, page_count):
+            rows = self._rows().filter(page_number__gte=start_page).order_by(
+                'page_number'
+            ).values_list('page_number', 'text')
+            for page_num, blob in rows.iterator(chunk_size=100):
+                if page_num not in skip_pages:
+                    yield page_num, self._decompress(blob)
+            return
+        
+        batch = []
+        try:
+            for page_num, text in self.extractor.extract_pages(
+                self.document.file.path, page_count, start_page, skip_pages
+            ):
+                batch.append(self._row(page_num, page_count, text))
+                if len(batch) >= settings.CHUNK_BATCH_SIZE:
+                    self._save(batch)
+                    batch = []
+                yield page_num, text
+        finally:
+            # Keep whatever was extracted, even if the consumer stopped early
+            if batch:
+                self._save(batch)
+    
+    def get_page(self, page_number):
+        """Raw text of a single page, or None if it isn't available"""
+        if self._page_cache[0] == page_number:
+            return self._page_cache[1]
+        
+        if not self.has_pages():
+            # Fill the store once rather than parsing the PDF page by page
+            for _ in self.iter_pages():
+                pass
+        
+        blob = self._rows().filter(page_number=page_number).values_list('text', flat=True).first()
+        text = self._decompress(blob) if blob is not None else None
+        self._page_cache = (page_number, text)
+        return text
+    
+    def save_page(self, page_number, text, page_count=None):
+        """Store a single page, e.g. an empty placeholder for a page that can't be extracted"""
+        self._save([self._row(page_number, page_count or self.page_count(), text)])
+    
+    def chunk_source_text(self, chunk):
+        """Raw text a chunk was built from: its whole page, or one story section of it"""
+        page_number = chunk.metadata.get('page_number')
+        text = self.get_page(page_number) if page_number else None
+        if text is None:
+            return chunk.content
+        
+        section_index = chunk.metadata.get('section_index')
+        if section_index is None:
+            return text
+        
+        sections = story_sections(text)
+        return sections[section_index] if section_index < len(sections) else chunk.content
+    
+    def _row(self, page_number, page_count, text):
+        return PageText(
+            content_hash=self.content_hash,
+            page_number=page_number,
+            page_count=page_count,
+            text=zlib.compress(text.encode('utf-8'))
+        )
+    
+    def _save(self, rows):
+        # Another upload of the same file may have stored these pages already
+        PageText.objects.bulk_create(rows, ignore_conflicts=True)
+    
+    def _decompress(self, blob):
+        return zlib.decompress(bytes(blob)).decode('utf-8')
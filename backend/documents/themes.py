@@ -0,0 +1,213 @@
+import re
+from collections import Counter
+from itertools import islice
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from .models import CorpusTerm, Document, DocumentTermCounts
+from .signals import sync_document_terms
+
+TERM_PATTERN = re.compile(r'\b[a-z]{4,40}\b')
+
+# Common English words of four or more letters; they carry no theme however often they appear
+STOPWORDS = frozenset('''
+    about above across actually after afterwards again against almost alone along already also although
+    always among amongst another anyone anything anyway anywhere around away back became because become
+    becomes becoming been before beforehand behind being below beside besides best better between beyond
+    both bring brought came cannot come comes could does doing done down during each either else elsewhere
+    enough especially even ever every everyone everything everywhere example except fact felt find first
+    found from front full further give given gives going good got great have having hence here hereby
+    herein hers herself himself however inside instead into itself just keep kept know known last later
+    least less like likely made mainly make makes making many may maybe mean means meanwhile might mine
+    more moreover most mostly much must myself near nearly need needs neither never nevertheless next
+    nobody none noone nothing often once ones only onto other others otherwise ours ourselves over own
+    part particular perhaps please quite rather really said same seem seemed seeming seems several shall
+    should show shown side since some somehow someone something sometime sometimes somewhere still such
+    sure take taken than that their theirs them themselves then thence there thereafter thereby therefore
+    therein these they thing things this those though through throughout thus together told took toward
+    towards under unless until upon used using very want wanted wants well went were what whatever when
+    whence whenever where whereas whereby wherein whether which while whither whoever whole whom whose
+    will with within without would year years your yours yourself yourselves
+'''.split())
+
+def extract_terms(text):
+    """Candidate theme terms in text: lower-cased words of four or more letters, stopwords dropped"""
+    return [term for term in TERM_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+def document_term_counts(document):
+    """Term counts over a document's chunks, one at a time (the same text analysis counts)"""
+    counts = Counter()
+    for chunk in document.chunks.iterator():
+        counts.update(extract_terms(chunk.content))
+    return counts
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+class ThemeExtractor:
+    """Picks each document's themes by TF-IDF against the corpus of analyzed documents
+
+    Corpus document frequencies are updated incrementally as documents are
+    indexed. Weights are sublinear term frequency times smoothed inverse
+    document frequency, L2-normalised per document so they're comparable
+    across documents.
+    """
+
+    def __init__(self, theme_count=None, min_term_count=None, batch_size=None):
+        self.theme_count = theme_count or settings.THEME_COUNT
+        self.min_term_count = min_term_count or settings.THEME_MIN_TERM_COUNT
+        self.batch_size = batch_size or settings.THEME_BATCH_SIZE
+
+    def index_document(self, document, counts):
+        """Store a document's term counts, adjusting corpus frequencies by the terms it gained or lost"""
+        counts = dict(counts)
+        with transaction.atomic():
+            row, created = DocumentTermCounts.objects.get_or_create(document=document, defaults={'counts': counts})
+            previous = set() if created else set(row.counts)
+            if not created:
+                row.counts = counts
+                row.save()
+
+            for terms in _batched(set(counts) - previous, self.batch_size):
+                CorpusTerm.objects.bulk_create([CorpusTerm(term=term) for term in terms], ignore_conflicts=True)
+                CorpusTerm.objects.filter(term__in=terms).update(document_frequency=F('document_frequency') + 1)
+            for terms in _batched(previous - set(counts), self.batch_size):
+                CorpusTerm.objects.filter(term__in=terms).update(document_frequency=F('document_frequency') - 1)
+
+    def themes_for(self, counts):
+        """[(term, weight)] of the strongest themes in a document's term counts"""
+        terms = [term for term, count in counts.items() if count >= self.min_term_count]
+        if not terms:
+            return []
+
+        frequencies = {}
+        for batch in _batched(terms, self.batch_size):
+            frequencies.update(CorpusTerm.objects.filter(term__in=batch).values_list('term', 'document_frequency'))
+
+        themes = self._rank(
+            np.array(terms),
+            np.array([counts[term] for term in terms], dtype=float),
+            self._idf(np.array([frequencies.get(term, 0) for term in terms], dtype=float), self.corpus_size()),
+            np.zeros(len(terms), dtype=np.intp),
+            1
+        )
+        return themes[0]
+
+    def corpus_size(self):
+        return DocumentTermCounts.objects.count()
+
+    def count_documents(self, reindex=False):
+        """Store term counts for processed documents that have none (all of them if reindex)
+
+        Corpus frequencies aren't touched; rebuild_corpus() recounts them afterwards.
+        Returns the number of documents counted.
+        """
+        documents = Document.objects.filter(status=Document.COMPLETED).order_by('id')
+        if not reindex:
+            documents = documents.filter(term_counts__isnull=True)
+
+        counted = 0
+        for batch in _batched(documents.iterator(chunk_size=self.batch_size), self.batch_size):
+            rows = []
+            for document in batch:
+                try:
+                    rows.append(DocumentTermCounts(document=document, counts=document_term_counts(document)))
+                except Exception as e:
+                    print(f"📄 Couldn't count terms of document {document.id}: {e}")
+            DocumentTermCounts.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=['document'], update_fields=['counts', 'updated_at']
+            )
+            counted += len(rows)
+        return counted
+
+    def rebuild_corpus(self):
+        """Recount corpus document frequencies from every document's stored term counts"""
+        frequencies = Counter()
+        rows = DocumentTermCounts.objects.values_list('counts', flat=True)
+        for counts in rows.iterator(chunk_size=self.batch_size):
+            frequencies.update(counts.keys())
+
+        with transaction.atomic():
+            CorpusTerm.objects.all().delete()
+            CorpusTerm.objects.bulk_create(
+                (CorpusTerm(term=term, document_frequency=count) for term, count in frequencies.items()),
+                batch_size=1000
+            )
+        return len(frequencies)
+
+    def recompute(self):
+        """Rebuild corpus frequencies, then re-theme every indexed document in batches
+
+        Returns the number of documents updated.
+        """
+        self.rebuild_corpus()
+        vocabulary = list(CorpusTerm.objects.order_by('term').values_list('term', 'document_frequency'))
+        terms = np.array([term for term, _ in vocabulary], dtype=str)
+        idf = self._idf(np.array([frequency for _, frequency in vocabulary], dtype=float), self.corpus_size())
+
+        updated = 0
+        rows = DocumentTermCounts.objects.order_by('document_id').values_list('document_id', 'counts')
+        for batch in _batched(rows.iterator(chunk_size=self.batch_size), self.batch_size):
+            self._recompute_batch(batch, terms, idf)
+            updated += len(batch)
+        return updated
+
+    def _recompute_batch(self, batch, vocabulary, idf):
+        """Re-theme one batch of (document_id, counts) as a single sparse term-document matrix"""
+        terms, tf, owners = [], [], []
+        for position, (_, counts) in enumerate(batch):
+            for term, count in counts.items():
+                if count >= self.min_term_count:
+                    terms.append(term)
+                    tf.append(count)
+                    owners.append(position)
+        terms = np.array(terms, dtype=str)
+
+        # Look every term up in the sorted vocabulary at once; terms of documents
+        # indexed since the rebuild aren't in it and get the unseen-term idf
+        index = np.searchsorted(vocabulary, terms)
+        known = index < len(vocabulary)
+        known[known] = vocabulary[index[known]] == terms[known]
+        term_idf = np.full(len(terms), self._idf(0, self.corpus_size()))
+        term_idf[known] = idf[index[known]]
+
+        themes = self._rank(terms, np.array(tf, dtype=float), term_idf, np.array(owners, dtype=np.intp), len(batch))
+        with transaction.atomic():
+            documents = Document.objects.filter(id__in=[document_id for document_id, _ in batch]).only('id', 'metadata')
+            positions = {document_id: position for position, (document_id, _) in enumerate(batch)}
+            for document in documents:
+                self.apply_themes(document, themes[positions[document.id]])
+            Document.objects.bulk_update(documents, ['metadata'])
+            # bulk_update doesn't send post_save, so index the new themes here
+            sync_document_terms(documents)
+
+    @staticmethod
+    def apply_themes(document, themes):
+        """Write [(term, weight)] themes into the document's metadata (not saved)"""
+        document.metadata['themes'] = [term for term, _ in themes]
+        document.metadata['theme_weights'] = {term: weight for term, weight in themes}
+
+    @staticmethod
+    def _idf(frequencies, corpus_size):
+        return np.log((1 + corpus_size) / (1 + frequencies)) + 1
+
+    def _rank(self, terms, tf, idf, owners, document_count):
+        """Top themes per document from flat (term, tf, idf, owner) arrays, one entry per nonzero"""
+        themes = [[] for _ in range(document_count)]
+        if not len(terms):
+            return themes
+
+        weights = (1 + np.log(tf)) * idf
+        norms = np.sqrt(np.bincount(owners, weights=weights ** 2, minlength=document_count))
+        weights = weights / norms[owners]
+
+        # Group by document, strongest first (ties broken alphabetically), keep the first few of each
+        order = np.lexsort((terms, -weights, owners))
+        owners, terms, weights = owners[order], terms[order], weights[order]
+        rank = np.arange(len(owners)) - np.searchsorted(owners, owners)
+        for i in np.flatnonzero(rank < self.theme_count):
+            themes[owners[i]].append((str(terms[i]), round(float(weights[i]), 4)))
+        return themes
@@ -0,0 +1,55 @@
+import hashlib
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+class ContentHashMixin:
+    """Hashes file data with SHA-256 as it streams through an upload handler"""
+
+    def new_file(self, *args, **kwargs):
+        # The memory handler raises StopFutureHandlers from new_file, so set up first
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.content_hash = self.sha256.hexdigest()
+        return file
+
+class HashingMemoryFileUploadHandler(ContentHashMixin, MemoryFileUploadHandler):
+    pass
+
+class HashingTemporaryFileUploadHandler(ContentHashMixin, TemporaryFileUploadHandler):
+    pass
+
+def compute_content_hash(file):
+    """SHA-256 of an uploaded file, for files that didn't come through the hashing handlers"""
+    content_hash = getattr(file, 'content_hash', None)
+    if content_hash:
+        return content_hash
+
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File storage where names are derived from content, so identical files are stored once"""
+
+    def __init__(self, **kwargs):
+        # Two uploads racing to write the same name are writing the same bytes
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+def document_storage():
+    return ContentAddressedStorage()
@@ -1,14 +1,28 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.utils import timezone
 from .models import Document, ContentChunk, ReadingSession, Bookmark, ReadingAnalytics
 from .serializers import (DocumentSerializer, ContentChunkSerializer, DocumentUploadSerializer,
                          ReadingSessionSerializer, BookmarkSerializer, ReadingAnalyticsSerializer,
                          ProgressUpdateSerializer)
-from .pdf_processor import PDFProcessor
+from .ai_accounting import ai_call_context
+from .ai_processor import get_story_transformer
+from .enhancements import enhance_chunk, get_stored_enhancement
+from .job_queue import JobQueue
+from .lazy_story import LazyStoryTransformer
+from .read_ahead import ReadAheadScheduler
+from .search import ChunkSearch
+from .streaming import EventStreamRenderer, enhancement_events
+from .uploads import compute_content_hash
 from users.learning_engine import UserLearningEngine
+from users.models import User
 
 class DocumentViewSet(viewsets.ModelViewSet):
     serializer_class = DocumentSerializer
@@ -23,6 +37,7 @@ class DocumentViewSet(viewsets.ModelViewSet):
             file = upload_serializer.validated_data['file']
             title = upload_serializer.validated_data.get('title') or file.name
             reading_mode = upload_serializer.validated_data.get('reading_mode', 'direct')
+            story_strategy = upload_serializer.validated_data.get('story_strategy', Document.EAGER)
             
             # Create the document with reading mode
             document = Document.objects.create(
@@ -31,65 +46,157 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 original_filename=file.name,
                 file=file,
                 file_size=file.size,
-                reading_mode=reading_mode
+                content_hash=compute_content_hash(file),
+                reading_mode=reading_mode,
+                story_strategy=story_strategy
             )
             
-            # Process the PDF based on selected mode
-            try:
-                processor = PDFProcessor(document.id)
-                processor.process_document()
-            except Exception as e:
-                document.status = Document.FAILED
-                document.save()
-                return Response(
-                    {'error': f'Failed to process PDF: {str(e)}'}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+            # Each user is charged for their copy, even when the bytes are shared
+            User.objects.filter(id=request.user.id).update(
+                storage_used=F('storage_used') + document.file_size
+            )
+            
+            # Processing happens in the background ingest workers
+            JobQueue.enqueue(document)
             
             serializer = self.get_serializer(document)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         
         return Response(upload_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    def perform_destroy(self, instance):
+        # The stored file may be shared with other uploads, so only the accounting changes
+        User.objects.filter(id=instance.user_id).update(
+            storage_used=Greatest(F('storage_used') - instance.file_size, 0)
+        )
+        instance.delete()
+    
     @action(detail=True, methods=['get'])
     def chunks(self, request, pk=None):
+        """Get the chunks processed so far, optionally only those after ?after=<chunk_index>
+
+        ?limit= caps the number returned. Lazy story documents transform any
+        returned chunks that haven't been read yet, so they are always paged:
+        LAZY_STORY_PAGE_SIZE chunks by default and at most LAZY_STORY_MAX_RANGE.
+        """
         document = self.get_object()
         chunks = document.chunks.all()
+        
+        try:
+            after = request.query_params.get('after')
+            if after is not None:
+                chunks = chunks.filter(chunk_index__gt=int(after))
+            limit = request.query_params.get('limit')
+            if limit is not None:
+                limit = max(0, int(limit))
+        except ValueError:
+            return Response({'error': 'after and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if self.is_lazy_story(document):
+            # Only transform what the reader is about to see
+            limit = min(settings.LAZY_STORY_PAGE_SIZE if limit is None else limit, settings.LAZY_STORY_MAX_RANGE)
+        if limit is not None:
+            chunks = chunks[:limit]
+        
+        return self.chunks_response(document, chunks)
+    
+    @action(detail=True, methods=['get'], url_path='chunks/range')
+    def chunk_range(self, request, pk=None):
+        """Get chunks ?start= (inclusive) to ?end= (exclusive), transforming lazy story sections on first read"""
+        document = self.get_object()
+        try:
+            start = int(request.query_params.get('start', 0))
+            end = int(request.query_params.get('end', start + settings.LAZY_STORY_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'start and end must be chunk indexes'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if start < 0 or end < start:
+            return Response({'error': 'Invalid chunk range'}, status=status.HTTP_400_BAD_REQUEST)
+        end = min(end, start + settings.LAZY_STORY_MAX_RANGE)
+        
+        chunks = document.chunks.filter(chunk_index__gte=start, chunk_index__lt=end)
+        return self.chunks_response(document, chunks)
+    
+    def is_lazy_story(self, document):
+        return document.reading_mode == 'story' and document.story_strategy == Document.LAZY
+    
+    def chunks_response(self, document, chunks):
+        """Serialize chunks with the processing watermark headers"""
+        if self.is_lazy_story(document):
+            with ai_call_context('lazy_story', self.request.user.id, document.id):
+                chunks = LazyStoryTransformer(document).ensure_transformed(chunks)
+        
         serializer = ContentChunkSerializer(chunks, many=True)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        
+        # Let readers start on early chunks and poll for the rest while processing continues
+        response['X-Document-Status'] = document.status
+        response['X-Processed-Chunks'] = document.processed_chunks
+        response['X-Processed-Pages'] = document.processed_pages
+        response['X-Total-Pages'] = document.pages
+        return response
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search across all the user's documents: ?q=, ?limit=, ?offset="""
+        return self.search_response(ChunkSearch(request.user))
+    
+    @action(detail=True, methods=['get'], url_path='search')
+    def search_chunks(self, request, pk=None):
+        """Full-text search within one document: ?q=, ?limit=, ?offset="""
+        return self.search_response(ChunkSearch(request.user, self.get_object()))
+    
+    def search_response(self, chunk_search):
+        """Ranked matches with highlighted snippets for the request's query"""
+        query = self.request.query_params.get('q', '')
+        try:
+            limit = int(self.request.query_params.get('limit', settings.SEARCH_PAGE_SIZE))
+            offset = int(self.request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if limit < 1 or offset < 0:
+            return Response({'error': 'Invalid limit or offset'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = chunk_search.search(query, limit, offset)
+        return Response({'query': query, 'results': results})
     
     @action(detail=True, methods=['post'])
     def reprocess(self, request, pk=None):
         """Reprocess document with different reading mode"""
         document = self.get_object()
         new_mode = request.data.get('reading_mode', 'direct')
+        new_strategy = request.data.get('story_strategy', document.story_strategy)
         
         if new_mode not in [choice[0] for choice in Document.READING_MODE_CHOICES]:
             return Response(
                 {'error': 'Invalid reading mode'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if new_strategy not in [choice[0] for choice in Document.STORY_STRATEGY_CHOICES]:
+            return Response(
+                {'error': 'Invalid story strategy'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Delete existing chunks
-        document.chunks.all().delete()
+        # A failed run in the same mode resumes from its last checkpoint;
+        # anything else starts over
+        if (new_mode != document.reading_mode or new_strategy != document.story_strategy or
+                document.status != Document.FAILED):
+            document.chunks.all().delete()
+            document.checkpoints.all().delete()
+            document.processed_chunks = 0
+            document.processed_pages = 0
         
-        # Update reading mode and reprocess
+        # Update reading mode and queue for reprocessing
         document.reading_mode = new_mode
-        document.status = Document.PROCESSING
+        document.story_strategy = new_strategy
+        document.status = Document.UPLOADED
         document.save()
         
-        try:
-            processor = PDFProcessor(document.id)
-            processor.process_document()
-            serializer = self.get_serializer(document)
-            return Response(serializer.data)
-        except Exception as e:
-            document.status = Document.FAILED
-            document.save()
-            return Response(
-                {'error': f'Failed to reprocess PDF: {str(e)}'}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        JobQueue.enqueue(document)
+        serializer = self.get_serializer(document)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=True, methods=['get', 'post'])
     def progress(self, request, pk=None):
@@ -118,6 +225,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
                 learner = UserLearningEngine(request.user)
                 learner.learn_from_session(session)
                 
+                # Prepare the next chunks before the reader gets to them
+                ReadAheadScheduler().schedule(session)
+                
                 return Response(ReadingSessionSerializer(session).data)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
@@ -164,8 +274,9 @@ class DocumentViewSet(viewsets.ModelViewSet):
             user_interests = request.user.profile.interests
             reading_history = Document.objects.filter(user=request.user).values_list('title', flat=True)[:5]
             
-            ai_transformer = AIStoryTransformer()
-            recommendations = ai_transformer.generate_recommendations(user_interests, list(reading_history))
+            ai_transformer = get_story_transformer()
+            with ai_call_context('recommendations', request.user.id):
+                recommendations = ai_transformer.generate_recommendations(user_interests, list(reading_history))
             
             return Response({'recommendations': recommendations})
         except Exception as e:
@@ -202,20 +313,46 @@ class ContentChunkViewSet(viewsets.ReadOnlyModelViewSet):
             user_interests = request.user.profile.interests
             reading_level = request.user.profile.reading_level
             
-            ai_transformer = AIStoryTransformer()
-            enhanced_content = ai_transformer.add_contextual_enhancements(
-                chunk.content, user_interests, reading_level
-            )
-            connections = ai_transformer.highlight_connections(chunk.content, user_interests)
+            # Precomputed by `manage.py precompute_enhancements`; generate and keep it on a miss
+            enhancement = get_stored_enhancement(chunk, user_interests, reading_level)
+            if enhancement is None:
+                with ai_call_context('enhance', request.user.id, chunk.document_id):
+                    enhancement = enhance_chunk(chunk, user_interests, reading_level)
+            if enhancement is None:
+                raise ValueError("AI enhancement unavailable")
             
             return Response({
                 'original_content': chunk.content,
-                'enhanced_content': enhanced_content,
-                'connections': connections
+                'enhanced_content': enhancement.enhanced_content,
+                'connections': enhancement.connections
             })
         except Exception as e:
             return Response({
                 'original_content': chunk.content,
                 'enhanced_content': chunk.content,
                 'connections': 'Unable to generate connections at this time.'
-            })
\ No newline at end of file
+            })
+    
+    @action(detail=True, methods=['get'], url_path='enhance/stream',
+            renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def enhance_stream(self, request, pk=None):
+        """Stream the enhanced version of a chunk as Server-Sent Events while it is generated"""
+        chunk = self.get_object()
+        try:
+            user_interests = request.user.profile.interests
+            reading_level = request.user.profile.reading_level
+        except Exception:
+            user_interests = []
+            reading_level = 'casual'
+        
+        # An async iterator is streamed as it is produced under ASGI (backend/asgi.py)
+        response = StreamingHttpResponse(
+            enhancement_events(
+                get_story_transformer(), chunk.content, user_interests, reading_level,
+                user_id=request.user.id, document_id=chunk.document_id
+            ),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
\ No newline at end of file
@@ -1,4 +1,12 @@
 # Quick test script - test_ai.py
+# Runs offline unless AI_BACKEND=gemini is set, so no Gemini key or network is needed
+import os
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+os.environ.setdefault('AI_BACKEND', 'offline')
+django.setup()
+
 from documents.ai_processor import AIStoryTransformer
 
 ai = AIStoryTransformer()
@@ -5,6 +5,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Offline unless AI_BACKEND=gemini is set, so no API key or network is needed
+os.environ.setdefault('AI_BACKEND', 'offline')
 django.setup()
 
 from documents.ai_processor import AIStoryTransformer
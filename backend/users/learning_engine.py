@@ -4,7 +4,7 @@ from datetime import timedelta, datetime
 from collections import Counter
 import json
 from .models import UserProfile
-from documents.models import ReadingSession, ReadingAnalytics, Document
+from documents.models import ReadingSession, ReadingAnalytics, Document, DocumentTerm
 from analytics.models import ReadingPattern
 
 class UserLearningEngine:
@@ -20,7 +20,7 @@ class UserLearningEngine:
         sessions = ReadingSession.objects.filter(
             user=self.user,
             last_read_at__gte=timezone.now() - timedelta(days=90)
-        ).select_related('document')
+        )
         
         if not sessions.exists():
             return
@@ -33,14 +33,10 @@ class UserLearningEngine:
         avg_duration = sessions.aggregate(avg=Avg('time_spent'))['avg'] or 0
         self.pattern.avg_session_duration = int(avg_duration / 60)  # Convert to minutes
         
-        # Analyze content preferences
-        content_types = []
-        for session in sessions:
-            doc_meta = session.document.metadata
-            content_types.extend(doc_meta.get('categories', []))
-            content_types.extend(doc_meta.get('themes', []))
+        # Analyze content preferences (categories and themes of the documents read)
+        content_types = DocumentTerm.objects.filter(document__readingsession__in=sessions).counts()
         
-        self.pattern.preferred_content_types = [item[0] for item in Counter(content_types).most_common(5)]
+        self.pattern.preferred_content_types = [item[0] for item in content_types.most_common(5)]
         self.pattern.save()
     
     def evolve_interests_from_behavior(self):
@@ -50,37 +46,32 @@ class UserLearningEngine:
             user=self.user,
             engagement_score__gte=0.7,
             completion_rate__gte=60
-        ).select_related('document')
+        )
         
         bookmarked_docs = Document.objects.filter(
             bookmark__user=self.user
         ).distinct()
         
-        # Extract weighted interests
-        interest_weights = {}
+        recent_sessions = ReadingSession.objects.filter(
+            user=self.user,
+            last_read_at__gte=timezone.now() - timedelta(days=14)
+        )
+        
+        # Extract weighted interests, counting each document's leading themes
+        themes = DocumentTerm.objects.themes()
+        interest_weights = Counter()
         
         # High engagement content (weight: 3)
-        for analytics in high_engagement:
-            themes = analytics.document.metadata.get('themes', [])
-            for theme in themes[:3]:
-                interest_weights[theme] = interest_weights.get(theme, 0) + 3
+        for theme, count in themes.top(3).filter(document__readinganalytics__in=high_engagement).counts().items():
+            interest_weights[theme] += count * 3
         
         # Bookmarked content (weight: 2)
-        for doc in bookmarked_docs:
-            themes = doc.metadata.get('themes', [])
-            for theme in themes[:2]:
-                interest_weights[theme] = interest_weights.get(theme, 0) + 2
+        for theme, count in themes.top(2).filter(document__in=bookmarked_docs).counts().items():
+            interest_weights[theme] += count * 2
         
         # Recent reading sessions (weight: 1)
-        recent_sessions = ReadingSession.objects.filter(
-            user=self.user,
-            last_read_at__gte=timezone.now() - timedelta(days=14)
-        ).select_related('document')
-        
-        for session in recent_sessions:
-            themes = session.document.metadata.get('themes', [])
-            for theme in themes[:1]:
-                interest_weights[theme] = interest_weights.get(theme, 0) + 1
+        for theme, count in themes.top(1).filter(document__readingsession__in=recent_sessions).counts().items():
+            interest_weights[theme] += count
         
         # Update interests based on weighted scores
         sorted_interests = sorted(interest_weights.items(), key=lambda x: x[1], reverse=True)
@@ -137,8 +128,8 @@ class UserLearningEngine:
         
         # Immediate interest learning for high-engagement sessions
         if session.progress_percentage > 75 and session.time_spent > 300:
-            doc_themes = session.document.metadata.get('themes', [])
-            for theme in doc_themes[:1]:
+            doc_themes = session.document.terms.themes().top(1).values_list('term', flat=True)
+            for theme in doc_themes:
                 if theme not in self.profile.interests and len(self.profile.interests) < 8:
                     self.profile.interests.append(theme)
                     self.profile.save()
@@ -1,10 +1,9 @@
-from django.db.models import Q, Avg
+from django.db.models import Q, Avg, Count
 from django.utils import timezone
 from datetime import timedelta
-from collections import Counter
 import math
 from .models import UserProfile
-from documents.models import Document, ReadingAnalytics
+from documents.models import Document, DocumentTerm, ReadingAnalytics
 from analytics.models import ReadingPattern, DocumentSimilarity
 
 class IntelligentRecommendationEngine:
@@ -25,7 +24,7 @@ class IntelligentRecommendationEngine:
         # Available documents (excluding already read)
         available_docs = Document.objects.filter(
             status='completed'
-        ).exclude(id__in=read_docs)
+        ).exclude(id__in=read_docs).prefetch_related('terms')
         
         # Score documents based on multiple factors
         scored_docs = []
@@ -66,9 +65,8 @@ class IntelligentRecommendationEngine:
     
     def _calculate_interest_alignment(self, document):
         """Score based on user's evolved interests"""
-        doc_themes = set(document.metadata.get('themes', []))
-        doc_categories = set(document.metadata.get('categories', []))
-        doc_content = doc_themes.union(doc_categories)
+        # Themes and categories together (served from prefetch_related('terms') when present)
+        doc_content = {doc_term.term for doc_term in document.terms.all()}
         
         user_interests = set(self.profile.interests)
         
@@ -89,7 +87,9 @@ class IntelligentRecommendationEngine:
         score = 0.0
         
         # Content type preference
-        doc_categories = document.metadata.get('categories', [])
+        doc_categories = [
+            doc_term.term for doc_term in document.terms.all() if doc_term.kind == DocumentTerm.CATEGORY
+        ]
         preferred_types = self.pattern.preferred_content_types
         
         if preferred_types:
@@ -159,23 +159,21 @@ class IntelligentRecommendationEngine:
     
     def get_discovery_recommendations(self, limit=5):
         """Recommend content outside user's usual interests for discovery"""
-        # Get less common themes from user's reading history
-        all_themes = []
-        user_docs = Document.objects.filter(readingsession__user=self.user)
-        
-        for doc in user_docs:
-            all_themes.extend(doc.metadata.get('themes', []))
-        
-        theme_counts = Counter(all_themes)
-        rare_themes = [theme for theme, count in theme_counts.items() if count <= 2]
-        
-        # Find documents with rare themes
+        # Less common themes from user's reading history
+        rare_themes = DocumentTerm.objects.themes().filter(
+            document__readingsession__user=self.user
+        ).values('term').annotate(
+            count=Count('id')
+        ).filter(count__lte=2).values('term')
+        
+        # Find documents with rare themes (an indexed join on the term table)
         discovery_docs = Document.objects.filter(
             status='completed',
-            metadata__themes__overlap=rare_themes
+            terms__kind=DocumentTerm.THEME,
+            terms__term__in=rare_themes
         ).exclude(
             readingsession__user=self.user
-        )[:limit]
+        ).distinct()[:limit]
         
         return list(discovery_docs)
     
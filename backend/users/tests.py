@@ -1,3 +1,94 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from documents.models import Bookmark, ContentChunk, Document, ReadingAnalytics, ReadingSession
+from .learning_engine import UserLearningEngine
+from .models import User, UserProfile
+from .recommendation_engine import IntelligentRecommendationEngine
 
-# Create your tests here.
+class DocumentTermEngineTestCase(TestCase):
+    """Documents whose themes and categories are indexed in DocumentTerm rows"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='pw12345678')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='pw12345678')
+        self.profile = UserProfile.objects.create(user=self.user, interests=['science'], reading_level='casual')
+
+    def document(self, themes, categories=(), user=None):
+        return Document.objects.create(
+            user=user or self.other,
+            title=f"About {' '.join(themes)}",
+            original_filename='book.pdf',
+            file='documents/book.pdf',
+            file_size=1024,
+            content_hash=f'{Document.objects.count() + 1:064x}',
+            status=Document.COMPLETED,
+            metadata={'themes': list(themes), 'categories': list(categories)}
+        )
+
+class UserLearningEngineTests(DocumentTermEngineTestCase):
+
+    def test_interests_evolve_from_weighted_themes(self):
+        engaged = self.document(['comet', 'orbit', 'tail', 'dust'])
+        ReadingAnalytics.objects.create(user=self.user, document=engaged, engagement_score=0.9, completion_rate=80)
+        bookmarked = self.document(['glacier', 'valley'])
+        chunk = ContentChunk.objects.create(document=bookmarked, chunk_index=0, content_type=ContentChunk.TEXT, content='x')
+        Bookmark.objects.create(user=self.user, document=bookmarked, chunk=chunk)
+        ReadingSession.objects.create(user=self.user, document=bookmarked)
+        ReadingSession.objects.create(user=self.user, document=self.document(['music']))
+
+        UserLearningEngine(self.user).evolve_interests_from_behavior()
+
+        # Top three themes of engaged reading score 3, bookmarks 2, recent reading 1; 3 is needed
+        self.profile.refresh_from_db()
+        self.assertEqual(set(self.profile.interests), {'science', 'comet', 'orbit', 'tail', 'glacier'})
+
+    def test_preferred_content_types_count_themes_and_categories(self):
+        for themes in (['comet'], ['comet', 'orbit'], ['glacier']):
+            ReadingSession.objects.create(user=self.user, document=self.document(themes, ['science']))
+
+        engine = UserLearningEngine(self.user)
+        engine.analyze_reading_patterns()
+
+        self.assertEqual(engine.pattern.preferred_content_types[:2], ['science', 'comet'])
+        self.assertEqual(set(engine.pattern.preferred_content_types), {'science', 'comet', 'orbit', 'glacier'})
+
+    def test_engaged_session_adds_the_leading_theme(self):
+        session = ReadingSession.objects.create(
+            user=self.user, document=self.document(['comet', 'orbit']), progress_percentage=90, time_spent=600
+        )
+
+        UserLearningEngine(self.user).learn_from_session(session)
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.interests, ['science', 'comet'])
+
+class RecommendationEngineTests(DocumentTermEngineTestCase):
+
+    def test_interest_alignment_uses_themes_and_categories(self):
+        document = self.document(['comet', 'orbit'], ['science'])
+
+        # Jaccard of {science} with {comet, orbit, science}
+        self.assertAlmostEqual(IntelligentRecommendationEngine(self.user)._calculate_interest_alignment(document), 1 / 3)
+
+    def test_personalized_recommendations_prefetch_terms(self):
+        self.profile.interests = ['comet', 'orbit']
+        self.profile.save()
+        matching = self.document(['comet', 'orbit'])
+        self.document(['glacier'])
+
+        with CaptureQueriesContext(connection) as queries:
+            recommendations = IntelligentRecommendationEngine(self.user).get_personalized_recommendations()
+
+        self.assertEqual(recommendations, [matching])
+        # Every document's terms come from one prefetch query
+        self.assertEqual(sum('documents_documentterm' in query['sql'] for query in queries), 1)
+
+    def test_discovery_finds_unread_documents_with_rare_themes(self):
+        for _ in range(3):
+            ReadingSession.objects.create(user=self.user, document=self.document(['common']))
+        ReadingSession.objects.create(user=self.user, document=self.document(['common', 'rare']))
+        unread_rare = self.document(['rare', 'other'])
+        self.document(['common'])
+
+        self.assertEqual(IntelligentRecommendationEngine(self.user).get_discovery_recommendations(), [unread_rare])
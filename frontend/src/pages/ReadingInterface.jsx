@@ -5,6 +5,9 @@ import ModeToggle from '../components/ModeToggle';
 import { FiBookmark, FiShare2, FiSettings, FiArrowLeft, FiArrowRight } from 'react-icons/fi';
 import { documentsAPI } from '../services/api';
 
+// Chunks are fetched a page at a time so story documents only transform what is read
+const CHUNK_PAGE_SIZE = 10;
+
 const ReadingInterface = () => {
   const { id } = useParams();
   const navigate = useNavigate();
@@ -15,6 +18,8 @@ const ReadingInterface = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [currentChunk, setCurrentChunk] = useState(0);
+  const [hasMoreChunks, setHasMoreChunks] = useState(true);
+  const [loadingChunks, setLoadingChunks] = useState(false);
 
   useEffect(() => {
     if (id) {
@@ -27,10 +32,11 @@ const ReadingInterface = () => {
       setLoading(true);
       const [docResponse, chunksResponse] = await Promise.all([
         documentsAPI.getDocument(id),
-        documentsAPI.getChunks(id)
+        documentsAPI.getChunks(id, { limit: CHUNK_PAGE_SIZE })
       ]);
       setDocument(docResponse.data);
       setChunks(chunksResponse.data);
+      setHasMoreChunks(chunksResponse.data.length === CHUNK_PAGE_SIZE);
       setMode(docResponse.data.reading_mode);
     } catch (err) {
       setError('Failed to load document');
@@ -40,6 +46,28 @@ const ReadingInterface = () => {
     }
   };
 
+  // Fetch the next page once the reader gets close to the end of what is loaded
+  useEffect(() => {
+    if (!loading && hasMoreChunks && chunks.length > 0 && currentChunk >= chunks.length - 2) {
+      fetchMoreChunks();
+    }
+  }, [currentChunk, chunks.length, loading, hasMoreChunks]);
+
+  const fetchMoreChunks = async () => {
+    if (loadingChunks) return;
+    try {
+      setLoadingChunks(true);
+      const last = chunks[chunks.length - 1];
+      const response = await documentsAPI.getChunks(id, { after: last.chunk_index, limit: CHUNK_PAGE_SIZE });
+      setChunks((loaded) => [...loaded, ...response.data]);
+      setHasMoreChunks(response.data.length === CHUNK_PAGE_SIZE);
+    } catch (err) {
+      console.error('Error fetching chunks:', err);
+    } finally {
+      setLoadingChunks(false);
+    }
+  };
+
   const sampleContent = {
     direct: `Artificial Intelligence has transformed how we process information. Machine learning algorithms can now analyze complex datasets and extract meaningful patterns that were previously inaccessible to human researchers.
 
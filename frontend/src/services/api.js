@@ -73,7 +73,8 @@ export const documentsAPI = {
   }),
   getDocument: (id) => api.get(`/documents/${id}/`),
   deleteDocument: (id) => api.delete(`/documents/${id}/`),
-  getChunks: (id) => api.get(`/documents/${id}/chunks/`),
+  getChunks: (id, params) => api.get(`/documents/${id}/chunks/`, { params }),
+  getChunkRange: (id, start, end) => api.get(`/documents/${id}/chunks/range/`, { params: { start, end } }),
   updateProgress: (id, data) => api.post(`/documents/${id}/progress/`, data),
   getBookmarks: (id) => api.get(`/documents/${id}/bookmarks/`),
   addBookmark: (id, data) => api.post(`/documents/${id}/bookmarks/`, data),